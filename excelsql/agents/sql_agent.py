@@ -1,5 +1,4 @@
-import os
-from openai import OpenAI
+from ..utils.llm import chat_completion, LazyClient
 
 SYSTEM_PROMPT = {
     "SQLAgent": {},
@@ -40,22 +39,33 @@ USER_PROMPT["SQLAgent"][
 输出要求：仅返回纯 SQL 语句，不包含任何注释、说明或格式化内容。
 """
 
+EXAMPLES_PROMPT = {
+    "SQLAgent": {},
+}
+EXAMPLES_PROMPT["SQLAgent"][
+    "zh"
+] = """
+参考示例（相似问题及其已验证的 SQL，仅供参考，请以任务描述和文档为准）：
+```
+{examples}
+```
+"""
+
 class SQLAgent:
+    client = LazyClient()
+
     def __init__(self):
-        self.client = OpenAI(
-            api_key=os.getenv("API_KEY"),
-            base_url=os.getenv("BASE_URL"),
-        )
         self.model = "deepseek-v3-250324"
         self.language = "zh"
 
-    def generate_sql(self, task: str, document: str) -> str:
+    def generate_sql(self, task: str, document: str, examples: list = None) -> str:
         """
         function:
             Receive a string containing a task description and generate the corresponding SQL;
         args:
             task (str): task description
             document (str): document information
+            examples (list, optional): validated examples, each a dict with "normalized" and "sql"
         return:
             str: SQL
         """
@@ -65,8 +75,15 @@ class SQLAgent:
             task=task,
             document=document,
         )
+        if examples:
+            user_prompt += EXAMPLES_PROMPT["SQLAgent"][self.language].format(
+                examples="\n\n".join(
+                    f"问题：{example['normalized']}\nSQL：{example['sql']}" for example in examples
+                )
+            )
 
-        response = self.client.chat.completions.create(
+        response = chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {
@@ -78,6 +95,7 @@ class SQLAgent:
                     "content": user_prompt,
                 },
             ],
+            component="sql_agent",
         )
 
         sql = response.choices[0].message.content.strip()
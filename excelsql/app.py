@@ -9,21 +9,24 @@ from dotenv import load_dotenv
 
 from excelsql.excelsql import ExcelSQL
 
+@st.cache_resource
+def _create_excel_sql():
+    load_dotenv()
+
+    # 从config文件夹中读取main.yaml
+    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'main.yaml')
+    with open(config_path, 'r') as file:
+        config_dict = yaml.safe_load(file)
+
+    # 转换为OmegaConf对象
+    cfg = OmegaConf.create(config_dict)
+
+    # 初始化ExcelSQL实例；所有会话共享同一个实例，从而共享后台导入任务队列
+    return ExcelSQL(cfg)
+
 def init_excel_sql():
     try:
-        load_dotenv()
-        
-        # 从config文件夹中读取main.yaml
-        config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'main.yaml')
-        with open(config_path, 'r') as file:
-            config_dict = yaml.safe_load(file)
-        
-        # 转换为OmegaConf对象
-        cfg = OmegaConf.create(config_dict)
-        
-        # 初始化ExcelSQL实例
-        app = ExcelSQL(cfg)
-        return app
+        return _create_excel_sql()
     except Exception as e:
         st.error(f"初始化ExcelSQL失败: {e}")
         return None
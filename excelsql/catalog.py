@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+from .utils.log import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    name TEXT PRIMARY KEY,
+    document TEXT,
+    ddl TEXT,
+    profile TEXT,
+    row_count INTEGER,
+    data_version INTEGER NOT NULL DEFAULT 1,
+    content_hash TEXT,
+    updated_at REAL
+)
+"""
+
+_FIELDS = ("document", "ddl", "profile", "row_count", "data_version", "content_hash", "updated_at")
+
+
+class TableCatalog:
+    """
+    表格目录
+
+    保存每张表的文档、DDL、结构化列信息、行数、数据版本和内容哈希。数据持久化在
+    SQLite 中，同时完整缓存在内存里，查找为 O(1)。其他进程提交的修改通过
+    `PRAGMA data_version` 检测（无需轮询文件系统），检测到修改后重新加载缓存并
+    通知订阅者。
+    """
+
+    def __init__(self, path: str = "outputs/catalog.db"):
+        """
+        args:
+            path (str): SQLite 数据库文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        self._tables = {}
+        self._listeners = []
+        self._data_version = None
+        self._refresh()
+
+    def _refresh(self) -> set:
+        """
+        检查其他连接是否提交过修改，如有则重新加载缓存
+
+        return:
+            set: 发生变化的表名
+        """
+        data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return set()
+        self._data_version = data_version
+
+        rows = self._connection.execute("SELECT * FROM tables").fetchall()
+        tables = {}
+        for row in rows:
+            entry = dict(row)
+            entry["profile"] = json.loads(entry["profile"]) if entry["profile"] else None
+            tables[entry["name"]] = entry
+
+        changed = {
+            name
+            for name in set(tables) | set(self._tables)
+            if tables.get(name) != self._tables.get(name)
+        }
+        self._tables = tables
+        return changed
+
+    def _sync(self):
+        with self._lock:
+            changed = self._refresh()
+        if changed:
+            self._notify(changed)
+
+    def _notify(self, changed: set):
+        for listener in list(self._listeners):
+            try:
+                listener(changed)
+            except Exception as e:
+                logger.error(f"表格目录变更通知失败: {e}")
+
+    def subscribe(self, listener: Callable[[set], None]):
+        """
+        订阅表格变更
+
+        args:
+            listener (Callable[[set], None]): 回调函数，参数为发生变化的表名集合
+        """
+        self._listeners.append(listener)
+
+    def get(self, table_name: str) -> Optional[dict]:
+        """
+        获取表格信息
+
+        args:
+            table_name (str): 表名
+
+        return:
+            dict: 表格信息；表格不存在时返回 None
+        """
+        self._sync()
+        return self._tables.get(table_name)
+
+    def list_tables(self) -> List[str]:
+        """返回所有表名"""
+        self._sync()
+        return sorted(self._tables)
+
+    def put(self, table_name: str, **fields) -> dict:
+        """
+        新增或更新表格信息
+
+        未显式指定 data_version 时，内容哈希变化（或新表）会使数据版本加一，
+        以便依赖该表的缓存失效。
+
+        args:
+            table_name (str): 表名
+            **fields: document、ddl、profile、row_count、content_hash 等字段
+
+        return:
+            dict: 更新后的表格信息
+        """
+        unknown = set(fields) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的表格目录字段: {unknown}")
+
+        with self._lock:
+            changed = self._refresh()
+            previous = self._tables.get(table_name)
+            entry = dict(previous) if previous else {"name": table_name, **dict.fromkeys(_FIELDS)}
+            entry.update(fields)
+
+            if "data_version" not in fields:
+                if previous is None:
+                    entry["data_version"] = 1
+                elif "content_hash" in fields and fields["content_hash"] != previous["content_hash"]:
+                    entry["data_version"] = previous["data_version"] + 1
+            entry["updated_at"] = time.time()
+
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO tables (name, {', '.join(_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in _FIELDS)})",
+                [table_name]
+                + [
+                    json.dumps(entry[field], ensure_ascii=False)
+                    if field == "profile" and entry[field] is not None
+                    else entry[field]
+                    for field in _FIELDS
+                ],
+            )
+            self._connection.commit()
+            self._tables[table_name] = entry
+            changed.add(table_name)
+
+        self._notify(changed)
+        return entry
+
+    def delete(self, table_name: str):
+        """删除表格信息"""
+        with self._lock:
+            changed = self._refresh()
+            self._connection.execute("DELETE FROM tables WHERE name = ?", (table_name,))
+            self._connection.commit()
+            if self._tables.pop(table_name, None) is not None:
+                changed.add(table_name)
+        self._notify(changed)
+
+    def import_legacy(self, document_dir: str = "outputs/document", ddl_dir: str = "outputs/ddl") -> int:
+        """
+        导入目录出现之前保存在本地文件中的文档和DDL
+
+        args:
+            document_dir (str): 文档目录
+            ddl_dir (str): DDL目录
+
+        return:
+            int: 导入的表格数量
+        """
+        if not os.path.isdir(ddl_dir):
+            return 0
+
+        imported = 0
+        for file_name in os.listdir(ddl_dir):
+            if not file_name.lower().endswith(".sql"):
+                continue
+            table_name = file_name.split(".")[0]
+            if table_name in self._tables:
+                continue
+
+            with open(os.path.join(ddl_dir, file_name), "r") as f:
+                ddl = f.read()
+            document = None
+            doc_path = os.path.join(document_dir, f"{table_name}.txt")
+            if os.path.exists(doc_path):
+                with open(doc_path, "r") as f:
+                    document = f.read()
+
+            self.put(table_name, document=document, ddl=ddl)
+            imported += 1
+
+        if imported:
+            logger.info(f"已从本地文件导入 {imported} 张表格到表格目录")
+        return imported
@@ -0,0 +1,246 @@
+import re
+import math
+import datetime
+from typing import Any, Dict, List
+
+# 文档模板中的字段段落：<序号>. <字段名> 以及其后的 "- 键：值" 行
+_FIELD_HEADER_RE = re.compile(r"^\s*\d+\.\s*(.+?)\s*$")
+_FIELD_ITEM_RE = re.compile(r"^\s*-\s*([^：:]+)[：:]\s*(.*?)\s*$")
+_TABLE_DESCRIPTION_RE = re.compile(r"表格描述[：:]\s*\n?(.*?)(?:\n\s*\n|字段详细信息)", re.DOTALL)
+_CREATE_TABLE_BODY_RE = re.compile(r"CREATE\s+TABLE[^(]*\((.*)\)", re.IGNORECASE | re.DOTALL)
+_DDL_COLUMN_RE = re.compile(r'^\s*(?:"([^"]+)"|`([^`]+)`|\[([^\]]+)\]|(\S+))\s+(.+?)\s*$')
+_CJK_RE = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def _jsonable(value: Any) -> Any:
+    """将 NumPy / pandas 的值转换为可JSON序列化的Python值"""
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        try:
+            value = value.item()
+        except (ValueError, AttributeError):
+            pass
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def distinct_count(info: dict) -> int:
+    """
+    列的不同值数量
+
+    抽样统计的列只保存了部分唯一值，其不同值数量为估计值，保存在 distinct 字段中。
+    """
+    return info.get("distinct", len(info["unique_values"]))
+
+
+def parse_document_fields(document: str) -> Dict[str, Dict[str, str]]:
+    """
+    从按模板生成的表格文档中解析每个字段的描述信息
+
+    args:
+        document (str): 表格文档
+
+    return:
+        dict: {字段名: {"字段描述": ..., "数据类型": ..., ...}}
+    """
+    fields = {}
+    current = None
+    for line in (document or "").splitlines():
+        header = _FIELD_HEADER_RE.match(line)
+        if header and not line.lstrip().startswith("-"):
+            current = fields.setdefault(header.group(1), {})
+            continue
+        item = _FIELD_ITEM_RE.match(line)
+        if item and current is not None:
+            current[item.group(1).strip()] = item.group(2)
+    return fields
+
+
+def parse_table_description(document: str) -> str:
+    """从表格文档中解析表格描述"""
+    match = _TABLE_DESCRIPTION_RE.search(document or "")
+    return match.group(1).strip() if match else ""
+
+
+def parse_ddl_types(ddl: str) -> Dict[str, str]:
+    """
+    从 CREATE TABLE 语句中解析每列的SQL类型
+
+    args:
+        ddl (str): DDL语句
+
+    return:
+        dict: {列名: SQL类型}
+    """
+    match = _CREATE_TABLE_BODY_RE.search(ddl or "")
+    if not match:
+        return {}
+
+    # 按不在括号内的逗号切分列定义，避免切开 DECIMAL(10, 2)
+    definitions, depth, start = [], 0, 0
+    body = match.group(1)
+    for idx, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            definitions.append(body[start:idx])
+            start = idx + 1
+    definitions.append(body[start:])
+
+    types = {}
+    for definition in definitions:
+        column = _DDL_COLUMN_RE.match(definition)
+        if column:
+            name = next(group for group in column.groups()[:4] if group is not None)
+            types[name] = column.group(5)
+    return types
+
+
+def build_column_profile(
+    table_name: str,
+    column_info: dict,
+    row_count: int,
+    document: str = None,
+    ddl: str = None,
+    max_values: int = 50,
+) -> dict:
+    """
+    构建结构化的列信息，与文档一起保存
+
+    args:
+        table_name (str): 表名
+        column_info (dict): 列信息，包含每列的数据类型和唯一值
+        row_count (int): 行数
+        document (str, optional): 表格文档，用于提取表格和字段描述
+        ddl (str, optional): DDL语句，用于提取SQL类型
+        max_values (int): 每列最多保存的取值数量
+
+    return:
+        dict: 包含表格描述和每列名称、SQL类型、描述、取值范围或示例的结构化信息；
+            抽样统计的列另含 exact、distinct_bounds 和 frequencies
+    """
+    descriptions = parse_document_fields(document)
+    sql_types = parse_ddl_types(ddl)
+
+    columns = []
+    for column, info in column_info.items():
+        name = str(column)
+        values = [_jsonable(v) for v in info["unique_values"][:max_values]]
+        values = [v for v in values if v is not None]
+        distinct = distinct_count(info)
+        is_domain = info.get("exact", True) and distinct <= max_values
+        columns.append(
+            {
+                "name": name,
+                "sql_type": sql_types.get(name, info["type"]),
+                "description": descriptions.get(name, {}).get("字段描述", ""),
+                "distinct": distinct,
+                # 取值范围完整时保存为 value_domain，否则只保存示例
+                "value_domain": values if is_domain else None,
+                "examples": values if not is_domain else values[:5],
+            }
+        )
+        if "distinct_bounds" in info:
+            # 抽样统计的列：不同值数量的估计区间与高频值的频率置信区间
+            low, high = info["distinct_bounds"]
+            columns[-1]["exact"] = info.get("exact", True)
+            columns[-1]["distinct_bounds"] = [int(low), int(high)]
+            columns[-1]["frequencies"] = {
+                str(value): {key: float(bound) for key, bound in frequency.items()}
+                for value, frequency in info.get("frequencies", {}).items()
+            }
+
+    return {
+        "table": table_name,
+        "description": parse_table_description(document),
+        "row_count": row_count,
+        "columns": columns,
+    }
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：中文字符按1个token计算，其余字符按4个字符1个token计算"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _render_values(values: List[Any]) -> str:
+    return ", ".join(str(v) for v in values)
+
+
+def render_compact_prompt(
+    profile: dict,
+    token_budget: int = 1500,
+    max_examples: int = 5,
+) -> str:
+    """
+    将结构化列信息渲染为紧凑的提示词文档
+
+    先保证每列的名称、类型和描述，再把剩余的token预算按列分配给取值：低基数列优先
+    获得完整的取值范围（生成WHERE条件时需要准确的取值），高基数列最多给出
+    max_examples 个示例；当前列未用完的预算留给后续的列。
+
+    args:
+        profile (dict): `build_column_profile` 生成的结构化信息
+        token_budget (int): 文档的token预算
+        max_examples (int): 高基数列最多给出的示例数量
+
+    return:
+        str: 紧凑的文档
+    """
+    header = [f"表名：{profile['table']}"]
+    if profile.get("description"):
+        header.append(f"表格描述：{profile['description']}")
+    header.append("字段（名称 | 类型 | 描述 | 取值）：")
+
+    base_lines = {}
+    for column in profile["columns"]:
+        base_lines[column["name"]] = f"- {column['name']} | {column['sql_type']} | {column['description']}"
+
+    footer = []
+    for spec in profile.get("summary_tables", []):
+        measures = ", ".join(spec["measures"]) or "无"
+        footer.append(
+            f"汇总表 {spec['table']}：按 {spec['dimension']} 分组，含 row_count 及 {measures} 的 _sum/_count/_min/_max"
+            f"；仅当筛选和分组字段都只有 {spec['dimension']} 时可用，否则查询基础表"
+        )
+
+    remaining = token_budget - estimate_tokens("\n".join(header + list(base_lines.values()) + footer))
+
+    value_parts = {}
+    columns = sorted(profile["columns"], key=lambda c: c["distinct"])
+    for idx, column in enumerate(columns):
+        share = max(remaining, 0) / (len(columns) - idx)
+        if column["value_domain"] is not None:
+            values, label = column["value_domain"], "取值"
+        else:
+            values, label = column["examples"][:max_examples], "示例"
+
+        taken = []
+        used = estimate_tokens(f" | {label}：")
+        for value in values:
+            cost = estimate_tokens(f"{value}, ")
+            if used + cost > share:
+                break
+            taken.append(value)
+            used += cost
+        if not taken:
+            continue
+
+        part = f" | {label}：{_render_values(taken)}"
+        if not column.get("exact", True):
+            low, high = column["distinct_bounds"]
+            part += f" (约{column['distinct']}个，估计区间 {low}~{high})"
+        elif len(taken) < column["distinct"]:
+            part += f" (共{column['distinct']}个)"
+        value_parts[column["name"]] = part
+        remaining -= estimate_tokens(part)
+
+    lines = header + [line + value_parts.get(name, "") for name, line in base_lines.items()] + footer
+    return "\n".join(lines)
@@ -0,0 +1,132 @@
+import time
+import threading
+from typing import Optional
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+from .utils.log import logger
+from .utils.trace import tracer
+
+# 进程内按 DB_URL 共享的引擎；所有会话、所有 ExcelSQL 实例共用同一个连接池
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """记录每次从连接池取连接的等待时间和超时次数的 QueuePool"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            tracer.incr("excelsql_db_pool_timeouts_total")
+            raise
+        finally:
+            tracer.observe("excelsql_db_pool_wait_seconds", time.perf_counter() - start)
+        return connection
+
+
+def pool_settings(
+    num_generators: int = 5,
+    concurrent: bool = True,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+) -> tuple:
+    """
+    计算连接池大小：未配置时由生成器并发数推导
+
+    并发模式下一个问题会同时验证 num_generators 条候选SQL，连接池大小等于生成器数量，
+    溢出连接数再留出同样多的余量，供多个会话同时提问时使用。
+
+    args:
+        num_generators (int): 每个问题的SQL生成器数量
+        concurrent (bool): 是否并发验证候选SQL
+        pool_size (int, optional): 配置的连接池大小
+        max_overflow (int, optional): 配置的溢出连接数
+
+    return:
+        tuple: (pool_size, max_overflow)
+    """
+    per_question = num_generators if concurrent else 1
+    if pool_size is None:
+        pool_size = max(per_question, 1)
+    if max_overflow is None:
+        max_overflow = pool_size
+    return pool_size, max_overflow
+
+
+def get_engine(
+    db_url: str,
+    num_generators: int = 5,
+    concurrent: bool = True,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_timeout: float = 30,
+    pool_pre_ping: bool = True,
+    pool_recycle: int = 1800,
+) -> Engine:
+    """
+    返回 db_url 对应的共享引擎，首次调用时按连接池配置创建
+
+    同一个 db_url 只创建一个引擎，之后的调用直接返回已有引擎，其连接池参数以第一次创建时为准。
+
+    args:
+        db_url (str): 数据库连接URL
+        num_generators (int): 每个问题的SQL生成器数量，用于推导默认的连接池大小
+        concurrent (bool): 是否并发验证候选SQL
+        pool_size (int, optional): 连接池大小，None 表示由生成器数量推导
+        max_overflow (int, optional): 超出连接池大小后最多额外创建的连接数，None 表示与连接池大小相同
+        pool_timeout (float): 连接池耗尽时等待连接的最长时间（秒）
+        pool_pre_ping (bool): 取出连接时先检测连接是否可用，避免使用已被服务端断开的连接
+        pool_recycle (int): 连接的最长使用时间（秒），-1 表示不回收
+
+    return:
+        Engine: SQLAlchemy 引擎
+    """
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is not None:
+            return engine
+
+        kwargs = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+        url = make_url(db_url)
+        # 内存 SQLite 数据库只能使用单连接池，不支持连接池大小的设置
+        if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+            pool_size, max_overflow = pool_settings(num_generators, concurrent, pool_size, max_overflow)
+            kwargs.update(
+                poolclass=TimedQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+            )
+            logger.info(f"创建数据库引擎：连接池大小 {pool_size}，溢出连接数 {max_overflow}")
+
+        engine = _engines[db_url] = create_engine(db_url, **kwargs)
+        return engine
+
+
+def pool_status(engine: Engine) -> dict:
+    """
+    连接池的当前状态
+
+    args:
+        engine (Engine): SQLAlchemy 引擎
+
+    return:
+        dict: {"size", "checked_out", "overflow"}；不是 QueuePool 时只包含 {"status"}
+    """
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+    return {"status": pool.status()}
+
+
+def dispose_engines():
+    """关闭所有共享引擎的连接"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
@@ -1,6 +1,5 @@
-import os
-from openai import OpenAI
 from .utils.log import logger
+from .utils.llm import chat_completion, LazyClient
 
 SYSTEM_PROMPT = {
     "DDLGenerator": {},
@@ -62,6 +61,8 @@ Please return only the pure SQL DDL statement, without any explanations or comme
 
 
 class DDLGenerator:
+    client = LazyClient()
+
     def __init__(
         self,
         model,
@@ -69,10 +70,6 @@ class DDLGenerator:
         """
         初始化DDLGenerator
         """
-        self.client = OpenAI(
-            api_key=os.getenv("API_KEY"),
-            base_url=os.getenv("BASE_URL"),
-        )
         self.model = model
         logger.info(f"DDLGenerator初始化完成，使用模型：{self.model}")
 
@@ -100,7 +97,8 @@ class DDLGenerator:
             document=document,
         )
 
-        response = self.client.chat.completions.create(
+        response = chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {
@@ -112,6 +110,7 @@ class DDLGenerator:
                     "content": user_prompt,
                 },
             ],
+            component="ddl_generator",
         )
 
         ddl = response.choices[0].message.content.strip()
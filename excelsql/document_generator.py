@@ -1,7 +1,9 @@
-import os
 import json
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from .column_profile import distinct_count
 from .utils.log import logger
+from .utils.llm import chat_completion, LazyClient
+from .utils.trace import tracer
 
 SYSTEM_PROMPT = {
     "DocumentGenerator": {},
@@ -39,6 +41,42 @@ SYSTEM_PROMPT["DocumentGenerator"][
 ```
 """
 
+# 分批模式：每批只描述一部分字段
+SYSTEM_PROMPT["DocumentGeneratorBatch"] = {}
+SYSTEM_PROMPT["DocumentGeneratorBatch"][
+    "zh"
+] = """
+您是一位专业的数据分析师和文档编写专家。您的任务是根据提供的表格名称和部分列信息，为这些列撰写字段说明，它们将被合并到一份完整的数据库表格文档中。
+
+请遵循以下规则：
+1. 分析每个列的数据类型和唯一值，推断其用途和含义
+2. 输出普通文本即可，不要使用Markdown格式
+3. 只输出字段详细信息，不要输出表格名称、表格描述或其他内容
+4. 如果表格列名没有实义，请你根据数据进行合理的命名
+5. 如果字段有确定的取值范围，请使用取值范围；否则，请使用取值示例
+6. 序号从给定的起始序号开始连续编号
+
+请严格按以下模板生成：
+```
+<序号>. <字段名>
+    - 字段名语言：<字段名语言>
+    - 数据类型：<数据类型>
+    - 取值范围/取值示例：<取值范围/取值示例>
+    - 字段描述：<字段描述>
+
+...
+```
+"""
+
+# 分批模式：根据所有字段名生成简短的表格描述
+SYSTEM_PROMPT["DocumentGeneratorSummary"] = {}
+SYSTEM_PROMPT["DocumentGeneratorSummary"][
+    "zh"
+] = """
+您是一位专业的数据分析师。您的任务是根据表格名称和全部字段名，用一到三句话简洁地描述该表格的用途。
+只输出描述本身，不要使用Markdown格式，不要逐个解释字段。
+"""
+
 USER_PROMPT = {
     "DocumentGenerator": {},
 }
@@ -57,22 +95,59 @@ USER_PROMPT["DocumentGenerator"][
 请按照规定格式输出一份详细的数据库表格文档。
 """
 
+USER_PROMPT["DocumentGeneratorBatch"] = {}
+USER_PROMPT["DocumentGeneratorBatch"][
+    "zh"
+] = """
+请为以下字段生成字段说明：
+
+表名：{table_name}
+起始序号：{start}
+字段信息：
+```
+{column_info}
+```
+
+请按照规定格式输出这些字段的详细信息。
+"""
+
+USER_PROMPT["DocumentGeneratorSummary"] = {}
+USER_PROMPT["DocumentGeneratorSummary"][
+    "zh"
+] = """
+表名：{table_name}
+字段名：{column_names}
+
+请给出该表格的简短描述。
+"""
+
 
 class DocumentGenerator:
+    client = LazyClient()
+
     def __init__(
         self,
         model: str,
         limit_value: int = -1,
+        batch_size: int = -1,
+        max_workers: int = 4,
+        max_retries: int = 2,
     ):
         """
         初始化DocumentGenerator
+
+        args:
+            model (str): 模型名称
+            limit_value (int): 每列最多展示的唯一值数量，-1 表示不限制
+            batch_size (int): 列数超过该值时分批并行生成字段说明，-1 表示始终一次生成
+            max_workers (int): 分批模式下的最大并发请求数
+            max_retries (int): 分批模式下每批失败后的最大重试次数
         """
-        self.client = OpenAI(
-            api_key=os.getenv("API_KEY"),
-            base_url=os.getenv("BASE_URL"),
-        )
         self.model = model
         self.limit_value = limit_value
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
         logger.info(f"DocumentGenerator初始化完成，使用模型：{self.model}")
 
     def generate(
@@ -93,6 +168,23 @@ class DocumentGenerator:
         """
         logger.info(f"开始为表 {table_name} 生成文档")
 
+        if self.batch_size > 0 and len(column_info) > self.batch_size:
+            return self._generate_chunked(table_name, column_info, language)
+
+        system_prompt = SYSTEM_PROMPT["DocumentGenerator"][language]
+        user_prompt = USER_PROMPT["DocumentGenerator"][language].format(
+            table_name=table_name,
+            column_info=self._format_column_info(column_info),
+        )
+
+        try:
+            return self._chat(system_prompt, user_prompt)
+
+        except Exception as e:
+            logger.error(f"生成表格文档时发生错误: {e}")
+            return f"Error generating document: {str(e)}"
+
+    def _format_column_info(self, column_info: dict) -> str:
         column_info_str = "| 列名 | 数据类型 | 唯一值示例 |\n| --- | --- | --- |\n"
         for column, info in column_info.items():
             unique_values = [str(v) for v in info["unique_values"]]
@@ -100,37 +192,105 @@ class DocumentGenerator:
                 unique_values = unique_values[: self.limit_value]
             unique_values_str = ", ".join(unique_values)
 
-            if self.limit_value > 0 and len(info["unique_values"]) > self.limit_value:
-                unique_values_str += f" (等{len(info['unique_values'])}个)"
+            if not info.get("exact", True):
+                low, high = info["distinct_bounds"]
+                unique_values_str += f" (约{distinct_count(info)}个，估计区间 {low}~{high})"
+            elif self.limit_value > 0 and distinct_count(info) > self.limit_value:
+                unique_values_str += f" (等{distinct_count(info)}个)"
             column_info_str += f"| {column} | {info['type']} | {unique_values_str} |\n"
+        return column_info_str
 
-        system_prompt = SYSTEM_PROMPT["DocumentGenerator"][language]
-        user_prompt = USER_PROMPT["DocumentGenerator"][language].format(
+    def _chat(self, system_prompt: str, user_prompt: str) -> str:
+        response = chat_completion(
+            self.client,
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt,
+                },
+                {
+                    "role": "user",
+                    "content": user_prompt,
+                },
+            ],
+            component="document_generator",
+        )
+        return response.choices[0].message.content.strip()
+
+    def _generate_batch(self, table_name: str, batch: dict, start: int, language: str) -> str:
+        """
+        生成一批字段的说明，失败时单独重试；重试用尽后退回到只含数据类型和取值示例的说明
+        """
+        system_prompt = SYSTEM_PROMPT["DocumentGeneratorBatch"][language]
+        user_prompt = USER_PROMPT["DocumentGeneratorBatch"][language].format(
             table_name=table_name,
-            column_info=column_info_str,
+            start=start,
+            column_info=self._format_column_info(batch),
         )
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt,
-                    },
-                    {
-                        "role": "user",
-                        "content": user_prompt,
-                    },
-                ],
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._chat(system_prompt, user_prompt)
+            except Exception as e:
+                logger.warning(
+                    f"表 {table_name} 第 {start} 列起的字段说明生成失败（尝试 {attempt + 1}/{self.max_retries + 1}）: {e}"
+                )
+
+        logger.error(f"表 {table_name} 第 {start} 列起的字段说明生成失败，使用基础字段信息代替")
+        sections = []
+        for offset, (column, info) in enumerate(batch.items()):
+            values = [str(v) for v in info["unique_values"][: max(self.limit_value, 5)]]
+            sections.append(
+                f"{start + offset}. {column}\n"
+                f"    - 数据类型：{info['type']}\n"
+                f"    - 取值范围/取值示例：{', '.join(values)}\n"
+                f"    - 字段描述：{column}"
             )
+        return "\n\n".join(sections)
+
+    def _generate_summary(self, table_name: str, column_names: list, language: str) -> str:
+        system_prompt = SYSTEM_PROMPT["DocumentGeneratorSummary"][language]
+        user_prompt = USER_PROMPT["DocumentGeneratorSummary"][language].format(
+            table_name=table_name,
+            column_names=", ".join(str(c) for c in column_names),
+        )
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._chat(system_prompt, user_prompt)
+            except Exception as e:
+                logger.warning(f"表 {table_name} 的表格描述生成失败（尝试 {attempt + 1}/{self.max_retries + 1}）: {e}")
+        return f"表格 {table_name} 的数据。"
 
-            document = response.choices[0].message.content.strip()
-            return document
+    def _generate_chunked(self, table_name: str, column_info: dict, language: str) -> str:
+        """
+        分批生成宽表文档：字段分批后并行生成说明，再用一次简短的调用生成表格描述，最后合并
+        """
+        columns = list(column_info)
+        batches = [
+            {column: column_info[column] for column in columns[i : i + self.batch_size]}
+            for i in range(0, len(columns), self.batch_size)
+        ]
+        logger.info(f"表 {table_name} 共 {len(columns)} 列，分 {len(batches)} 批生成文档")
 
-        except Exception as e:
-            logger.error(f"生成表格文档时发生错误: {e}")
-            return f"Error generating document: {str(e)}"
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            summary_future = executor.submit(tracer.wrap(self._generate_summary), table_name, columns, language)
+            batch_docs = list(
+                executor.map(
+                    tracer.wrap(self._generate_batch),
+                    [table_name] * len(batches),
+                    batches,
+                    range(1, len(columns) + 1, self.batch_size),
+                    [language] * len(batches),
+                )
+            )
+            summary = summary_future.result()
+
+        return (
+            f"表格文档：{table_name}\n\n"
+            f"表格描述：\n{summary}\n\n"
+            f"字段详细信息：\n" + "\n\n".join(doc.strip() for doc in batch_docs)
+        )
 
     def __call__(self, table_name: str, column_info: dict) -> str:
         """
@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+from .utils.log import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS examples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT,
+    normalized TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    versions TEXT,
+    sql TEXT NOT NULL,
+    created_at REAL,
+    UNIQUE (normalized, tables)
+)
+"""
+
+
+# 问题中的字面量：数字（含中文数字）、日期片段以及引号或书名号中的内容
+_LITERAL_RE = re.compile(
+    r"\d+(?:[.:/-]\d+)*|[零〇一二两三四五六七八九十百千万亿]+|"
+    r"'[^']*'|\"[^\"]*\"|“[^”]*”|‘[^’]*’|「[^」]*」|《[^》]*》"
+)
+
+
+def _literals(text: str) -> list:
+    return _LITERAL_RE.findall(text)
+
+
+def _ngrams(text: str, sizes=(1, 2, 3)) -> Counter:
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    grams = Counter()
+    for n in sizes:
+        for i in range(len(text) - n + 1):
+            grams[text[i : i + n]] += 1
+    return grams
+
+
+class ExampleStore:
+    """
+    已验证问题与SQL的本地示例库
+
+    持久化在 SQLite 中；检索时对标准化问题的字符 n-gram 计算 TF-IDF 余弦相似度，
+    索引完全在内存中，不依赖外部服务。
+    """
+
+    def __init__(self, path: str = "outputs/examples.db"):
+        """
+        args:
+            path (str): SQLite 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+        self._examples = []
+        self._term_counts = []
+        self._document_frequency = Counter()
+        # (标准化问题, 表) -> 示例在 _examples 中的位置
+        self._positions = {}
+        self._vectors = None
+        self._vectorized_size = 0
+        for question, normalized, tables, versions, sql in self._connection.execute(
+            "SELECT question, normalized, tables, versions, sql FROM examples ORDER BY id"
+        ):
+            self._index(
+                {
+                    "question": question,
+                    "normalized": normalized,
+                    "tables": json.loads(tables),
+                    "versions": json.loads(versions or "{}"),
+                    "sql": sql,
+                }
+            )
+        logger.info(f"示例库已加载 {len(self._examples)} 条示例")
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+    def _index(self, example: dict):
+        key = (example["normalized"], tuple(example["tables"]))
+        position = self._positions.get(key)
+        if position is not None:
+            # 同一问题重新验证后更新SQL和数据版本，问题文本不变，向量无需重新计算
+            self._examples[position].update(example)
+            return
+
+        counts = _ngrams(example["normalized"])
+        self._positions[key] = len(self._examples)
+        self._examples.append(example)
+        self._term_counts.append(counts)
+        self._document_frequency.update(counts.keys())
+        # 新示例按当前 IDF 向量化；示例数量比上次全部重新计算时翻倍后，检索时再全部重新计算，
+        # 使每次添加的均摊开销为常数
+        if self._vectors is not None and len(self._examples) < 2 * self._vectorized_size:
+            self._vectors.append(self._vectorize(counts))
+        else:
+            self._vectors = None
+
+    def _idf(self, term: str) -> float:
+        return math.log((1 + len(self._examples)) / (1 + self._document_frequency[term])) + 1
+
+    def _vectorize(self, counts: Counter) -> Dict[str, float]:
+        vector = {term: count * self._idf(term) for term, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {term: v / norm for term, v in vector.items()}
+
+    def add(self, question: str, normalized: str, tables: List[str], versions: Dict[str, int], sql: str):
+        """
+        保存一条达成共识且执行成功的问题与SQL；相同的问题和表已有示例时更新其SQL和数据版本
+
+        args:
+            question (str): 原始问题
+            normalized (str): 标准化后的问题
+            tables (List[str]): 涉及的表
+            versions (Dict[str, int]): 各表的数据版本
+            sql (str): 最终的SQL
+        """
+        tables = sorted(tables)
+        with self._lock:
+            # 数据版本变化后重新验证的SQL覆盖旧示例，否则该问题再也无法复用
+            self._connection.execute(
+                "INSERT INTO examples (question, normalized, tables, versions, sql, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (normalized, tables) DO UPDATE SET "
+                "question = excluded.question, versions = excluded.versions, sql = excluded.sql, "
+                "created_at = excluded.created_at",
+                (question, normalized, json.dumps(tables, ensure_ascii=False),
+                 json.dumps(versions, ensure_ascii=False), sql, time.time()),
+            )
+            self._connection.commit()
+            self._index(
+                {
+                    "question": question,
+                    "normalized": normalized,
+                    "tables": tables,
+                    "versions": versions,
+                    "sql": sql,
+                }
+            )
+
+    def search(self, query: str, tables: List[str] = None, top_k: int = 3) -> List[dict]:
+        """
+        检索与问题最相似的示例
+
+        args:
+            query (str): 标准化后的问题
+            tables (List[str], optional): 只检索涉及相同表的示例
+            top_k (int): 返回的示例数量
+
+        return:
+            List[dict]: 按相似度降序排列的示例，score 为余弦相似度
+        """
+        with self._lock:
+            if not self._examples:
+                return []
+            if self._vectors is None:
+                self._vectors = [self._vectorize(counts) for counts in self._term_counts]
+                self._vectorized_size = len(self._examples)
+
+            tables = sorted(tables) if tables is not None else None
+            query_vector = self._vectorize(_ngrams(query))
+            scored = []
+            for example, vector in zip(self._examples, self._vectors):
+                if tables is not None and example["tables"] != tables:
+                    continue
+                score = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+                if score > 0:
+                    scored.append((score, example))
+
+        scored.sort(key=lambda item: -item[0])
+        return [{**example, "score": score} for score, example in scored[:top_k]]
+
+    def best_match(self, query: str, tables: List[str], versions: Dict[str, int], threshold: float) -> Optional[dict]:
+        """
+        返回可直接复用的示例：各表数据版本一致，且问题完全相同，
+        或相似度不低于阈值且问题中的数字、引号内容等字面量完全相同
+
+        只差一个字面量的问题（如“年龄大于30岁”与“年龄大于35岁”）字符 n-gram 相似度很高，
+        但SQL不同，这类示例只作为少样本示例使用，不直接复用。
+
+        args:
+            query (str): 标准化后的问题
+            tables (List[str]): 涉及的表
+            versions (Dict[str, int]): 各表当前的数据版本
+            threshold (float): 相似度阈值
+
+        return:
+            dict: 可复用的示例；没有时返回 None
+        """
+        matches = self.search(query, tables, top_k=1)
+        if not matches or matches[0]["versions"] != versions:
+            return None
+        match = matches[0]
+        if " ".join(match["normalized"].split()) == " ".join(query.split()):
+            return match
+        if match["score"] >= threshold and _literals(match["normalized"]) == _literals(query):
+            return match
+        return None
@@ -1,16 +1,31 @@
+import io
 import os
-import pandas as pd
+import json
+import hashlib
+import threading
 from pathlib import Path
-import hydra
-from omegaconf import DictConfig
+from typing import TYPE_CHECKING, Callable, Optional
 from concurrent.futures import ThreadPoolExecutor
-from sqlalchemy import create_engine, text
 from .query_normalizer import QueryNormalizer
 from .agents.sql_agent import SQLAgent
 from .ddl_generator import DDLGenerator
 from .document_generator import DocumentGenerator
-from .utils.log import logger
-from .utils.sort import Sort
+from .utils.log import logger, configure_logging
+from .utils.trace import tracer
+from .utils.llm import configure_llm
+from .catalog import TableCatalog
+from .column_profile import build_column_profile, render_compact_prompt
+from .example_store import ExampleStore
+
+# pandas、sqlalchemy、numpy 以及依赖它们的组件在首次使用时才导入，
+# 使导入本模块和创建 ExcelSQL 实例都很快（见 scripts/profile_startup.py）
+if TYPE_CHECKING:
+    import pandas as pd
+    from omegaconf import DictConfig
+    from .result_pager import ResultPager
+    from .utils.result import QueryResult
+    from .schema_graph import SchemaGraph
+    from .ingest_queue import IngestQueue
 
 
 def _extract_table_name(file_path: str) -> str:
@@ -24,7 +39,7 @@ def _extract_table_name(file_path: str) -> str:
     return table_name
 
 
-def _extract_table_info(df: pd.DataFrame) -> str:
+def _extract_table_info(df: "pd.DataFrame") -> str:
     if df.columns.empty:  # 表格没有列名
         df.columns = [f"Column_{i}" for i in range(df.shape[1])]
 
@@ -39,37 +54,608 @@ def _extract_table_info(df: pd.DataFrame) -> str:
     return column_info
 
 
+def _read_excel(source) -> "pd.DataFrame":
+    """解析工作簿：source 可以是文件路径、文件内容（bytes 或文件对象）或已解析的 DataFrame"""
+    import pandas as pd
+
+    if isinstance(source, pd.DataFrame):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return pd.read_excel(source)
+
+
+def _content_hash(df: "pd.DataFrame") -> str:
+    import pandas as pd
+
+    digest = hashlib.sha256(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
 class ExcelSQL:
-    def __init__(self, cfg: DictConfig):
+    def __init__(self, cfg: "DictConfig"):
         db_url = os.getenv("DB_URL")
         if not db_url:
             logger.error("数据库连接URL未设置")
             return False
 
-        self.db_engine = create_engine(db_url)
+        configure_logging(**cfg.get("logging", {}))
+        tracer.configure(**cfg.get("tracing", {}))
+        configure_llm(**cfg.get("llm", {}))
+        self.db_url = db_url
+        self.database_cfg = cfg.get("database", {})
+        # 模型客户端在首次调用时创建，见 utils/llm.py
         self.query_normalizer = QueryNormalizer(**cfg.query_normalizer)
         self.sql_generators = [SQLAgent() for _ in range(cfg.num_generators)]
         self.document_generator = DocumentGenerator(**cfg.document_generator)
         self.ddl_generator = DDLGenerator(**cfg.ddl_generator)
+        self.index_advisor_cfg = cfg.get("index_advisor", {})
+        self.summary_tables_cfg = cfg.get("summary_tables", {})
+        self.catalog = TableCatalog(**cfg.get("catalog", {}))
+        if not self.catalog.list_tables():
+            self.catalog.import_legacy()
+        self.catalog.subscribe(self._on_catalog_change)
+        self.sql_repair_cfg = dict(cfg.get("sql_repair", {}))
         self.active_document = None
+        self.active_table = None
+        self.concurrent = cfg.get("concurrent", True)
+        self.max_attempts = cfg.get("max_attempts", 3)
+        self.min_successes = cfg.get("min_successes", 1)
+        self.max_result_rows = cfg.get("max_result_rows", -1)
+        self.result_page_size = cfg.get("result_page_size", 100)
+        self.prompt_cfg = cfg.get("prompt", {})
+        self.limit_value = cfg.document_generator.get("limit_value", -1)
+        self._prompt_cache = {}
+        self._preview_cache = {}
 
-    def upload_excel(self, file_path: str, save_to_local: bool = True) -> bool:
-        # 读取Excel文件
+        self.example_store_cfg = cfg.get("example_store", {})
+        if self.example_store_cfg.get("enabled", False):
+            self.example_store = ExampleStore(self.example_store_cfg.get("path", "outputs/examples.db"))
+        else:
+            self.example_store = None
+
+        self.schema_graph_cfg = cfg.get("schema_graph", {})
+        self._schema_graph = None
+
+        self.profiling_cfg = dict(cfg.get("profiling", {}))
+
+        self.ingest_cfg = cfg.get("ingest", {})
+
+        self.incremental_cfg = dict(cfg.get("incremental", {}))
+
+        # 延迟创建的组件，见 _lazy
+        self._lazy_lock = threading.RLock()
+        self._components = {}
+        if not cfg.get("lazy_init", True):
+            self.warm_up()
+
+    def _lazy(self, name: str, factory: Callable):
+        """返回名为 name 的组件，首次访问时调用 factory 创建；多个线程同时访问时只创建一次"""
         try:
-            df: pd.DataFrame = pd.read_excel(file_path)
+            return self._components[name]
+        except KeyError:
+            pass
+        with self._lazy_lock:
+            if name not in self._components:
+                self._components[name] = factory()
+            return self._components[name]
+
+    def warm_up(self):
+        """
+        立即创建所有延迟创建的组件和模型客户端
+
+        lazy_init 为 false 时在初始化时调用；常驻的服务也可以在启动后调用，使第一个请求不必承担初始化开销。
+        """
+        self.db_engine
+        self.index_advisor
+        self.summary_builder
+        self.sql_repairer
+        self.profiler
+        for component in [self.query_normalizer, self.document_generator, self.ddl_generator, *self.sql_generators]:
+            component.client
+
+    @property
+    def db_engine(self):
+        """数据库引擎，首次使用时从进程内共享的引擎中取得，同一 DB_URL 的所有实例共用一个连接池"""
+
+        def create():
+            from .db import get_engine
+
+            return get_engine(
+                self.db_url, num_generators=len(self.sql_generators), concurrent=self.concurrent, **self.database_cfg
+            )
+
+        return self._lazy("db_engine", create)
+
+    @property
+    def index_advisor(self):
+        def create():
+            from .index_advisor import IndexAdvisor
+
+            return IndexAdvisor(self.db_engine, **self.index_advisor_cfg)
+
+        return self._lazy("index_advisor", create)
+
+    @property
+    def summary_builder(self):
+        def create():
+            from .summary_builder import SummaryBuilder
+
+            return SummaryBuilder(self.db_engine, **self.summary_tables_cfg)
+
+        return self._lazy("summary_builder", create)
+
+    @property
+    def sql_repairer(self):
+        """本地SQL修复器，配置中禁用时为 None"""
+
+        def create():
+            cfg = dict(self.sql_repair_cfg)
+            if not cfg.pop("enabled", True):
+                return None
+            from .sql_repair import SQLRepairer
+
+            return SQLRepairer(self.db_engine, self.catalog, **cfg)
+
+        return self._lazy("sql_repairer", create)
+
+    @property
+    def profiler(self):
+        """抽样模式下的列统计器，精确模式下为 None"""
+
+        def create():
+            cfg = dict(self.profiling_cfg)
+            if cfg.pop("mode", "exact") != "sampling":
+                return None
+            from .sampling_profiler import SamplingProfiler
+
+            return SamplingProfiler(**cfg)
+
+        return self._lazy("profiler", create)
+
+    @property
+    def ingest_queue(self) -> "IngestQueue":
+        """后台导入任务队列，首次使用时创建并恢复未完成的任务"""
+
+        def create():
+            from .ingest_queue import IngestQueue
+
+            return IngestQueue(self, **self.ingest_cfg)
+
+        return self._lazy("ingest_queue", create)
+
+    @property
+    def snapshot_store(self):
+        """每张表最近一次导入的数据快照，用于增量更新；未配置快照目录时为 None"""
+
+        def create():
+            snapshot_dir = self.incremental_cfg.get("snapshot_dir")
+            if not snapshot_dir:
+                return None
+            from .incremental import SnapshotStore
+
+            return SnapshotStore(snapshot_dir)
+
+        return self._lazy("snapshot_store", create)
+
+    def submit_excel(self, file_path: str, source=None) -> str:
+        """
+        提交后台导入任务，立即返回任务ID，可通过 `ingest_queue.get` 轮询进度和预览
+
+        args:
+            file_path (str): Excel 文件路径，任务中断后从该文件恢复
+            source (optional): 已在内存中的文件内容（bytes 或文件对象）或已解析的 DataFrame，
+                提供时任务直接使用它，不再从磁盘读取并解析
+
+        return:
+            str: 任务ID
+        """
+        return self.ingest_queue.submit(file_path, _extract_table_name(file_path), source=source)
+
+    def upload_excel(
+        self,
+        file_path: str,
+        save_to_local: bool = True,
+        table_name: str = None,
+        progress: Callable[[str], None] = None,
+    ) -> bool:
+        """
+        导入Excel文件：解析、统计列信息、生成文档和DDL、导入数据并登记到表格目录
+
+        args:
+            file_path (str): Excel 文件路径
+            save_to_local (bool): 是否将文档、DDL和列信息保存到 outputs 目录
+            table_name (str, optional): 表名，默认由文件名生成
+            progress (Callable[[str], None], optional): 进入每个阶段时的回调，
+                阶段依次为 parse / profile / document / ddl / load / finalize
+
+        return:
+            bool: 是否导入成功
+        """
+        return self.upload(file_path, table_name, save_to_local, progress)["success"]
+
+    def upload(
+        self,
+        source,
+        table_name: str = None,
+        save_to_local: bool = True,
+        progress: Callable[[str], None] = None,
+        preview_rows: int = 5,
+        on_preview: Callable[["pd.DataFrame"], None] = None,
+    ) -> dict:
+        """
+        导入工作簿，整个过程只解析一次，并返回前几行作为预览
+
+        args:
+            source: Excel 文件路径、文件内容（bytes 或文件对象）或已解析的 DataFrame
+            table_name (str, optional): 表名；source 为文件路径时默认由文件名生成，否则必须指定
+            save_to_local (bool): 是否将文档、DDL和列信息保存到 outputs 目录
+            progress (Callable[[str], None], optional): 进入每个阶段时的回调，
+                阶段依次为 parse / profile / document / ddl / load / finalize
+            preview_rows (int): 预览的行数
+            on_preview (Callable[[pd.DataFrame], None], optional): 解析完成后立即以预览调用，
+                无需等待整个导入结束
+
+        return:
+            dict: {"success", "table_name", "preview", "row_count", "column_count"}；
+                解析失败时 preview 为 None
+        """
+        if table_name is None:
+            if not isinstance(source, (str, os.PathLike)):
+                raise ValueError("导入内存中的工作簿时必须指定表名")
+            table_name = _extract_table_name(source)
+        logger.info(f"表格名称: {table_name}")
+        result = {"success": False, "table_name": table_name, "preview": None, "row_count": None, "column_count": None}
+
+        def parsed(df: "pd.DataFrame"):
+            result["preview"] = df.head(preview_rows)
+            result["row_count"], result["column_count"] = df.shape
+            if on_preview is not None:
+                on_preview(result["preview"])
+
+        # 每个阶段记录一个 span，进入下一阶段时结束上一阶段
+        stage_span = None
+
+        def enter_stage(stage: str):
+            nonlocal stage_span
+            if stage_span is not None:
+                stage_span.end()
+            stage_span = tracer.span(f"upload.{stage}", table=table_name)
+            if progress is not None:
+                progress(stage)
+
+        with tracer.span("upload", table=table_name) as span:
+            try:
+                success = self._upload_excel(source, save_to_local, table_name, enter_stage, parsed)
+            finally:
+                if stage_span is not None:
+                    stage_span.end()
+            span.set(success=success)
+        tracer.incr("excelsql_uploads_total", status="ok" if success else "failed")
+        result["success"] = success
+        return result
+
+    def _upload_excel(
+        self,
+        source,
+        save_to_local: bool,
+        table_name: str,
+        progress: Callable[[str], None],
+        parsed: Callable[["pd.DataFrame"], None],
+    ) -> bool:
+        from sqlalchemy import text
+
+        progress("parse")
+        is_path = isinstance(source, (str, os.PathLike))
+        # 读取Excel文件；内存中的内容和已解析的 DataFrame 不再经过磁盘
+        try:
+            df = _read_excel(source)
         except Exception as e:
             logger.error(f"无法读取Excel文件: {e}")
             return False
 
-        logger.info(f"已读取Excel文件: {file_path}")
+        logger.info(f"已读取Excel文件: {source if is_path else table_name}")
+        parsed(df)
 
-        table_name = _extract_table_name(file_path)
-        logger.info(f"表格名称: {table_name}")
+        # 提取表格信息；抽样模式在解析结果上抽样，高基数列的统计开销与行数无关
+        progress("profile")
+        if self.profiler is not None:
+            column_info, _ = self.profiler.profile_frame(df)
+        else:
+            column_info = _extract_table_info(df)
+        document, ddl, doc_path, document_dir = self._generate_artifacts(
+            table_name, column_info, save_to_local, progress
+        )
+
+        progress("load")
+        self.index_advisor.register_table(table_name, len(df), column_info)
+
+        # 使用sqlalchemy执行DDL并上传数据
+        try:
+            # 执行DDL创建表
+            with self.db_engine.connect() as connection:
+                connection.execute(text(ddl))
+                connection.commit()
+                logger.info(f"表格 {table_name} 成功创建")
+
+                # 将DataFrame数据上传到数据库
+                # FIXME: to_sql也会创建表格，这里暂时用append模式
+                df.to_sql(
+                    name=table_name,
+                    con=self.db_engine,
+                    if_exists="append",
+                    index=False,
+                    chunksize=1000,
+                )
+                logger.info(f"成功上传Excel数据至数据库表 {table_name}")
+
+        except Exception as e:
+            logger.error(f"上传数据到数据库失败: {e}")
+            return False
+
+        # 结构化列信息，与文档一起保存
+        progress("finalize")
+        profile = build_column_profile(
+            table_name,
+            column_info,
+            len(df),
+            document=document,
+            ddl=ddl,
+            max_values=self.limit_value if self.limit_value > 0 else 50,
+        )
+        if self.schema_graph_cfg.get("enabled", False):
+            from .schema_graph import add_minhash_signatures
+
+            add_minhash_signatures(profile, df, self.schema_graph_cfg.get("num_perm", 64))
+
+        # 构建预聚合汇总表，并在文档中说明以便生成的SQL直接查询汇总表
+        summary_specs = self.summary_builder.build(table_name, df, column_info)
+        profile["summary_tables"] = summary_specs
+        if summary_specs:
+            document += self.summary_builder.describe(summary_specs)
+            logger.info(f"表格 {table_name} 文档已补充 {len(summary_specs)} 张汇总表的说明")
+            if save_to_local:
+                with open(doc_path, "w") as f:
+                    f.write(document)
+
+        if save_to_local:
+            profile_path = os.path.join(document_dir, f"{table_name}.json")
+            with open(profile_path, "w") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+            logger.info(f"表格 {table_name} 列信息已保存至 {profile_path}")
+
+        # 登记到表格目录
+        self.catalog.put(
+            table_name,
+            document=document,
+            ddl=ddl,
+            profile=profile,
+            row_count=len(df),
+            content_hash=_content_hash(df),
+        )
+        del column_info
+        # 快照在首次增量更新时才创建；已有快照的表格重新导入后需要同步更新
+        if self.snapshot_store is not None and self.snapshot_store.exists(table_name):
+            self._save_snapshot(table_name, df)
+
+        return True
+
+    def _save_snapshot(self, table_name: str, df: "pd.DataFrame"):
+        if self.snapshot_store is None:
+            return
+        try:
+            self.snapshot_store.save(table_name, df)
+        except Exception as e:
+            # 没有快照时下次增量更新会整表重写，不影响本次导入
+            logger.warning(f"保存表格 {table_name} 的快照失败: {e}")
+
+    def refresh_excel(
+        self,
+        source,
+        table_name: str = None,
+        key_columns: list = None,
+        progress: Callable[[str], None] = None,
+    ) -> dict:
+        """
+        用更新后的工作簿增量更新已导入的表格：只写入变化的行，不重新生成文档和DDL
+
+        与上次导入的快照比较得到插入、更新和删除的行，在一个事务中分批写入；
+        随后在本地重新统计列信息并更新表格目录，内容变化时数据版本加一，依赖该表的缓存随之失效。
+        快照在表格首次增量更新时才创建，此时还没有可比较的数据，整表在一个事务中重写。
+        表格尚未导入或列结构发生变化时退回完整导入。
+
+        args:
+            source: Excel 文件路径、文件内容（bytes 或文件对象）或已解析的 DataFrame
+            table_name (str, optional): 表名；source 为文件路径时默认由文件名生成，否则必须指定
+            key_columns (list, optional): 唯一标识一行的键列，按键匹配更新的行；
+                未指定时沿用上次增量更新的键列，仍没有时按整行内容匹配
+            progress (Callable[[str], None], optional): 进入每个阶段时的回调，
+                阶段依次为 parse / diff / load / finalize；退回完整导入时同 `upload`
+
+        return:
+            dict: {"success", "table_name", "mode", "inserted", "updated", "deleted", "row_count", "data_version"}，
+                mode 为 "incremental"、"replace"（没有快照，整表重写）或 "full"（完整导入）
+        """
+        if table_name is None:
+            if not isinstance(source, (str, os.PathLike)):
+                raise ValueError("导入内存中的工作簿时必须指定表名")
+            table_name = _extract_table_name(source)
+        result = {
+            "success": False,
+            "table_name": table_name,
+            "mode": "incremental",
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+            "row_count": None,
+            "data_version": None,
+        }
+        enter_stage = progress or (lambda stage: None)
+
+        with tracer.span("refresh", table=table_name) as span:
+            enter_stage("parse")
+            try:
+                df = _read_excel(source)
+            except Exception as e:
+                logger.error(f"无法读取Excel文件: {e}")
+                span.set(success=False)
+                return result
+
+            entry = self.catalog.get(table_name)
+            try:
+                refreshed = entry is not None and self._refresh_table(entry, df, key_columns, enter_stage, result)
+            except Exception as e:
+                logger.error(f"增量更新表格 {table_name} 失败: {e}")
+                span.set(success=False)
+                return result
+
+            if not refreshed:
+                # 新表或列结构变化：完整导入，需要重新生成文档和DDL
+                result["mode"] = "full"
+                if entry is None:
+                    upload = self.upload(df, table_name, progress=progress)
+                else:
+                    upload = self._reimport_table(df, table_name, progress)
+                result["success"] = upload["success"]
+                result["inserted"] = result["row_count"] = upload["row_count"]
+                entry = self.catalog.get(table_name)
+                result["data_version"] = entry["data_version"] if entry else None
+            span.set(success=result["success"], mode=result["mode"])
+
+        tracer.incr("excelsql_refreshes_total", mode=result["mode"], status="ok" if result["success"] else "failed")
+        return result
+
+    def _reimport_table(self, df: "pd.DataFrame", table_name: str, progress: Callable[[str], None]) -> dict:
+        """
+        列结构变化时完整导入：旧表先改名保留，导入成功后删除，失败时恢复，
+        使表格目录、汇总表和快照仍与数据库中的表一致
+        """
+        from sqlalchemy import text
+
+        quote = self.db_engine.dialect.identifier_preparer.quote
+        backup_name = f"{table_name}__backup"
+        with self.db_engine.begin() as connection:
+            connection.execute(text(f"DROP TABLE IF EXISTS {quote(backup_name)}"))
+            connection.execute(text(f"ALTER TABLE {quote(table_name)} RENAME TO {quote(backup_name)}"))
 
-        # 提取表格信息
+        try:
+            upload = self.upload(df, table_name, progress=progress)
+        except Exception as e:
+            logger.error(f"重新导入表格 {table_name} 失败: {e}")
+            upload = {"success": False, "row_count": None}
+
+        try:
+            with self.db_engine.begin() as connection:
+                if upload["success"]:
+                    connection.execute(text(f"DROP TABLE {quote(backup_name)}"))
+                else:
+                    connection.execute(text(f"DROP TABLE IF EXISTS {quote(table_name)}"))
+                    connection.execute(text(f"ALTER TABLE {quote(backup_name)} RENAME TO {quote(table_name)}"))
+                    logger.info(f"表格 {table_name} 重新导入失败，已恢复原表")
+        except Exception as e:
+            if upload["success"]:
+                logger.warning(f"删除表格 {table_name} 的备份 {backup_name} 失败: {e}")
+            else:
+                # 原表无法恢复：删除目录登记和快照，避免它们指向不存在的表
+                logger.error(f"恢复表格 {table_name} 失败，已从表格目录中移除: {e}")
+                self.catalog.delete(table_name)
+                if self.snapshot_store is not None:
+                    self.snapshot_store.delete(table_name)
+        return upload
+
+    def _refresh_table(
+        self,
+        entry: dict,
+        df: "pd.DataFrame",
+        key_columns: list,
+        progress: Callable[[str], None],
+        result: dict,
+    ) -> bool:
+        """增量更新已登记的表格；列结构变化需要完整导入时返回 False"""
+        from .incremental import DeltaMismatchError, apply_delta, compute_delta, same_schema
+
+        table_name = entry["name"]
+        profile = dict(entry.get("profile") or {})
+        key_columns = list(key_columns or profile.get("key_columns") or []) or None
+        batch_size = self.incremental_cfg.get("batch_size", 1000)
+
+        progress("diff")
+        snapshot = self.snapshot_store.load(table_name) if self.snapshot_store is not None else None
+        if snapshot is not None:
+            schema_changed = not same_schema(snapshot, df)
+        else:
+            # 没有快照时只能按目录中登记的列名判断
+            schema_changed = [column["name"] for column in profile.get("columns", [])] != [str(c) for c in df.columns]
+        if schema_changed:
+            logger.info(f"表格 {table_name} 的列结构已变化，重新完整导入")
+            return False
+
+        progress("load")
+        counts = None
+        if snapshot is not None:
+            delta = compute_delta(snapshot, df, key_columns)
+            try:
+                counts = apply_delta(self.db_engine, table_name, delta, key_columns, batch_size)
+            except DeltaMismatchError as e:
+                # 增量事务已回滚，表与快照不同步，改为整表替换
+                logger.warning(f"{e}，改为整表替换")
+        if counts is None:
+            # 没有可信的上次导入数据可比较：在一个事务中清空并重新写入，仍不重新生成文档和DDL
+            result["mode"] = "replace"
+            delta = {"inserts": df, "updates": df.iloc[0:0], "deletes": df.iloc[0:0]}
+            counts = apply_delta(self.db_engine, table_name, delta, batch_size=batch_size, replace=True)
+        result.update(counts)
+
+        # 列信息在本地重新统计，沿用已有的文档和DDL，不调用模型
+        progress("finalize")
         column_info = _extract_table_info(df)
+        self.index_advisor.update_table(table_name, len(df), column_info)
+        document = entry["document"]
+        if profile.get("summary_tables"):
+            document = self.summary_builder.strip_description(document)
+        new_profile = build_column_profile(
+            table_name,
+            column_info,
+            len(df),
+            document=document,
+            ddl=entry["ddl"],
+            max_values=self.limit_value if self.limit_value > 0 else 50,
+        )
+        if self.schema_graph_cfg.get("enabled", False):
+            from .schema_graph import add_minhash_signatures
+
+            add_minhash_signatures(new_profile, df, self.schema_graph_cfg.get("num_perm", 64))
+
+        # 汇总表按内容指纹只重建变化的部分
+        summary_specs = self.summary_builder.build(table_name, df, column_info)
+        new_profile["summary_tables"] = summary_specs
+        if summary_specs:
+            document += self.summary_builder.describe(summary_specs)
+        if key_columns:
+            new_profile["key_columns"] = key_columns
+
+        entry = self.catalog.put(
+            table_name,
+            document=document,
+            profile=new_profile,
+            row_count=len(df),
+            content_hash=_content_hash(df),
+        )
+        self._save_snapshot(table_name, df)
+        result["success"] = True
+        result["row_count"] = len(df)
+        result["data_version"] = entry["data_version"]
+        return True
+
+    def _generate_artifacts(
+        self, table_name: str, column_info: dict, save_to_local: bool, progress: Callable[[str], None]
+    ) -> tuple:
+        """生成并保存表格文档和DDL，返回 (文档, DDL, 文档路径, 文档目录)"""
+        doc_path = document_dir = None
 
         # 生成文档
+        progress("document")
         document = self.document_generator(table_name, column_info)
         logger.info(f"表格 {table_name} 文档已生成")
 
@@ -88,9 +674,8 @@ class ExcelSQL:
                 f.write(document)
             logger.info(f"表格 {table_name} 文档已保存至 {doc_path}")
 
-        del column_info
-
         # 生成DDL
+        progress("ddl")
         ddl = self.ddl_generator(table_name, document)
         logger.info(f"表格 {table_name} DDL已生成")
 
@@ -103,128 +688,367 @@ class ExcelSQL:
                 f.write(ddl)
             logger.info(f"表格 {table_name} DDL已保存至 {ddl_path}")
 
-        # 使用sqlalchemy执行DDL并上传数据
-        try:
-            # 执行DDL创建表
+        return document, ddl, doc_path, document_dir
+
+    def read_document(self, table_name: str) -> Optional[str]:
+        """
+        读取表格的提示词文档并设为当前文档
+
+        args:
+            table_name (str): 表名
+
+        return:
+            str: 文档；表格不存在或没有文档时返回 None，当前文档保持不变
+        """
+        entry = self.catalog.get(table_name)
+        if entry is None or entry["document"] is None:
+            logger.error(f"表格 {table_name} 的文档不存在")
+            return None
+
+        self.active_document = self._prompt_document(entry)
+        self.active_table = table_name
+        return self.active_document
+
+    def _prompt_document(self, entry: dict) -> str:
+        """
+        返回放入SQL生成提示词中的文档
+
+        启用紧凑模式且表格有结构化列信息时，按token预算渲染紧凑文档（按表格版本缓存），
+        否则使用完整文档。
+        """
+        profile = entry["profile"]
+        if not self.prompt_cfg.get("compact", False) or not profile or "columns" not in profile:
+            return entry["document"]
+
+        key = (entry["name"], entry["updated_at"])
+        if key not in self._prompt_cache:
+            self._prompt_cache[key] = render_compact_prompt(
+                profile,
+                token_budget=self.prompt_cfg.get("token_budget", 1500),
+                max_examples=self.prompt_cfg.get("max_examples", 5),
+            )
+        return self._prompt_cache[key]
+
+    def list_tables(self) -> list:
+        """返回表格目录中的所有表名"""
+        return self.catalog.list_tables()
+
+    def preview_table(self, table_name: str, n: int = 5) -> dict:
+        """
+        表格预览：只读取前 n 行，行数和列数取自表格目录，不扫描整张表
+
+        结果按表格的数据版本缓存，表格重新导入（数据版本变化）后才会再次查询数据库。
+
+        args:
+            table_name (str): 表名
+            n (int): 预览的行数
+
+        return:
+            dict: {"rows": QueryResult, "row_count", "column_count", "data_version"}；表格不存在时返回 None
+        """
+        entry = self.catalog.get(table_name)
+        if entry is None:
+            return None
+
+        key = (entry["data_version"], n)
+        cached = self._preview_cache.get(table_name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        from sqlalchemy import literal_column, select, table
+        from .utils.result import QueryResult
+
+        statement = select(literal_column("*")).select_from(table(table_name)).limit(n)
+        with tracer.span("preview", table=table_name):
             with self.db_engine.connect() as connection:
-                connection.execute(text(ddl))
-                connection.commit()
-                logger.info(f"表格 {table_name} 成功创建")
+                result = connection.execute(statement)
+                rows = QueryResult.from_rows(result.keys(), result.fetchall())
 
-                # 将DataFrame数据上传到数据库
-                # FIXME: to_sql也会创建表格，这里暂时用append模式
-                df.to_sql(
-                    name=table_name,
-                    con=self.db_engine,
-                    if_exists="append",
-                    index=False,
-                    chunksize=1000,
-                )
-                logger.info(f"成功上传Excel数据至数据库表 {table_name}")
+        profile = entry["profile"] or {}
+        preview = {
+            "rows": rows,
+            "row_count": entry["row_count"],
+            "column_count": len(profile.get("columns", rows.columns)),
+            "data_version": entry["data_version"],
+        }
+        self._preview_cache[table_name] = (key, preview)
+        return preview
 
-        except Exception as e:
-            logger.error(f"上传数据到数据库失败: {e}")
-            return False
+    def _on_catalog_change(self, changed: set):
+        self._schema_graph = None
+        for table_name in changed:
+            self._preview_cache.pop(table_name, None)
+        # 当前表格在其他进程中被重新上传时，刷新已加载的文档
+        if self.active_table in changed:
+            entry = self.catalog.get(self.active_table)
+            self.active_document = self._prompt_document(entry) if entry else None
 
-        return True
+    @property
+    def schema_graph(self) -> "SchemaGraph":
+        """跨所有表格的结构图，表格目录变化后重新构建"""
+        from .schema_graph import SchemaGraph
 
-    def read_document(self, table_name: str):
-        doc_path = f"outputs/document/{table_name}.txt"
-        try:
-            # 读取所有内容
-            with open(doc_path, "r") as f:
-                self.active_document = f.read()
-                logger.info(f"已加载文档: {doc_path}")
-        except FileNotFoundError:
-            logger.error(f"文档 {doc_path} 不存在")
+        if self._schema_graph is None:
+            self._schema_graph = SchemaGraph.from_catalog(
+                self.catalog,
+                min_join_score=self.schema_graph_cfg.get("min_join_score", 0.5),
+                max_tables=self.schema_graph_cfg.get("max_tables", 3),
+                min_containment=self.schema_graph_cfg.get("min_containment", 0.2),
+            )
+        return self._schema_graph
+
+    def select_tables(self, query: str) -> tuple:
+        """
+        为问题选择相关的表和连接路径，并拼接成SQL生成使用的文档
+
+        args:
+            query (str): 标准化后的问题
+
+        return:
+            tuple: (文档, 选中的表名列表)
+        """
+        selection = self.schema_graph.select(query)
+        documents = []
+        for table_name in selection["tables"]:
+            documents.append(self._prompt_document(self.catalog.get(table_name)))
+        join_description = self.schema_graph.describe_joins(selection["joins"])
+        if join_description:
+            documents.append(join_description)
+        logger.info(f"问题涉及的表：{selection['tables']}")
+        return "\n\n".join(documents), selection["tables"]
+
+    def _table_versions(self, tables: list) -> dict:
+        versions = {}
+        for table_name in tables:
+            entry = self.catalog.get(table_name)
+            versions[table_name] = entry["data_version"] if entry else None
+        return versions
 
     def normalize_query(self, query: str) -> str:
-        return self.query_normalizer.normalize(query)
+        with tracer.span("normalize"):
+            return self.query_normalizer.normalize(query)
 
 
     def generate_sqls_and_check(
         self,
         query: str,
         concurrent: bool = True,
+        document: str = None,
+        examples: list = None,
     ) -> list:
+        if document is None:
+            document = self.active_document
+
         if concurrent:
             with ThreadPoolExecutor() as executor:
                 results = list(
                     executor.map(
-                        self._generate_sql_and_check,
+                        tracer.wrap(self._generate_sql_and_check),
                         [query] * len(self.sql_generators),
-                        [self.active_document] * len(self.sql_generators),
+                        [document] * len(self.sql_generators),
                         range(len(self.sql_generators)),
+                        [examples] * len(self.sql_generators),
                     )
                 )
         else:
             results = [
-                self._generate_sql_and_check(query, self.active_document, idx)
+                self._generate_sql_and_check(query, document, idx, examples)
                 for idx in range(len(self.sql_generators))
             ]
 
         return results
 
-    def _generate_sql_and_check(self, query: str, document: str, idx: int = 0) -> dict:
-        sql = self.sql_generators[idx].generate_sql(query, document)
+    def _generate_sql_and_check(self, query: str, document: str, idx: int = 0, examples: list = None) -> dict:
+        with tracer.span("generate", generator=idx) as span:
+            sql = self.sql_generators[idx].generate_sql(query, document, examples)
+            result = self._check_and_repair(sql)
+            span.set(ok=result["flag"])
+        return result
+
+    def _check_and_repair(self, sql: str) -> dict:
+        """
+        验证SQL，执行失败时先在本地修复，修复成功则无需调用LLM重新生成
+
+        args:
+            sql (str): 待验证的SQL
+
+        return:
+            dict: {"sql", "flag", "denotation"}，本地修复成功时额外包含 "repairs"
+        """
         flag, denotation = self._check_sql(sql)
+        if flag or self.sql_repairer is None:
+            return {"sql": sql, "flag": flag, "denotation": denotation}
+
+        with tracer.span("sql.repair") as span:
+            repaired_sql, repaired_flag, repaired_denotation, repairs = self.sql_repairer.repair(
+                sql, denotation, self._check_sql
+            )
+            span.set(ok=repaired_flag, repairs=repairs)
+        tracer.incr("excelsql_sql_repairs_total", status="ok" if repaired_flag else "failed")
+        if repaired_flag:
+            return {"sql": repaired_sql, "flag": True, "denotation": repaired_denotation, "repairs": repairs}
         return {"sql": sql, "flag": flag, "denotation": denotation}
 
 
     def _check_sql(self, sql: str) -> tuple:
+        with tracer.span("sql.execute") as span:
+            flag, result = self._execute_sql(sql)
+            span.set(ok=flag, rows=result.num_rows if flag else 0)
+        tracer.incr("excelsql_sql_executions_total", status="ok" if flag else "error")
+        return flag, result
+
+    def _execute_sql(self, sql: str) -> tuple:
+        from sqlalchemy import text
+        from .utils.result import QueryResult
+
         try:
             with self.db_engine.connect() as connection:
+                if self.max_result_rows > 0:
+                    # 流式执行，只读取前 max_result_rows 行用于验证和投票
+                    connection = connection.execution_options(stream_results=True)
                 result = connection.execute(text(sql))
                 
                 if result.returns_rows:
-                    rows = result.fetchall()
-                    columns = result.keys()
-                    result_data = [dict(zip(columns, row)) for row in rows]
+                    if self.max_result_rows > 0:
+                        rows = result.fetchmany(self.max_result_rows + 1)
+                        truncated = len(rows) > self.max_result_rows
+                        rows = rows[: self.max_result_rows]
+                        result.close()
+                    else:
+                        rows = result.fetchall()
+                        truncated = False
+                    result_data = QueryResult.from_rows(result.keys(), rows, truncated=truncated)
                 else:
-                    result_data = {"affected_rows": result.rowcount}
-                    
+                    result_data = QueryResult.from_rowcount(result.rowcount)
+
+
                 return True, result_data
         except Exception as e:
             return False, f"执行错误: {str(e)}"
 
+    def open_result(self, sql: str, page_size: int = None, first_result: "QueryResult" = None) -> "ResultPager":
+        """
+        分页读取SQL的完整结果
+
+        args:
+            sql (str): 查询语句
+            page_size (int, optional): 每页行数，默认使用配置中的 result_page_size
+            first_result (QueryResult, optional): 验证时已执行得到的结果，用于前几页，避免重新执行SQL
+
+        return:
+            ResultPager: 分页读取器，可调用 first_page/next_page/total_count；结果被截断时按确定的顺序逐页查询
+        """
+        from .result_pager import ResultPager
+
+        return ResultPager(self.db_engine, sql, page_size or self.result_page_size, first_result)
+
     def regenerate_sqls(
         self,
         query: str,
         sql: str,
         error: str,
         concurrent: bool = True,
+        document: str = None,
+        examples: list = None,
     ) -> list:
+        if document is None:
+            document = self.active_document
+
         if concurrent:
             with ThreadPoolExecutor() as executor:
                 results = list(
                     executor.map(
-                        self._regenerate_sql,
+                        tracer.wrap(self._regenerate_sql),
                         [query] * len(self.sql_generators),
-                        [self.active_document] * len(self.sql_generators),
+                        [document] * len(self.sql_generators),
                         [sql] * len(self.sql_generators),
                         [error] * len(self.sql_generators),
                         range(len(self.sql_generators)),
+                        [examples] * len(self.sql_generators),
                     )
                 )
         else:
             results = [
-                self._regenerate_sql(query, self.active_document, sql, error, idx)
+                self._regenerate_sql(query, document, sql, error, idx, examples)
                 for idx in range(len(self.sql_generators))
             ]
 
         return results
 
-    def _regenerate_sql(self, query: str, document: str, sql: str, error: str, idx: int = 0) -> dict:
+    def regenerate_failed_sqls(
+        self,
+        query: str,
+        candidates: list,
+        concurrent: bool = True,
+        document: str = None,
+        examples: list = None,
+    ) -> list:
+        """
+        只重新生成执行失败的候选SQL
+
+        执行成功的候选SQL及其结果原样保留；每个失败的候选SQL由生成它的生成器
+        根据自己的SQL和错误信息重新生成。
+
+        args:
+            query (str): 标准化后的问题
+            candidates (list): 当前的候选SQL，第 i 个由第 i 个生成器生成
+            concurrent (bool): 是否并发重新生成
+            document (str, optional): 表格文档，默认使用当前已加载的文档
+            examples (list, optional): 相似的已验证示例
+
+        return:
+            list: 合并后的候选SQL，顺序与输入一致
+        """
+        if document is None:
+            document = self.active_document
+
+        failed = [idx for idx, candidate in enumerate(candidates) if not candidate["flag"]]
+        generator_idxs = [idx % len(self.sql_generators) for idx in failed]
+        if concurrent and len(failed) > 1:
+            with ThreadPoolExecutor() as executor:
+                results = list(
+                    executor.map(
+                        tracer.wrap(self._regenerate_sql),
+                        [query] * len(failed),
+                        [document] * len(failed),
+                        [candidates[idx]["sql"] for idx in failed],
+                        [str(candidates[idx]["denotation"]) for idx in failed],
+                        generator_idxs,
+                        [examples] * len(failed),
+                    )
+                )
+        else:
+            results = [
+                self._regenerate_sql(
+                    query, document, candidates[idx]["sql"], str(candidates[idx]["denotation"]), generator_idx, examples
+                )
+                for idx, generator_idx in zip(failed, generator_idxs)
+            ]
+
+        merged = list(candidates)
+        for idx, result in zip(failed, results):
+            merged[idx] = result
+        return merged
+
+    def _regenerate_sql(
+        self, query: str, document: str, sql: str, error: str, idx: int = 0, examples: list = None
+    ) -> dict:
         context = f"之前执行失败的SQL: {sql}，执行时的错误信息: {error}"
         document = document + context
-        regenerated_sql = self.sql_generators[idx].generate_sql(query, document)
-        flag, denotation = self._check_sql(regenerated_sql)
-        return {"sql": regenerated_sql, "flag": flag, "denotation": denotation}
+        with tracer.span("regenerate", generator=idx) as span:
+            regenerated_sql = self.sql_generators[idx].generate_sql(query, document, examples)
+            result = self._check_and_repair(regenerated_sql)
+            span.set(ok=result["flag"])
+        tracer.incr("excelsql_regenerations_total")
+        return result
 
 
     def poll_sqls(self, sqls: list) -> tuple:
-        sorter = Sort(sqls)
-        sorted_sqls = sorter.sort_by_result_frequency()
+        from .utils.sort import Sort
+
+        with tracer.span("vote", candidates=len(sqls)):
+            sorter = Sort(sqls)
+            sorted_sqls = sorter.sort_by_result_frequency()
 
         sql = sorted_sqls[0]["sql"]
         flag = sorted_sqls[0]["flag"]
@@ -232,4 +1056,135 @@ class ExcelSQL:
 
         return sql, flag, denotation
 
+    def answer(self, question: str, table_name: str = None) -> dict:
+        """
+        回答用户问题：标准化、生成SQL、投票，并在失败时有限次数地重新生成
+
+        已执行过的SQL结果会被直接复用，不会再次执行；执行成功的候选SQL少于 min_successes 时，
+        只重新生成失败的候选SQL，并在合并后的候选集合上重新投票。
+
+        args:
+            question (str): 用户输入的原始问题
+            table_name (str, optional): 表名。未指定时，若启用了多表结构图则自动选择相关的表，
+                否则使用当前已加载的文档；表格不存在或没有可用的文档时不调用模型，flag 为 False
 
+        return:
+            dict: 包含标准化查询、涉及的表、最终SQL、执行状态、结果、候选SQL、错误信息与追踪ID
+        """
+        with tracer.span("answer", table=table_name) as span:
+            result = self._answer(question, table_name)
+            span.set(ok=result["flag"], attempts=result["attempts"], reused=result["reused"])
+        tracer.incr("excelsql_questions_total", status="ok" if result["flag"] else "failed")
+        result["trace_id"] = span.trace_id
+        return result
+
+    @staticmethod
+    def _no_document(question: str, error: str, normalized_query: str = None) -> dict:
+        """没有可用文档时的回答结果，不调用模型生成SQL"""
+        logger.error(f"无法回答问题：{error}")
+        return {
+            "question": question,
+            "normalized_query": normalized_query,
+            "tables": [],
+            "reused": False,
+            "sql": None,
+            "flag": False,
+            "denotation": error,
+            "candidates": [],
+            "attempts": 0,
+            "errors": [error],
+        }
+
+    def _answer(self, question: str, table_name: str = None) -> dict:
+        # 先确定文档，找不到时在调用模型之前失败
+        use_schema_graph = table_name is None and self.schema_graph_cfg.get("enabled", False)
+        if table_name is not None:
+            document = self.read_document(table_name)
+            tables = [table_name]
+        elif not use_schema_graph:
+            document = self.active_document
+            tables = [self.active_table]
+        if not use_schema_graph and document is None:
+            return self._no_document(question, f"表格 {table_name} 不存在" if table_name else "未指定表格")
+
+        normalized_query = self.normalize_query(question)
+        logger.info(f"标准化后的查询：{normalized_query}")
+
+        if use_schema_graph:
+            document, tables = self.select_tables(normalized_query)
+            if not tables:
+                return self._no_document(question, "未找到与问题相关的表格", normalized_query)
+
+        # 检索相似的已验证示例；近似重复的问题直接复用其SQL，无需调用LLM
+        examples = []
+        versions = {}
+        use_examples = self.example_store is not None and None not in tables
+        if use_examples:
+            versions = self._table_versions(tables)
+            examples = self.example_store.search(
+                normalized_query, tables, top_k=self.example_store_cfg.get("top_k", 3)
+            )
+            reusable = self.example_store.best_match(
+                normalized_query, tables, versions, self.example_store_cfg.get("reuse_threshold", 0.95)
+            )
+        else:
+            reusable = None
+
+        candidates = []
+        reused = False
+        if reusable is not None:
+            flag, denotation = self._check_sql(reusable["sql"])
+            if flag:
+                logger.info(f"复用相似问题（相似度 {reusable['score']:.2f}）的已验证SQL")
+                candidates = [{"sql": reusable["sql"], "flag": True, "denotation": denotation}]
+                reused = True
+
+        if not candidates:
+            candidates = self.generate_sqls_and_check(
+                query=normalized_query,
+                concurrent=self.concurrent,
+                document=document,
+                examples=examples,
+            )
+
+        errors = []
+        attempt = 0
+        while True:
+            # 只在执行成功的候选SQL中投票，避免相同的错误信息胜出
+            succeeded = [c for c in candidates if c["flag"]]
+            failed = [c for c in candidates if not c["flag"]]
+            sql, flag, denotation = self.poll_sqls(succeeded or candidates)
+            if not failed or len(succeeded) >= self.min_successes or attempt >= self.max_attempts:
+                break
+
+            attempt += 1
+            errors.extend(str(c["denotation"]) for c in failed)
+            logger.warning(
+                f"{len(failed)} 条SQL执行失败（重新生成 {attempt}/{self.max_attempts}）: {failed[0]['denotation']}"
+            )
+            candidates = self.regenerate_failed_sqls(
+                query=normalized_query,
+                candidates=candidates,
+                concurrent=self.concurrent,
+                document=document,
+                examples=examples,
+            )
+
+        if flag:
+            for table in tables:
+                self.index_advisor.record(table, sql)
+            if use_examples and not reused:
+                self.example_store.add(question, normalized_query, tables, versions, sql)
+
+        return {
+            "question": question,
+            "normalized_query": normalized_query,
+            "tables": tables,
+            "reused": reused,
+            "sql": sql,
+            "flag": flag,
+            "denotation": denotation,
+            "candidates": candidates,
+            "attempts": attempt,
+            "errors": errors,
+        }
@@ -0,0 +1,230 @@
+import os
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, and_, bindparam, delete, insert, update
+from .utils.log import logger
+
+
+class DeltaMismatchError(Exception):
+    """数据库表中实际删除或更新的行数与快照推算的不一致，表与快照已不同步"""
+
+
+def row_hashes(df: pd.DataFrame) -> pd.Series:
+    """每行内容的 64 位哈希，列的顺序和取值都相同的行哈希相同"""
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def _records(df: pd.DataFrame) -> list:
+    """转换为绑定参数用的字典列表，缺失值转为 None"""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+class SnapshotStore:
+    """
+    每张表最近一次导入的数据快照
+
+    增量更新时与新文件比较得到变化的行；快照是本项目自己写入的本地文件，
+    以 pickle 保存以保留各列的数据类型。
+    """
+
+    def __init__(self, snapshot_dir: str = "outputs/snapshots"):
+        """
+        args:
+            snapshot_dir (str): 快照目录
+        """
+        self.snapshot_dir = snapshot_dir
+
+    def _path(self, table_name: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{table_name}.pkl")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(self._path(table_name))
+
+    def load(self, table_name: str) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_pickle(self._path(table_name))
+        except FileNotFoundError:
+            return None
+
+    def save(self, table_name: str, df: pd.DataFrame):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # 先写临时文件再替换，中断时不会留下不完整的快照
+        tmp_path = self._path(table_name) + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, self._path(table_name))
+
+    def delete(self, table_name: str):
+        try:
+            os.remove(self._path(table_name))
+        except FileNotFoundError:
+            pass
+
+
+def same_schema(old: pd.DataFrame, new: pd.DataFrame) -> bool:
+    """列名、列顺序和数据类型都相同时才能增量更新"""
+    return list(old.columns) == list(new.columns) and list(old.dtypes) == list(new.dtypes)
+
+
+def compute_delta(old: pd.DataFrame, new: pd.DataFrame, key_columns: List[str] = None) -> dict:
+    """
+    比较两次导入的数据，得到需要插入、更新和删除的行
+
+    指定键列时按键匹配：新键插入，消失的键删除，键相同但内容不同的行更新。
+    未指定键列时按整行内容匹配：内容相同的行视为未变化；某种内容的行数减少时，
+    删除该内容的所有行并按新文件中的数量重新插入。
+
+    args:
+        old (pd.DataFrame): 上次导入的数据
+        new (pd.DataFrame): 本次导入的数据
+        key_columns (List[str], optional): 唯一标识一行的键列
+
+    return:
+        dict: {"inserts", "updates", "deletes"}，均为 DataFrame；
+            按键匹配时 deletes 只包含键列，按内容匹配时 deletes 为待删除内容的代表行。
+            另含 expected_deleted：表与快照一致时删除语句应删除的行数
+    """
+    old_hashes = row_hashes(old).to_numpy()
+    new_hashes = row_hashes(new).to_numpy()
+
+    if key_columns:
+        missing = [column for column in key_columns if column not in new.columns]
+        if missing:
+            raise ValueError(f"键列不存在: {missing}")
+        if new.duplicated(key_columns).any() or old.duplicated(key_columns).any():
+            raise ValueError(f"键列 {key_columns} 存在重复值，无法按键增量更新")
+
+        old_keys = old[key_columns].assign(_row_hash=old_hashes)
+        new_keys = new[key_columns].assign(_row_hash=new_hashes, _position=np.arange(len(new)))
+        # 内连接保留 uint64 哈希的精度，外连接只用于找出新增和消失的键
+        both = old_keys.merge(new_keys, on=key_columns, suffixes=("_old", "_new"))
+        changed = both.loc[both["_row_hash_old"] != both["_row_hash_new"], "_position"]
+        outer = old[key_columns].merge(
+            new_keys[key_columns + ["_position"]], on=key_columns, how="outer", indicator=True
+        )
+        return {
+            "inserts": new.iloc[outer.loc[outer["_merge"] == "right_only", "_position"].astype(int)],
+            "updates": new.iloc[changed.to_numpy()],
+            "deletes": outer.loc[outer["_merge"] == "left_only", key_columns],
+            "expected_deleted": int((outer["_merge"] == "left_only").sum()),
+        }
+
+    old_series = pd.Series(old_hashes)
+    new_series = pd.Series(new_hashes)
+    diff = new_series.value_counts().sub(old_series.value_counts(), fill_value=0)
+    grown = diff[diff > 0]
+    shrunk = diff[diff < 0].index
+
+    # 行数增加的内容只插入增加的部分（相同内容的行可以互换）；
+    # 行数减少的内容全部删除后按新文件中的数量重新插入
+    occurrence = new_series.groupby(new_series).cumcount().to_numpy()
+    insert_mask = occurrence < new_series.map(grown).fillna(0).to_numpy()
+    reinsert_mask = new_series.isin(shrunk).to_numpy()
+    delete_mask = ~old_series.duplicated().to_numpy() & old_series.isin(shrunk).to_numpy()
+    return {
+        "inserts": new[insert_mask | reinsert_mask],
+        "updates": new.iloc[0:0],
+        "deletes": old[delete_mask],
+        "expected_deleted": int(old_series.isin(shrunk).sum()),
+    }
+
+
+def _match(table: Table, columns: List[str], null_safe: bool):
+    conditions = []
+    for idx, column in enumerate(columns):
+        parameter = bindparam(f"_k{idx}")
+        if null_safe:
+            conditions.append(table.c[column].is_not_distinct_from(parameter))
+        else:
+            conditions.append(table.c[column] == parameter)
+    return and_(*conditions)
+
+
+def _key_params(df: pd.DataFrame, columns: List[str]) -> list:
+    return [{f"_k{idx}": row[column] for idx, column in enumerate(columns)} for row in _records(df[columns])]
+
+
+def _batches(params: list, batch_size: int):
+    for start in range(0, len(params), batch_size):
+        yield params[start : start + batch_size]
+
+
+def _execute_counted(connection, statement, params: list, batch_size: int) -> int:
+    """分批执行并返回影响的总行数；驱动的 executemany 不能给出准确行数时逐行执行"""
+    if not connection.dialect.supports_sane_multi_rowcount:
+        return sum(connection.execute(statement, param).rowcount for param in params)
+    return sum(connection.execute(statement, batch).rowcount for batch in _batches(params, batch_size))
+
+
+def apply_delta(
+    db_engine,
+    table_name: str,
+    delta: dict,
+    key_columns: List[str] = None,
+    batch_size: int = 1000,
+    replace: bool = False,
+) -> dict:
+    """
+    在一个事务中把变化写入数据库表
+
+    各类语句按 batch_size 分批以 executemany 执行；任一批失败时整个事务回滚，表保持更新前的状态。
+    删除和更新的实际行数与快照推算的不一致时（如表被外部修改，或日期等取值与列类型
+    比较不相等导致删除未命中），同样回滚并抛出 DeltaMismatchError，避免重新插入的行与
+    未删除的旧行重复。
+
+    args:
+        db_engine: SQLAlchemy 引擎
+        table_name (str): 表名
+        delta (dict): `compute_delta` 的结果
+        key_columns (List[str], optional): 键列；未指定时按整行内容删除
+        batch_size (int): 每批执行的行数
+        replace (bool): 先清空表再插入 delta["inserts"]（没有上次导入的快照时使用）
+
+    return:
+        dict: {"inserted", "updated", "deleted"} 行数
+
+    raises:
+        DeltaMismatchError: 删除或更新的行数与预期不一致
+    """
+    table = Table(table_name, MetaData(), autoload_with=db_engine)
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    with db_engine.begin() as connection:
+        if replace:
+            counts["deleted"] = connection.execute(delete(table)).rowcount
+        elif len(delta["deletes"]):
+            match_columns = list(key_columns) if key_columns else list(delta["deletes"].columns)
+            statement = delete(table).where(_match(table, match_columns, null_safe=not key_columns))
+            params = _key_params(delta["deletes"], match_columns)
+            counts["deleted"] = _execute_counted(connection, statement, params, batch_size)
+            expected = delta.get("expected_deleted", len(delta["deletes"]))
+            if counts["deleted"] != expected:
+                raise DeltaMismatchError(f"表格 {table_name} 应删除 {expected} 行，实际删除 {counts['deleted']} 行")
+
+        if len(delta["updates"]):
+            value_columns = [column for column in delta["updates"].columns if column not in key_columns]
+            statement = (
+                update(table)
+                .where(_match(table, key_columns, null_safe=False))
+                .values({column: bindparam(f"_v{idx}") for idx, column in enumerate(value_columns)})
+            )
+            params = [
+                {
+                    **{f"_k{idx}": row[column] for idx, column in enumerate(key_columns)},
+                    **{f"_v{idx}": row[column] for idx, column in enumerate(value_columns)},
+                }
+                for row in _records(delta["updates"])
+            ]
+            counts["updated"] = _execute_counted(connection, statement, params, batch_size)
+            if counts["updated"] != len(params):
+                raise DeltaMismatchError(f"表格 {table_name} 应更新 {len(params)} 行，实际更新 {counts['updated']} 行")
+
+        if len(delta["inserts"]):
+            for batch in _batches(_records(delta["inserts"]), batch_size):
+                connection.execute(insert(table), batch)
+                counts["inserted"] += len(batch)
+
+    logger.info(
+        f"表格 {table_name} 增量更新：插入 {counts['inserted']} 行，更新 {counts['updated']} 行，删除 {counts['deleted']} 行"
+    )
+    return counts
@@ -0,0 +1,372 @@
+import os
+import re
+import json
+import time
+import atexit
+import threading
+from sqlalchemy import Index, MetaData, Table, text
+from .column_profile import distinct_count
+from .utils.log import logger
+
+# SQL子句的起止关键字，用于切分出 WHERE / JOIN ... ON / GROUP BY 片段
+_CLAUSE_END = r"(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|\bUNION\b|\bWHERE\b|\b(?:LEFT|RIGHT|INNER|OUTER|CROSS|FULL)?\s*JOIN\b|;|$)"
+_WHERE_RE = re.compile(r"\bWHERE\b(.*?)" + _CLAUSE_END, re.IGNORECASE | re.DOTALL)
+_JOIN_RE = re.compile(r"\bON\b(.*?)" + _CLAUSE_END, re.IGNORECASE | re.DOTALL)
+_GROUP_RE = re.compile(
+    r"\bGROUP\s+BY\b(.*?)(?=\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|\bUNION\b|;|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+# 标识符：带引号的（"x"、`x`、[x]）或不带引号的单词（含中文）
+_IDENTIFIER_RE = re.compile(r'"([^"]+)"|`([^`]+)`|\[([^\]]+)\]|([^\W\d]\w*)')
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+
+# 估算索引大小时每条索引项的额外开销（字节）
+_INDEX_ENTRY_OVERHEAD = 16
+_MAX_WORKLOAD_SIZE = 200
+
+
+def _extract_identifiers(fragment: str) -> set:
+    fragment = _STRING_LITERAL_RE.sub(" ", fragment)
+    identifiers = set()
+    for match in _IDENTIFIER_RE.finditer(fragment):
+        # 表名或别名前缀（如 t.col 中的 t）是单独的标识符，不是列名时会被忽略
+        identifiers.add(next(group for group in match.groups() if group is not None))
+    return identifiers
+
+
+def extract_predicate_columns(sql: str, columns) -> dict:
+    """
+    提取SQL中出现在 WHERE、JOIN ... ON 和 GROUP BY 中的列
+
+    args:
+        sql (str): SQL语句
+        columns: 表格的真实列名，只有出现在其中的标识符才会被记录
+
+    return:
+        dict: {"filter": 过滤/连接列集合, "group": 分组列集合}
+    """
+    columns = set(columns)
+    filter_columns = set()
+    for pattern in (_WHERE_RE, _JOIN_RE):
+        for match in pattern.finditer(sql):
+            filter_columns |= _extract_identifiers(match.group(1)) & columns
+
+    group_columns = set()
+    for match in _GROUP_RE.finditer(sql):
+        group_columns |= _extract_identifiers(match.group(1)) & columns
+
+    return {"filter": filter_columns, "group": group_columns}
+
+
+def _value_width(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return 8
+
+
+class IndexAdvisor:
+    """
+    基于工作负载的索引建议器
+
+    记录验证通过的SQL中用于过滤、连接和分组的列，结合上传时统计的基数，
+    在索引数量和大小的预算内推荐（或自动创建）二级索引。
+    """
+
+    def __init__(
+        self,
+        db_engine,
+        enabled: bool = True,
+        auto_apply: bool = False,
+        max_indexes_per_table: int = 3,
+        max_index_mb: float = 256,
+        min_selectivity: float = 0.001,
+        output_dir: str = "outputs/index_advisor",
+        save_interval: float = 5,
+    ):
+        """
+        args:
+            db_engine: SQLAlchemy 引擎
+            enabled (bool): 是否记录工作负载
+            auto_apply (bool): 记录工作负载后是否自动创建推荐的索引
+            max_indexes_per_table (int): 每张表最多创建的索引数量
+            max_index_mb (float): 每张表所有推荐索引的估算总大小上限（MB）
+            min_selectivity (float): 过滤列的最小选择度（不同值数/行数），低于该值的列不建索引
+            output_dir (str): 统计信息与工作负载的保存目录
+            save_interval (float): 记录工作负载后写入文件的最短间隔（秒），期间的记录合并写入
+        """
+        self.db_engine = db_engine
+        self.enabled = enabled
+        self.auto_apply = auto_apply
+        self.max_indexes_per_table = max_indexes_per_table
+        self.max_index_bytes = max_index_mb * 1024 * 1024
+        self.min_selectivity = min_selectivity
+        self.output_dir = output_dir
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._stats = {}
+        # 有未写入文件的记录的表，以及每张表上次写入的时间
+        self._dirty = set()
+        self._saved_at = {}
+        # 反射得到的表结构，自动创建索引时不必每次都查询数据库
+        self._tables = {}
+        atexit.register(self.flush)
+
+    def _stats_path(self, table_name: str) -> str:
+        return os.path.join(self.output_dir, f"{table_name}.json")
+
+    def _load(self, table_name: str) -> dict:
+        if table_name not in self._stats:
+            try:
+                with open(self._stats_path(table_name), "r") as f:
+                    self._stats[table_name] = json.load(f)
+            except FileNotFoundError:
+                return None
+        return self._stats[table_name]
+
+    def _save(self, table_name: str):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self._stats_path(table_name), "w") as f:
+            json.dump(self._stats[table_name], f, ensure_ascii=False, indent=2)
+        self._dirty.discard(table_name)
+        self._saved_at[table_name] = time.monotonic()
+
+    def flush(self):
+        """把尚未写入文件的工作负载记录写入文件"""
+        with self._lock:
+            for table_name in list(self._dirty):
+                self._save(table_name)
+
+    def _table(self, table_name: str) -> Table:
+        table = self._tables.get(table_name)
+        if table is None:
+            table = self._tables[table_name] = Table(table_name, MetaData(), autoload_with=self.db_engine)
+        return table
+
+    @staticmethod
+    def _column_stats(column_info: dict) -> dict:
+        columns = {}
+        for column, info in column_info.items():
+            values = info["unique_values"]
+            sample = values[:100]
+            width = sum(_value_width(v) for v in sample) / len(sample) if sample else 8
+            columns[str(column)] = {"distinct": distinct_count(info), "width": width}
+        return columns
+
+    def register_table(self, table_name: str, row_count: int, column_info: dict):
+        """
+        登记上传时统计的表格信息
+
+        args:
+            table_name (str): 表名
+            row_count (int): 行数
+            column_info (dict): 列信息，包含每列的唯一值
+        """
+        columns = self._column_stats(column_info)
+        with self._lock:
+            self._tables.pop(table_name, None)
+            self._stats[table_name] = {
+                "row_count": row_count,
+                "columns": columns,
+                "usage": {},
+                "workload": [],
+                "indexes": [],
+            }
+            self._save(table_name)
+
+    def update_table(self, table_name: str, row_count: int, column_info: dict):
+        """
+        增量更新表格数据后刷新行数和各列的不同值数量，保留已记录的列使用情况、SQL和已创建的索引
+
+        args:
+            table_name (str): 表名
+            row_count (int): 行数
+            column_info (dict): 列信息，包含每列的唯一值
+        """
+        columns = self._column_stats(column_info)
+        with self._lock:
+            self._tables.pop(table_name, None)
+            stats = self._load(table_name)
+            if stats is None:
+                stats = self._stats[table_name] = {"usage": {}, "workload": [], "indexes": []}
+            stats["row_count"] = row_count
+            stats["columns"] = columns
+            self._save(table_name)
+
+    def record(self, table_name: str, sql: str):
+        """
+        记录一条验证通过的SQL
+
+        args:
+            table_name (str): SQL所查询的表
+            sql (str): 验证通过的SQL
+        """
+        if not self.enabled or not table_name:
+            return
+
+        with self._lock:
+            stats = self._load(table_name)
+            if stats is None:
+                return
+
+            used = extract_predicate_columns(sql, stats["columns"])
+            for kind, columns in used.items():
+                for column in columns:
+                    usage = stats["usage"].setdefault(column, {"filter": 0, "group": 0})
+                    usage[kind] += 1
+
+            if sql not in stats["workload"]:
+                stats["workload"].append(sql)
+                del stats["workload"][:-_MAX_WORKLOAD_SIZE]
+            # 合并写入：距上次写入不足 save_interval 时只标记，由之后的记录或 flush 写入
+            self._dirty.add(table_name)
+            if time.monotonic() - self._saved_at.get(table_name, float("-inf")) >= self.save_interval:
+                self._save(table_name)
+
+        if self.auto_apply:
+            self.apply(table_name)
+
+    def recommend(self, table_name: str) -> list:
+        """
+        在预算内推荐索引
+
+        过滤/连接列按选择度加权，分组列固定加权；估算大小为 行数 × (平均值宽度 + 索引项开销)。
+
+        args:
+            table_name (str): 表名
+
+        return:
+            list: 推荐的索引，按收益降序排列
+        """
+        # 在锁内复制统计信息，record 可能在其他线程中同时修改
+        with self._lock:
+            stats = self._load(table_name)
+            if stats is None:
+                return []
+            row_count = max(stats["row_count"], 1)
+            columns = stats["columns"]
+            usages = {column: dict(usage) for column, usage in stats["usage"].items()}
+
+        candidates = []
+        for column, usage in usages.items():
+            info = columns.get(column)
+            if info is None:
+                continue
+            selectivity = info["distinct"] / row_count
+            score = 0.5 * usage["group"]
+            if selectivity >= self.min_selectivity:
+                score += usage["filter"] * (1 + selectivity)
+            if score <= 0:
+                continue
+            candidates.append(
+                {
+                    "column": column,
+                    "score": score,
+                    "filter_uses": usage["filter"],
+                    "group_uses": usage["group"],
+                    "selectivity": selectivity,
+                    "estimated_bytes": int(row_count * (info["width"] + _INDEX_ENTRY_OVERHEAD)),
+                }
+            )
+        candidates.sort(key=lambda c: -c["score"])
+
+        recommendations = []
+        total_bytes = 0
+        for candidate in candidates:
+            if len(recommendations) >= self.max_indexes_per_table:
+                break
+            if total_bytes + candidate["estimated_bytes"] > self.max_index_bytes:
+                continue
+            total_bytes += candidate["estimated_bytes"]
+            recommendations.append(candidate)
+        return recommendations
+
+    def apply(self, table_name: str, recommendations: list = None) -> list:
+        """
+        在数据库中创建推荐的索引
+
+        args:
+            table_name (str): 表名
+            recommendations (list, optional): 待创建的索引，默认使用 `recommend` 的结果
+
+        return:
+            list: 新创建的索引名
+        """
+        if recommendations is None:
+            recommendations = self.recommend(table_name)
+        if not recommendations:
+            return []
+
+        table = self._table(table_name)
+        column_names = [column.name for column in table.columns]
+
+        created = []
+        with self._lock:
+            stats = self._load(table_name)
+            for recommendation in recommendations:
+                column = recommendation["column"]
+                if column not in column_names:
+                    continue
+                # 列名可能包含中文或空格，索引名使用列序号
+                index_name = f"ix_{table_name}_{column_names.index(column)}"
+                if index_name in stats["indexes"]:
+                    continue
+                try:
+                    Index(index_name, table.c[column]).create(self.db_engine, checkfirst=True)
+                except Exception as e:
+                    logger.warning(f"为表 {table_name} 的列 {column} 创建索引失败: {e}")
+                    continue
+                stats["indexes"].append(index_name)
+                created.append(index_name)
+                logger.info(f"已为表 {table_name} 的列 {column} 创建索引 {index_name}")
+            if created:
+                self._save(table_name)
+        return created
+
+    def _replay(self, sqls: list, repeat: int) -> list:
+        latencies = []
+        with self.db_engine.connect() as connection:
+            for sql in sqls:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    try:
+                        connection.execute(text(sql)).fetchall()
+                    except Exception as e:
+                        logger.warning(f"回放SQL失败: {e}")
+                        break
+                    elapsed = (time.perf_counter() - start) * 1000
+                    best = elapsed if best is None else min(best, elapsed)
+                latencies.append(best)
+        return latencies
+
+    def report(self, table_name: str, repeat: int = 3) -> dict:
+        """
+        回放记录的工作负载，创建推荐索引，并给出创建前后的延迟对比
+
+        args:
+            table_name (str): 表名
+            repeat (int): 每条SQL执行的次数，取最小值
+
+        return:
+            dict: 创建的索引以及每条SQL创建前后的延迟（毫秒）
+        """
+        with self._lock:
+            stats = self._load(table_name)
+            if stats is None:
+                return {}
+            workload = list(stats["workload"])
+        before = self._replay(workload, repeat)
+        indexes = self.apply(table_name)
+        after = self._replay(workload, repeat)
+
+        queries = [
+            {"sql": sql, "before_ms": b, "after_ms": a}
+            for sql, b, a in zip(workload, before, after)
+        ]
+        return {
+            "table": table_name,
+            "indexes": indexes,
+            "queries": queries,
+            "total_before_ms": sum(q["before_ms"] or 0 for q in queries),
+            "total_after_ms": sum(q["after_ms"] or 0 for q in queries),
+        }
@@ -0,0 +1,285 @@
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .utils.log import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_table INTEGER NOT NULL DEFAULT 0,
+    created_at REAL,
+    updated_at REAL
+)
+"""
+
+# 导入任务依次经过的阶段
+STAGES = ("parse", "profile", "document", "ddl", "load", "finalize")
+STAGE_NAMES = {
+    "parse": "解析",
+    "profile": "统计列信息",
+    "document": "生成文档",
+    "ddl": "生成DDL",
+    "load": "导入数据",
+    "finalize": "汇总与登记",
+}
+
+# 内存中最多保留的任务预览数量
+MAX_PREVIEWS = 100
+
+
+def file_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestQueue:
+    """
+    后台导入任务队列
+
+    任务持久化在 SQLite 中，由有限数量的工作线程执行 `ExcelSQL.upload`，
+    并在每个阶段（解析、统计、文档、DDL、导入）更新进度，页面刷新后仍可轮询任务状态。
+    相同内容的文件只会导入一次，失败的任务只在显式调用 `retry` 时重新执行；
+    进程中断后，超时未更新的运行中任务会被重新排队。
+    """
+
+    def __init__(self, app, path: str = "outputs/jobs.db", max_workers: int = 2, stale_after: float = 900):
+        """
+        args:
+            app (ExcelSQL): 执行导入的 ExcelSQL 实例
+            path (str): SQLite 数据库文件路径
+            max_workers (int): 同时执行的导入任务数量
+            stale_after (float): 运行中的任务超过该秒数未更新进度时，视为进程中断并重新排队
+        """
+        self.app = app
+        self.stale_after = stale_after
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(_SCHEMA)
+        columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+        if "created_table" not in columns:
+            # 旧版本创建的任务库没有该列
+            self._connection.execute("ALTER TABLE jobs ADD COLUMN created_table INTEGER NOT NULL DEFAULT 0")
+        self._connection.commit()
+        # 提交时已在内存中的文件内容，以及解析后的预览；只保存在本进程中，进程重启后从文件恢复
+        self._sources = {}
+        self._previews = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.recover()
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._connection.execute(sql, params)
+            self._connection.commit()
+            return cursor
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, file_path: str, table_name: str, source=None) -> str:
+        """
+        提交导入任务
+
+        相同表名和文件内容的任务已存在时直接返回该任务（包括失败的任务，重新执行需调用 `retry`），
+        避免重复提交时再次调用模型生成文档和DDL。
+
+        args:
+            file_path (str): Excel 文件路径
+            table_name (str): 导入后的表名
+            source (optional): 与文件内容相同的内存数据（bytes、文件对象或 DataFrame），
+                提供时任务直接解析它而不再读取文件；文件仍用于进程中断后的恢复
+
+        return:
+            str: 任务ID
+        """
+        content_hash = file_hash(file_path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, status FROM jobs WHERE table_name = ? AND content_hash = ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (table_name, content_hash),
+            ).fetchone()
+        if row is not None:
+            logger.info(f"文件 {file_path} 已有导入任务 {row['id']}（{row['status']}），不再重复提交")
+            return row["id"]
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, file_path, table_name, content_hash, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, file_path, table_name, content_hash, now, now),
+        )
+        logger.info(f"已提交导入任务 {job_id}: {file_path}")
+        if source is not None:
+            self._sources[job_id] = source
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def retry(self, job_id: str, source=None) -> bool:
+        """
+        重新排队失败的任务
+
+        args:
+            job_id (str): 任务ID
+            source (optional): 与文件内容相同的内存数据，提供时任务直接解析它而不再读取文件
+
+        return:
+            bool: 是否重新排队；任务不存在或不是失败状态时返回 False
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, updated_at = ? WHERE id = ? AND status = 'failed'",
+                (time.time(), job_id),
+            )
+            self._connection.commit()
+        if not cursor.rowcount:
+            return False
+        logger.info(f"已重新排队失败的导入任务 {job_id}")
+        if source is not None:
+            self._sources[job_id] = source
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def recover(self) -> int:
+        """
+        重新排队未完成的任务：排队中的任务，以及超时未更新进度的运行中任务
+
+        return:
+            int: 重新排队的任务数量
+        """
+        deadline = time.time() - self.stale_after
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?)",
+                (deadline,),
+            ).fetchall()
+            self._connection.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND updated_at < ?",
+                (deadline,),
+            )
+            self._connection.commit()
+        for row in rows:
+            self._executor.submit(self._run, row["id"])
+        if rows:
+            logger.info(f"已重新排队 {len(rows)} 个未完成的导入任务")
+        return len(rows)
+
+    def _claim(self, job_id: str) -> Optional[dict]:
+        """将排队中的任务标记为运行中；任务已被其他工作线程或进程领取时返回 None"""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._connection.commit()
+            if not cursor.rowcount:
+                return None
+            return dict(self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _run(self, job_id: str):
+        source = self._sources.pop(job_id, None)
+        job = self._claim(job_id)
+        if job is None:
+            return
+
+        table_name = job["table_name"]
+        try:
+            from sqlalchemy import MetaData, Table, inspect
+
+            # 上次运行已开始导入数据时，先删除本任务创建、可能只导入了一部分的表，保证重跑是幂等的；
+            # 导入前就已存在的表（例如之前成功导入的同名表）不会被删除
+            if job["stage"] in ("load", "finalize") and job["created_table"]:
+                logger.info(f"任务 {job_id} 从中断处恢复，删除未完成导入的表 {table_name}")
+                Table(table_name, MetaData()).drop(self.app.db_engine, checkfirst=True)
+
+            existed = inspect(self.app.db_engine).has_table(table_name)
+
+            def progress(stage: str):
+                fields = {"stage": stage}
+                if stage == "load" and not existed:
+                    # 进入导入阶段时由本任务创建表
+                    fields["created_table"] = 1
+                self._update(job_id, **fields)
+
+            success = self.app.upload(
+                source if source is not None else job["file_path"],
+                table_name=table_name,
+                progress=progress,
+                on_preview=lambda preview: self._set_preview(job_id, preview),
+            )["success"]
+        except Exception as e:
+            logger.error(f"导入任务 {job_id} 执行出错: {e}")
+            self._update(job_id, status="failed", error=str(e))
+            return
+
+        if success:
+            self._update(job_id, status="succeeded", error=None)
+            logger.info(f"导入任务 {job_id} 已完成: {table_name}")
+        else:
+            self._update(job_id, status="failed", error="导入失败，详见日志")
+
+    def _set_preview(self, job_id: str, preview):
+        self._previews[job_id] = preview
+        # 只保留最近任务的预览
+        while len(self._previews) > MAX_PREVIEWS:
+            self._previews.pop(next(iter(self._previews)))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        查询任务状态
+
+        return:
+            dict: 任务信息，额外包含 progress（0~1）和 preview（解析完成后的前几行，
+                本进程中没有时为 None）；任务不存在时返回 None
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._with_progress(dict(row))
+        job["preview"] = self._previews.get(job_id)
+        return job
+
+    def list_jobs(self, limit: int = 50) -> List[dict]:
+        """按提交时间倒序列出最近的任务"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._with_progress(dict(row)) for row in rows]
+
+    @staticmethod
+    def _with_progress(job: dict) -> dict:
+        if job["status"] == "succeeded":
+            job["progress"] = 1.0
+        elif job["stage"] in STAGES:
+            job["progress"] = STAGES.index(job["stage"]) / len(STAGES)
+        else:
+            job["progress"] = 0.0
+        return job
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -7,9 +7,14 @@ import sys
 # 将项目根目录添加到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+from excelsql.utils.trace import tracer
+
 # 上传文件存储的目录
 UPLOAD_DIR = "data"
-DDL_DIR = "outputs/ddl"
+# 跨表提问：由结构图自动选择相关的表
+AUTO_TABLE = "（自动选择相关表格）"
+# 表格预览的行数
+PREVIEW_ROWS = 5
 
 # 设置页面配置
 st.set_page_config(page_title="与文件聊天", page_icon="💬")
@@ -35,22 +40,32 @@ with st.sidebar.expander("高级设置"):
 
 # 获取上传文件列表
 def get_uploaded_tables():
-    """获取表格列表"""
-    files = []
-    if os.path.exists(DDL_DIR):
-        try:
-            files = [
-                f.split(".")[0]  # 不含后缀
-                for f in os.listdir(DDL_DIR)
-                if os.path.isfile(os.path.join(DDL_DIR, f))
-                # and f.lower().endswith((".xlsx", ".xls"))
-                and f.lower().endswith(".sql")
-            ]
-        except Exception as e:
-            st.error(f"读取目录 '{DDL_DIR}' 时出错: {e}")
-    else:
-        st.warning(f"目录 '{DDL_DIR}' 不存在。请先在上传文件页面上传文件。")
-    return files
+    """从表格目录获取表格列表（内存缓存，无需扫描文件系统）"""
+    try:
+        return st.session_state.excel_sql_app.list_tables()
+    except Exception as e:
+        st.error(f"读取表格目录时出错: {e}")
+        return []
+
+
+def show_trace_summary(trace_id):
+    """调试模式下展示本次提问各阶段的耗时和模型调用开销"""
+    if trace_id is None:
+        return
+    summary = tracer.summary(trace_id)
+    with st.expander(f"耗时分析（共 {summary['wall_ms']:.0f} ms）"):
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {"阶段": name, "次数": entry["count"], "总耗时(ms)": round(entry["total_ms"], 1),
+                     "最大耗时(ms)": round(entry["max_ms"], 1), "失败": entry["errors"]}
+                    for name, entry in summary["spans"].items()
+                ]
+            )
+        )
+        st.caption(
+            f"模型调用 token：提示词 {summary['llm_tokens']['prompt']}，输出 {summary['llm_tokens']['completion']}"
+        )
 
 
 # SQL查询处理函数
@@ -61,71 +76,28 @@ def get_sql_response(user_question):
         # 获取共享的ExcelSQL实例
         excel_sql_app = st.session_state.excel_sql_app
 
-        excel_sql_app.read_document(selected_table)
+        # 标准化、生成、投票与重新生成均由核心完成，已执行的结果直接复用
+        with st.spinner("正在生成并验证SQL..."):
+            table_name = None if selected_table == AUTO_TABLE else selected_table
+            answer = excel_sql_app.answer(user_question, table_name=table_name)
+        st.write(f"标准化后的查询: {answer['normalized_query']}")
+        if table_name is None:
+            st.write(f"涉及的表格: {', '.join(answer['tables'])}")
 
-        # 标准化查询
-        normalized_query = excel_sql_app.normalize_query(user_question)
-        st.write(f"标准化后的查询: {normalized_query}")
+        if st.session_state.get('debug_mode', False):
+            show_trace_summary(answer.get("trace_id"))
 
-        # 生成SQL并执行
-        results = excel_sql_app.generate_sqls_and_check(
-            query=normalized_query,
-            concurrent=True,
-        )
-        # print(results)
+        sql = answer["sql"]
+        check_flag = answer["flag"]
+        denotation = answer["denotation"]
+        max_attempts = excel_sql_app.max_attempts
 
-        # 获取最终SQL和结果
-        sql, flag, denotation = excel_sql_app.poll_sqls(results)
-        
-        # 检查SQL并在需要时重新生成
-        max_attempts = 3  # 最大尝试次数
-        current_attempt = 0
-        check_flag = False
-        check_result = None
-        error_messages = []  # 记录错误信息
-        
-        with st.spinner("正在验证SQL并执行..."):
-            while current_attempt < max_attempts:
-                try:
-                    # 检查SQL
-                    check_flag, check_result = excel_sql_app._check_sql(sql)
-                    
-                    if check_flag:  # SQL检查成功
-                        denotation = check_result
-                        break
-                    else:  # SQL检查失败，尝试重新生成
-                        error_msg = f"SQL检查失败（尝试 {current_attempt+1}/{max_attempts}）: {check_result}"
-                        error_messages.append(error_msg)
-                        
-                        # 重新生成多条SQL
-                        regen_results = excel_sql_app.regenerate_sqls(
-                            query=normalized_query,
-                            sql=sql,
-                            error=str(check_result),
-                            concurrent=True
-                        )
-                        
-                        # 选择最佳SQL
-                        if regen_results:
-                            sql, check_flag, check_result = excel_sql_app.poll_sqls(regen_results)
-                            
-                            if check_flag:  # 找到有效SQL
-                                denotation = check_result
-                                break
-                        
-                        current_attempt += 1
-                except Exception as e:
-                    error_msg = f"SQL检查/重新生成过程中发生错误: {e}"
-                    error_messages.append(error_msg)
-                    current_attempt += 1
-        
         # 只在最后一次尝试仍然失败时显示错误信息
         if not check_flag:
             st.error(f"在{max_attempts}次尝试后仍无法生成有效SQL")
-            if error_messages:
-                st.error(f"错误信息: {error_messages[-1]}")  # 只显示最后一次错误
+            st.error(f"错误信息: {denotation}")  # 只显示最后一次错误
 
-        # 构建响应
+        # 构建响应，查询结果由分页读取器按页渲染为表格
         response = f"""
         ### SQL 查询
         ```sql
@@ -134,15 +106,13 @@ def get_sql_response(user_question):
         
         ### 查询状态
         {'✅ 成功' if check_flag else '❌ 失败'}
-        
-        ### 查询结果
-        ```
-        {denotation}
-        ```
         """
         if check_flag:
             st.success("成功执行SQL查询。")
-        return response
+            if denotation.affected_rows is None:
+                # 前几页直接使用验证时的执行结果，后续页按需查询
+                return response, excel_sql_app.open_result(sql, first_result=denotation)
+        return response, None
 
     except Exception as e:
         st.error(f"执行SQL查询时发生错误: {e}")
@@ -152,7 +122,40 @@ def get_sql_response(user_question):
         if st.session_state.get('debug_mode', False):
             st.error(traceback.format_exc())  # 显示详细错误信息
         
-        return f"查询出错: {e}"
+        return f"查询出错: {e}", None
+
+
+def show_result_pages():
+    """分页展示最近一次查询的结果，只读取已浏览到的页"""
+    pager = st.session_state.get("result_pager")
+    pages = st.session_state.get("result_pages")
+    if pager is None:
+        return
+
+    if not pages:
+        pages.append(pager.first_page())
+
+    if not pager.exhausted and st.button("加载下一页"):
+        page = pager.next_page()
+        if page is not None and len(page) > 0:
+            pages.append(page)
+
+    page_index = 0
+    if len(pages) > 1:
+        page_index = st.number_input(
+            "页码", min_value=1, max_value=len(pages), value=len(pages)
+        ) - 1
+    st.dataframe(pages[page_index].to_dataframe())
+
+    total_count = pager.total_count()
+    if total_count is None and st.button("统计结果总行数"):
+        total_count = pager.total_count(compute=True)
+    if pager.partial:
+        st.caption(f"查询最外层含 LIMIT/OFFSET，无法继续分页，只显示已读取的 {pager.position} 行")
+    elif total_count is not None:
+        st.caption(f"共 {total_count} 行，每页 {pager.page_size} 行")
+    else:
+        st.caption(f"已加载 {pager.position} 行，每页 {pager.page_size} 行")
 
 
 # 界面显示
@@ -161,6 +164,9 @@ if not uploaded_tables:
     st.warning(f"没有找到表格，请先上传表格文件。")
     st.stop()
 
+if st.session_state.excel_sql_app.schema_graph_cfg.get("enabled", False):
+    uploaded_tables = [AUTO_TABLE] + uploaded_tables
+
 selected_table = st.selectbox(
     "选择一个已上传的表格:",
     uploaded_tables,
@@ -171,18 +177,22 @@ selected_table = st.selectbox(
 if selected_table:
     # st.info(f"您已选择表格: **{selected_table}**")
 
-    # 从数据库中读取表格
     excel_sql_app = st.session_state.excel_sql_app
-    db_engine = excel_sql_app.db_engine
 
-    # 读取表格数据
-    try:
-        df = pd.read_sql_table(selected_table, db_engine)
-        df = pd.read_sql(f"SELECT * FROM {selected_table}", db_engine)
-        st.write(f"表格数据预览:")
-        st.dataframe(df.head())
-    except Exception as e:
-        st.error(f"读取表格数据时发生错误: {e}")
+    # 只读取前几行预览，行数和列数来自表格目录；结果按表格数据版本缓存，页面重新运行时不再查询数据库
+    if selected_table == AUTO_TABLE:
+        st.info("将根据问题自动选择相关的表格及其连接关系。")
+    else:
+        try:
+            preview = excel_sql_app.preview_table(selected_table, PREVIEW_ROWS)
+            if preview is None:
+                st.warning(f"表格 {selected_table} 不存在")
+            else:
+                counts = f"共 {preview['row_count']} 行，" if preview["row_count"] is not None else ""
+                st.write(f"表格数据预览（{counts}{preview['column_count']} 列）:")
+                st.dataframe(preview["rows"].to_dataframe())
+        except Exception as e:
+            st.error(f"读取表格数据时发生错误: {e}")
 
     # try:
     #     df = pd.read_excel(selected_file_path)
@@ -205,7 +215,16 @@ if selected_table:
             st.warning("请输入您的问题。")
         else:
             with st.spinner("正在查询中，请稍候..."):
-                response = get_sql_response(user_question)
-
-                st.subheader("🤖 查询结果:")
-                st.markdown(response)
+                response, pager = get_sql_response(user_question)
+
+                # 新结果保存在会话状态中以便翻页；读取器不持有数据库连接
+                st.session_state.last_response = response
+                st.session_state.result_pager = pager
+                st.session_state.result_pages = []
+
+    if st.session_state.get("last_response"):
+        st.subheader("🤖 查询结果:")
+        st.markdown(st.session_state.last_response)
+        if st.session_state.get("result_pager") is not None:
+            st.markdown("### 查询结果")
+            show_result_pages()
@@ -1,12 +1,19 @@
 import streamlit as st
 import os
+import time
 import pandas as pd
 import sys
 # 将项目根目录添加到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
+from excelsql.ingest_queue import STAGE_NAMES
+
 # 定义存储上传文件的目录
 UPLOAD_DIR = "data"
+# 导入任务进度的刷新间隔（秒）
+POLL_INTERVAL = 1
+# 预览的行数
+PREVIEW_ROWS = 5
 
 # 确保上传目录存在
 if not os.path.exists(UPLOAD_DIR):
@@ -25,66 +32,111 @@ st.write(
     """在此页面上传您的 Excel 文件。文件将被导入到数据库并保存以供后续处理和聊天交互。"""
 )
 
-def process_excel_file(file_path):
-    """处理上传的Excel文件并导入到数据库"""
-    st.info(f"开始处理文件: {os.path.basename(file_path)}")
-    try:
-        # 读取Excel文件
-        df = pd.read_excel(file_path)
-        st.write("文件内容预览 (前 5 行):")
-        st.dataframe(df.head())
-
-        # 使用共享的ExcelSQL实例导入数据
-        excel_sql_app = st.session_state.excel_sql_app
-        success = excel_sql_app.upload_excel(file_path)
-        
-        if success:
-            st.success(f"文件 {os.path.basename(file_path)} 已成功导入到数据库")
-            return True, df
-        else:
-            st.error(f"导入文件 {os.path.basename(file_path)} 到数据库失败")
-            return False, df
-            
-    except Exception as e:
-        st.error(f"处理文件时出错 {os.path.basename(file_path)}: {e}")
-        import traceback
-        st.error(traceback.format_exc())  # 显示详细错误信息
-        return False, None
+STATUS_NAMES = {"queued": "排队中", "running": "处理中", "succeeded": "已完成", "failed": "失败"}
+
+
+def submit_excel_file(file_path, data=None):
+    """提交后台导入任务；data 为已在内存中的文件内容，任务直接解析它，整个导入只解析一次"""
+    excel_sql_app = st.session_state.excel_sql_app
+    job_id = excel_sql_app.submit_excel(file_path, source=data)
+    st.session_state.setdefault("ingest_jobs", [])
+    if job_id not in st.session_state.ingest_jobs:
+        st.session_state.ingest_jobs.append(job_id)
+    return job_id
+
+
+def job_preview(job):
+    """任务的预览：解析完成后由导入任务给出；已完成的任务从数据库读取前几行"""
+    if job["preview"] is not None:
+        return job["preview"]
+    if job["status"] == "succeeded":
+        preview = st.session_state.excel_sql_app.preview_table(job["table_name"], PREVIEW_ROWS)
+        if preview is not None:
+            return preview["rows"].to_dataframe()
+    return None
+
+
+def show_ingest_jobs():
+    """展示本会话提交的导入任务进度；有未完成的任务时定时刷新"""
+    job_ids = st.session_state.get("ingest_jobs", [])
+    if not job_ids:
+        return
+
+    ingest_queue = st.session_state.excel_sql_app.ingest_queue
+    st.subheader("导入任务进度:")
+    active = False
+    for job_id in job_ids:
+        job = ingest_queue.get(job_id)
+        if job is None:
+            continue
+        name = os.path.basename(job["file_path"])
+        status = STATUS_NAMES.get(job["status"], job["status"])
+        if job["status"] == "running":
+            status += f" · {STAGE_NAMES.get(job['stage'], job['stage'] or '')}"
+        st.progress(job["progress"], text=f"{name}：{status}")
+        preview = job_preview(job)
+        if preview is not None:
+            with st.expander(f"`{name}` 内容预览 (前 {PREVIEW_ROWS} 行)"):
+                st.dataframe(preview)
+        if job["status"] == "failed":
+            st.error(f"导入文件 {name} 失败: {job['error']}")
+            # 失败的任务只在用户确认后重新执行，每次重试都会再次调用模型
+            if st.button("重试", key=f"retry_{job_id}"):
+                ingest_queue.retry(job_id)
+                st.rerun()
+        active = active or job["status"] in ("queued", "running")
+
+    if active:
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+
 
 # 文件上传组件
 uploaded_files = st.file_uploader(
     "请选择一个或多个 Excel 文件上传",
     type=['xlsx', 'xls'],
     accept_multiple_files=True,
-    help="支持 .xlsx 和 .xls 格式的文件。"
+    help="支持 .xlsx 和 .xls 格式的文件。文件在后台导入，刷新页面不会中断导入。"
 )
 
 if uploaded_files:
     st.write(f"共选择了 {len(uploaded_files)} 个文件。")
     saved_files_info = []
 
+    # 页面每次刷新都会重新遍历已选择的文件；同一个上传的文件在本会话中只提交一次
+    submitted_files = st.session_state.setdefault("submitted_files", {})
+
     for uploaded_file in uploaded_files:
         file_path = os.path.join(UPLOAD_DIR, uploaded_file.name)
 
+        if uploaded_file.file_id in submitted_files:
+            saved_files_info.append(
+                {"name": uploaded_file.name, "path": file_path, "status": "已提交导入", "job": submitted_files[uploaded_file.file_id]}
+            )
+            continue
+
         if os.path.exists(file_path):
-            st.warning(f"文件 '{uploaded_file.name}' 已存在于 {UPLOAD_DIR} 目录中。将跳过上传和处理。")
-            saved_files_info.append({"name": uploaded_file.name, "path": file_path, "status": "已存在"})
+            with open(file_path, "rb") as f:
+                same_content = f.read() == uploaded_file.getbuffer()
+            if not same_content:
+                st.warning(f"目录 {UPLOAD_DIR} 中已存在内容不同的同名文件 '{uploaded_file.name}'。将跳过上传和处理。")
+                saved_files_info.append({"name": uploaded_file.name, "path": file_path, "status": "已存在"})
+                continue
+            # 内容相同：重复提交是幂等的，返回已有的任务（失败的任务可在进度中点击重试）
+            job_id = submit_excel_file(file_path, uploaded_file.getvalue())
+            submitted_files[uploaded_file.file_id] = job_id
+            saved_files_info.append({"name": uploaded_file.name, "path": file_path, "status": "已存在", "job": job_id})
             continue
 
         try:
+            data = uploaded_file.getvalue()
             with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+                f.write(data)
 
             st.success(f"文件 '{uploaded_file.name}' 已成功上传到: {file_path}")
-            saved_files_info.append({"name": uploaded_file.name, "path": file_path, "status": "已上传"})
-
-            st.write(f"--- 开始处理文件: {uploaded_file.name} ---")
-            success, result = process_excel_file(file_path)
-            if success:
-                st.write(f"--- 文件处理完成: {uploaded_file.name} ---")
-            else:
-                st.write(f"--- 文件处理失败: {uploaded_file.name} ---")
-            st.markdown("---")
+            job_id = submit_excel_file(file_path, data)
+            submitted_files[uploaded_file.file_id] = job_id
+            saved_files_info.append({"name": uploaded_file.name, "path": file_path, "status": "已提交导入", "job": job_id})
 
         except Exception as e:
             st.error(f"保存文件 '{uploaded_file.name}' 时出错: {e}")
@@ -105,4 +157,6 @@ if st.button("查看已上传的文件列表"):
     except FileNotFoundError:
         st.error(f"目录 '{UPLOAD_DIR}' 不存在。请先上传文件。")
     except Exception as e:
-        st.error(f"列出文件时出错: {e}")
\ No newline at end of file
+        st.error(f"列出文件时出错: {e}")
+
+show_ingest_jobs()
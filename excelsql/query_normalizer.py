@@ -1,5 +1,4 @@
-import os
-from openai import OpenAI
+from .utils.llm import chat_completion, LazyClient
 
 SYSTEM_PROMPT = {"Rewriter": {}}
 
@@ -65,14 +64,12 @@ Do not add or infer any information not present in the user's input. Your role i
 
 
 class QueryNormalizer:
+    client = LazyClient()
 
     def __init__(
         self,
         model: str = "gpt-4o",
     ):
-        api_key = os.getenv("API_KEY")
-        base_url = os.getenv("BASE_URL")
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
         self.language = "zh"
         self.model = model
 
@@ -95,7 +92,8 @@ class QueryNormalizer:
             f"Rewrite the following sentence into a standard statement: {query}"
         )
 
-        completion = self.client.chat.completions.create(
+        completion = chat_completion(
+            self.client,
             model=self.model,
             messages=[
                 {
@@ -107,6 +105,7 @@ class QueryNormalizer:
                     "content": user_prompt,
                 },
             ],
+            component="query_normalizer",
         )
 
         normalized_query = completion.choices[0].message.content.strip()
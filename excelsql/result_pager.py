@@ -0,0 +1,169 @@
+import re
+from typing import Optional
+
+from sqlalchemy import text
+
+from .utils.log import logger
+from .utils.result import QueryResult
+
+# 字符串、带引号的标识符、注释、括号以及需要识别的子句关键字
+_TOKEN_RE = re.compile(
+    r"'(?:[^']|'')*'|\"[^\"]*\"|`[^`]*`|--[^\n]*|/\*.*?\*/|[()]|\b(?:ORDER\s+BY|LIMIT|OFFSET|FETCH)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def top_level_clauses(sql: str) -> set:
+    """
+    查询语句最外层出现的 ORDER BY / LIMIT / OFFSET / FETCH 子句
+
+    子查询、窗口函数等括号内的子句以及字符串和注释中的关键字不计入。
+
+    args:
+        sql (str): 查询语句
+
+    return:
+        set: 大写的子句关键字，如 {"ORDER BY", "LIMIT"}
+    """
+    depth, clauses = 0, set()
+    for match in _TOKEN_RE.finditer(sql):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token[0].isalpha():
+            clauses.add(" ".join(token.upper().split()))
+    return clauses
+
+
+class ResultPager:
+    """
+    分页结果读取器
+
+    已执行得到的完整结果（如验证候选SQL时读取的全部行）直接按页切分，不再重新执行SQL。
+    结果被截断时每页借用一次连接，以 LIMIT/OFFSET 只查询该页并立即归还连接；
+    页与页之间不持有连接或游标，长时间不翻页的会话不会占用连接池。
+
+    多次执行的 LIMIT/OFFSET 只有在顺序确定时才能无重复、无遗漏地衔接：分页查询在原有的
+    最外层 ORDER BY 之后（没有时新增）按全部输出列的位置排序作为决胜条件。分页语句直接
+    追加在原查询之后而不包一层派生表，输出列重名的查询在 MySQL 上同样可以分页。
+    最外层已有 LIMIT/OFFSET 的查询无法追加分页子句，只返回已读取的行。
+    """
+
+    def __init__(self, db_engine, sql: str, page_size: int = 100, first_result: QueryResult = None):
+        """
+        args:
+            db_engine: SQLAlchemy 引擎
+            sql (str): 待执行的查询语句
+            page_size (int): 每页行数
+            first_result (QueryResult, optional): 已执行该SQL得到的结果，可能只包含前若干行
+        """
+        self.db_engine = db_engine
+        self.sql = sql.strip().rstrip(";")
+        self.page_size = page_size
+        self.first_result = first_result
+        self.columns = list(first_result.columns) if first_result is not None else []
+        self.position = 0  # 已读取的行数
+        self.exhausted = False
+        self.partial = False  # 结果被截断且无法继续分页，只返回了已读取的行
+        clauses = top_level_clauses(self.sql)
+        self.pageable = not clauses & {"LIMIT", "OFFSET", "FETCH"}
+        self.ordered = "ORDER BY" in clauses
+        self._total_count = None
+        if first_result is not None and not first_result.truncated:
+            self._total_count = first_result.num_rows
+
+    def _head(self) -> QueryResult:
+        """没有已执行的结果时执行原查询，只读取一页多一行"""
+        with self.db_engine.connect() as connection:
+            result = connection.execute(text(self.sql))
+            self.columns = list(result.keys())
+            rows = result.fetchmany(self.page_size + 1)
+        return QueryResult.from_rows(self.columns, rows, truncated=len(rows) > self.page_size)
+
+    def _page_sql(self) -> str:
+        """按全部输出列的位置作为决胜条件的分页查询；换行追加，避免被原查询末尾的行注释吞掉"""
+        positions = ", ".join(str(idx) for idx in range(1, len(self.columns) + 1))
+        order = f"\n, {positions}" if self.ordered else f"\nORDER BY {positions}"
+        return f"{self.sql}{order}\nLIMIT :limit OFFSET :offset"
+
+    def _fetch(self, offset: int) -> tuple:
+        """查询从 offset 开始的一页，多取一行以判断是否还有下一页"""
+        with self.db_engine.connect() as connection:
+            result = connection.execute(
+                text(self._page_sql()),
+                {"limit": self.page_size + 1, "offset": offset},
+            )
+            rows = result.fetchall()
+        return QueryResult.from_rows(self.columns, rows[: self.page_size]), len(rows) > self.page_size
+
+    def first_page(self) -> QueryResult:
+        """从头开始读取第一页"""
+        self.position = 0
+        self.exhausted = False
+        self.partial = False
+        return self.next_page()
+
+    def next_page(self) -> Optional[QueryResult]:
+        """
+        读取下一页
+
+        return:
+            QueryResult: 下一页结果；没有更多行时返回 None
+        """
+        if self.exhausted:
+            return None
+        if self.first_result is None:
+            self.first_result = self._head()
+
+        known = self.first_result
+        end = self.position + self.page_size
+        if not known.truncated:
+            # 已有结果就是完整结果
+            page = known.slice(self.position, end)
+            has_more = end < known.num_rows
+        elif self.pageable:
+            # 已有结果的行序与确定顺序的分页查询不一定一致，所有页都从分页查询读取
+            page, has_more = self._fetch(self.position)
+        else:
+            page = known.slice(self.position, end)
+            has_more = end < known.num_rows
+            if not has_more:
+                self.partial = True
+                logger.warning(f"查询最外层含 LIMIT/OFFSET，无法继续分页，只返回已读取的 {known.num_rows} 行")
+
+        self.position += len(page)
+        if not has_more:
+            self.exhausted = True
+            if not self.partial:
+                self._total_count = self.position
+
+        if not len(page) and self.position > 0:
+            return None
+        return page
+
+    def total_count(self, compute: bool = False) -> Optional[int]:
+        """
+        结果总行数
+
+        结果读完后总行数是已知的；否则只有在 `compute=True` 时才额外执行一次
+        `COUNT(*)` 查询，避免在大结果上产生不必要的开销。
+
+        args:
+            compute (bool): 总行数未知时是否执行计数查询
+
+        return:
+            int: 总行数；未知时返回 None
+        """
+        if self._total_count is None and compute and self.columns:
+            # 以公用表表达式的列名列表为输出列重新命名，重名的列不会导致计数查询失败
+            aliases = ", ".join(f"c{idx}" for idx in range(len(self.columns)))
+            try:
+                with self.db_engine.connect() as connection:
+                    self._total_count = connection.execute(
+                        text(f"WITH excelsql_count({aliases}) AS (\n{self.sql}\n) SELECT COUNT(*) FROM excelsql_count")
+                    ).scalar()
+            except Exception as e:
+                logger.warning(f"统计结果总行数失败: {e}")
+        return self._total_count
@@ -0,0 +1,116 @@
+import math
+from collections import Counter
+from statistics import NormalDist
+from typing import Tuple
+import pandas as pd
+from .utils.log import logger
+
+
+class SamplingProfiler:
+    """
+    基于抽样的列信息统计
+
+    在已解析的表格上抽样（`profile_frame`）：只有不同值不超过 exact_threshold 的列
+    才对整列精确计数，其余列只依据样本估计。
+    因此低基数列得到精确的取值与频数，高基数列给出不同值数量的估计区间（GEE 估计量）
+    与频率的置信区间，其统计开销只与样本大小有关。
+    """
+
+    def __init__(
+        self,
+        sample_size: int = 10000,
+        exact_threshold: int = 50,
+        confidence: float = 0.95,
+        max_frequencies: int = 20,
+        seed: int = 0,
+    ):
+        """
+        args:
+            sample_size (int): 样本的行数
+            exact_threshold (int): 不同值不超过该数量的列进行精确计数
+            confidence (float): 频率置信区间的置信水平
+            max_frequencies (int): 每列最多报告的高频值数量
+            seed (int): 抽样的随机种子
+        """
+        self.sample_size = sample_size
+        self.exact_threshold = exact_threshold
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.max_frequencies = max_frequencies
+        self.seed = seed
+
+    def profile_frame(self, df: pd.DataFrame) -> Tuple[dict, int]:
+        """
+        统计已解析的表格的列信息
+
+        导入时表格总要完整解析一次，直接在解析结果上抽样，避免再流式读取一遍文件。
+        只有样本中不同值不超过 exact_threshold 的列才对整列做一次向量化计数，
+        高基数列只依据样本估计，逐行的 Python 开销与行数无关。
+
+        args:
+            df (pd.DataFrame): 已解析的表格
+
+        return:
+            tuple: (列信息, 总行数)。列信息与 `_extract_table_info` 的格式兼容，
+                另含 distinct、distinct_bounds、exact 和 frequencies 字段
+        """
+        total = len(df)
+        sample_df = df.sample(n=min(self.sample_size, total), random_state=self.seed) if total else df
+
+        column_info = {}
+        for column in df.columns:
+            exact_counts = None
+            if sample_df[column].nunique(dropna=False) <= self.exact_threshold:
+                counts = df[column].value_counts(dropna=False)
+                if len(counts) <= self.exact_threshold:
+                    exact_counts = Counter(dict(zip(counts.index.tolist(), counts.tolist())))
+            column_info[column] = self._profile_column(sample_df[column], exact_counts, total, df[column].dtype)
+        logger.info(f"已抽样统计表格：共 {total} 行，样本 {len(sample_df)} 行")
+        return column_info, total
+
+    def _profile_column(self, values: pd.Series, exact_counts: Counter, total: int, dtype=None) -> dict:
+        info = {"type": str(dtype if dtype is not None else values.dtype)}
+
+        if exact_counts is not None:
+            # 低基数列：精确的取值与频数
+            info["unique_values"] = [value for value, _ in exact_counts.most_common()]
+            info["distinct"] = len(exact_counts)
+            info["distinct_bounds"] = (info["distinct"], info["distinct"])
+            info["exact"] = True
+            info["frequencies"] = {
+                str(value): {"frequency": count / total, "low": count / total, "high": count / total}
+                for value, count in exact_counts.most_common(self.max_frequencies)
+            }
+            return info
+
+        n = len(values)
+        counts = Counter(values.tolist())
+        sample_distinct = len(counts)
+        singletons = sum(1 for count in counts.values() if count == 1)
+        if n >= total:
+            estimate = low = high = sample_distinct
+        else:
+            # GEE 估计量：sqrt(N/n)*f1 + Σ_{j≥2} f_j，上下界为 [d, (N/n)*f1 + Σ_{j≥2} f_j]
+            scale = total / n
+            repeated = sample_distinct - singletons
+            estimate = math.sqrt(scale) * singletons + repeated
+            low = sample_distinct
+            high = min(scale * singletons + repeated, total)
+
+        # 有限总体修正的正态近似置信区间
+        correction = (total - n) / (total - 1) if total > 1 else 0
+        frequencies = {}
+        for value, count in counts.most_common(self.max_frequencies):
+            p = count / n
+            margin = self.z * math.sqrt(p * (1 - p) / n * correction)
+            frequencies[str(value)] = {
+                "frequency": p,
+                "low": max(p - margin, 0.0),
+                "high": min(p + margin, 1.0),
+            }
+
+        info["unique_values"] = list(counts)
+        info["distinct"] = round(estimate)
+        info["distinct_bounds"] = (low, round(high))
+        info["exact"] = False
+        info["frequencies"] = frequencies
+        return info
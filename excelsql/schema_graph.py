@@ -0,0 +1,233 @@
+import re
+import hashlib
+from collections import deque
+from itertools import combinations
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from .utils.log import logger
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NUMERIC_TYPE_RE = re.compile(r"INT|DEC|NUM|FLOAT|DOUBLE|REAL|float|int", re.IGNORECASE)
+_NAME_SUFFIX_RE = re.compile(r"(编号|代码|编码|号码|_?id|_?code|_?no)$", re.IGNORECASE)
+
+
+def _hash_value(value) -> int:
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % _MERSENNE_PRIME
+
+
+def minhash_signature(values, num_perm: int = 64, seed: int = 1, chunk_size: int = 4096) -> List[int]:
+    """
+    计算一组不同值的 MinHash 签名
+
+    args:
+        values: 不同值（会被转为字符串后哈希）
+        num_perm (int): 哈希函数个数
+        seed (int): 随机种子，同一张图中的签名必须使用相同的种子
+        chunk_size (int): 每次向量化计算的值数量
+
+    return:
+        List[int]: 签名；没有值时返回空列表
+    """
+    hashes = np.fromiter((_hash_value(v) for v in values), dtype=np.uint64)
+    if hashes.size == 0:
+        return []
+
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+    signature = np.full(num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+    for start in range(0, hashes.size, chunk_size):
+        chunk = hashes[start : start + chunk_size]
+        permuted = (a[:, None] * chunk[None, :] + b[:, None]) % _MERSENNE_PRIME
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return signature.tolist()
+
+
+def estimate_jaccard(signature_a: List[int], signature_b: List[int]) -> float:
+    """由两个 MinHash 签名估计 Jaccard 相似度"""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+
+
+def add_minhash_signatures(profile: dict, df: pd.DataFrame, num_perm: int = 64):
+    """
+    为结构化列信息中的每一列添加不同值的 MinHash 签名
+
+    args:
+        profile (dict): `build_column_profile` 生成的结构化信息，原地修改
+        df (pd.DataFrame): 表格数据
+        num_perm (int): 哈希函数个数
+    """
+    for column, entry in zip(df.columns, profile["columns"]):
+        entry["minhash"] = minhash_signature(df[column].dropna().unique(), num_perm=num_perm)
+
+
+def _normalize_name(name: str) -> str:
+    name = str(name).strip().lower()
+    return re.sub(r"[\s_\-]", "", name)
+
+
+def _is_numeric(sql_type: str) -> bool:
+    return bool(_NUMERIC_TYPE_RE.search(sql_type or ""))
+
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r"\s+", "", str(text).lower())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class SchemaGraph:
+    """
+    多表结构图
+
+    节点是表格目录中的表，边是推断出的候选连接键：列名相同（或去掉“编号/id”等后缀后相同）、
+    类型兼容，且根据 MinHash 估计的取值包含度足够高。针对每个问题只选出相关的表和连接路径
+    放入SQL生成的提示词中。
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, dict],
+        min_join_score: float = 0.5,
+        max_tables: int = 3,
+        min_containment: float = 0.2,
+    ):
+        """
+        args:
+            profiles (Dict[str, dict]): {表名: 结构化列信息}
+            min_join_score (float): 连接边的最低得分
+            max_tables (int): 每个问题最多选入提示词的表数量（不含连接路径上的中间表）
+            min_containment (float): 即使列名相同，取值包含度也不能低于该值
+        """
+        self.profiles = profiles
+        self.min_join_score = min_join_score
+        self.min_containment = min_containment
+        self.max_tables = max_tables
+        self.edges = {name: [] for name in profiles}
+        self._build()
+
+    @classmethod
+    def from_catalog(cls, catalog, **kwargs) -> "SchemaGraph":
+        profiles = {}
+        for name in catalog.list_tables():
+            profile = catalog.get(name)["profile"]
+            if profile and "columns" in profile:
+                profiles[name] = profile
+        return cls(profiles, **kwargs)
+
+    def _join_score(self, column_a: dict, column_b: dict) -> float:
+        if _is_numeric(column_a["sql_type"]) != _is_numeric(column_b["sql_type"]):
+            return 0.0
+
+        name_a, name_b = _normalize_name(column_a["name"]), _normalize_name(column_b["name"])
+        if name_a == name_b:
+            name_score = 1.0
+        elif _NAME_SUFFIX_RE.sub("", name_a) == _NAME_SUFFIX_RE.sub("", name_b) != "":
+            name_score = 0.5
+        else:
+            name_score = 0.0
+
+        jaccard = estimate_jaccard(column_a.get("minhash"), column_b.get("minhash"))
+        # 外键通常是主键取值的子集：由 Jaccard 和不同值数量换算为较小集合的包含度
+        smaller = min(column_a["distinct"], column_b["distinct"]) or 1
+        containment = min(jaccard * (column_a["distinct"] + column_b["distinct"]) / ((1 + jaccard) * smaller), 1.0)
+
+        # 名称、状态、日期、备注等通用列名在不同表中常常同名，取值却毫无关系，
+        # 因此同名列也要求取值有足够的重合
+        if containment < self.min_containment or (name_score == 0.0 and containment < 0.9):
+            return 0.0
+        return 0.5 * name_score + containment
+
+    def _build(self):
+        for table_a, table_b in combinations(self.profiles, 2):
+            for column_a in self.profiles[table_a]["columns"]:
+                for column_b in self.profiles[table_b]["columns"]:
+                    score = self._join_score(column_a, column_b)
+                    if score < self.min_join_score:
+                        continue
+                    self.edges[table_a].append((table_b, column_a["name"], column_b["name"], score))
+                    self.edges[table_b].append((table_a, column_b["name"], column_a["name"], score))
+
+        for table, edges in self.edges.items():
+            edges.sort(key=lambda e: -e[3])
+        logger.info(f"表结构图已构建：{len(self.profiles)} 张表，{sum(map(len, self.edges.values())) // 2} 条候选连接")
+
+    def _relevance(self, query_bigrams: set, profile: dict) -> float:
+        terms = [profile["table"], profile.get("description", "")]
+        for column in profile["columns"]:
+            terms.append(column["name"])
+            terms.append(column["description"])
+            terms.extend(str(v) for v in (column["value_domain"] or [])[:20])
+        table_bigrams = set().union(*(_bigrams(term) for term in terms))
+        return len(query_bigrams & table_bigrams) / (len(query_bigrams) or 1)
+
+    def _path(self, source: str, target: str) -> list:
+        """在结构图上找到两张表之间的最短连接路径，返回路径上的边"""
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            table = queue.popleft()
+            if table == target:
+                break
+            for neighbor, column, neighbor_column, score in self.edges[table]:
+                if neighbor not in previous:
+                    previous[neighbor] = (table, column, neighbor_column, score)
+                    queue.append(neighbor)
+        if target not in previous:
+            return []
+
+        path = []
+        table = target
+        while previous[table] is not None:
+            parent, column, neighbor_column, score = previous[table]
+            path.append((parent, column, table, neighbor_column, score))
+            table = parent
+        return path[::-1]
+
+    def select(self, query: str) -> dict:
+        """
+        为问题选择相关的表和连接路径
+
+        args:
+            query (str): 标准化后的问题
+
+        return:
+            dict: {"tables": 表名列表, "joins": [(表A, 列A, 表B, 列B, 得分), ...]}
+        """
+        if not self.profiles:
+            return {"tables": [], "joins": []}
+
+        query_bigrams = _bigrams(query)
+        scores = {name: self._relevance(query_bigrams, profile) for name, profile in self.profiles.items()}
+        ranked = sorted(scores, key=lambda name: -scores[name])
+        best = scores[ranked[0]]
+        selected = [name for name in ranked[: self.max_tables] if scores[name] >= 0.5 * best]
+
+        tables = list(selected[:1])
+        joins = []
+        for table in selected[1:]:
+            path = self._path(tables[0], table)
+            if not path:
+                continue
+            for edge in path:
+                if edge[2] not in tables:
+                    tables.append(edge[2])
+                if edge not in joins:
+                    joins.append(edge)
+        return {"tables": tables, "joins": joins}
+
+    @staticmethod
+    def describe_joins(joins: list) -> str:
+        """生成连接关系的文档说明"""
+        if not joins:
+            return ""
+        lines = ["表之间的连接关系（根据字段名、类型和取值重合度推断）："]
+        for table_a, column_a, table_b, column_b, score in joins:
+            lines.append(f"- {table_a}.{column_a} = {table_b}.{column_b}（置信度 {min(score / 1.5, 1.0):.2f}）")
+        return "\n".join(lines)
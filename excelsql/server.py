@@ -0,0 +1,205 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    from fastapi import FastAPI, File, HTTPException, UploadFile
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import PlainTextResponse
+    from pydantic import BaseModel
+except ImportError as e:  # pragma: no cover
+    raise ImportError("HTTP服务需要安装可选依赖：pip install -e .[server]") from e
+
+from .db import pool_status
+from .utils.log import logger
+from .utils.result import QueryResult, serialize_denotation
+from .utils.trace import tracer
+
+
+class AnswerRequest(BaseModel):
+    question: str
+    table_name: Optional[str] = None
+    timeout: Optional[float] = None
+
+
+def _serialize_answer(result: dict, max_rows: int) -> dict:
+    return jsonable_encoder(
+        {
+            "question": result["question"],
+            "normalized_query": result["normalized_query"],
+            "tables": result["tables"],
+            "reused": result["reused"],
+            "sql": result["sql"],
+            "flag": result["flag"],
+            "result": serialize_denotation(result["denotation"], max_rows),
+            "attempts": result["attempts"],
+            "errors": result["errors"],
+            "trace_id": result.get("trace_id"),
+        }
+    )
+
+
+class QueryService:
+    """
+    共享一个 ExcelSQL 实例的异步查询服务
+
+    阻塞的 `ExcelSQL.answer` 在有限大小的线程池中执行，并用信号量限制同时处理的问题数量；
+    每个请求有独立的截止时间；相同的问题（相同的表）在处理期间只会执行一次，
+    后到的请求等待并共享同一个结果。
+    """
+
+    def __init__(self, excel_sql, max_concurrency: int = 8, timeout: float = 120, max_rows: int = 1000):
+        """
+        args:
+            excel_sql (ExcelSQL): 共享的 ExcelSQL 实例
+            max_concurrency (int): 同时处理的问题数量
+            timeout (float): 默认的请求截止时间（秒）
+            max_rows (int): 响应中最多返回的结果行数
+        """
+        self.excel_sql = excel_sql
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="answer")
+        self._semaphore = None
+        self._in_flight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "timeouts": 0}
+
+    async def _answer(self, question: str, table_name: Optional[str]) -> dict:
+        if self._semaphore is None:
+            # 信号量需要在事件循环中创建
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.excel_sql.answer, question, table_name)
+
+    async def answer(self, question: str, table_name: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+        """
+        回答问题，相同的进行中问题会被合并
+
+        args:
+            question (str): 用户问题
+            table_name (str, optional): 表名
+            timeout (float, optional): 本次请求的截止时间（秒），默认使用服务配置，且不超过服务配置
+
+        return:
+            dict: `ExcelSQL.answer` 的结果
+        """
+        self.stats["requests"] += 1
+        timeout = min(timeout, self.timeout) if timeout else self.timeout
+        key = (" ".join(question.split()), table_name)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._answer(question, table_name))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        try:
+            # shield：某个请求超时不会取消其他请求共享的任务
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_app(
+    excel_sql,
+    max_concurrency: int = 8,
+    timeout: float = 120,
+    max_rows: int = 1000,
+    upload_dir: str = "data",
+) -> FastAPI:
+    """
+    创建 HTTP/JSON 服务
+
+    args:
+        excel_sql (ExcelSQL): 共享的 ExcelSQL 实例
+        max_concurrency (int): 同时处理的问题数量
+        timeout (float): 默认的请求截止时间（秒），也是请求可指定的上限
+        max_rows (int): 响应中最多返回的结果行数
+        upload_dir (str): 上传的文件保存的目录
+
+    return:
+        FastAPI: 应用实例
+    """
+    service = QueryService(excel_sql, max_concurrency=max_concurrency, timeout=timeout, max_rows=max_rows)
+    app = FastAPI(title="ExcelSQL")
+    app.state.service = service
+
+    @app.on_event("shutdown")
+    def _shutdown():
+        service.shutdown()
+
+    @app.get("/health")
+    def health():
+        return {
+            "status": "ok",
+            **service.stats,
+            "in_flight": len(service._in_flight),
+            "db_pool": pool_status(excel_sql.db_engine),
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return tracer.prometheus()
+
+    @app.get("/traces/{trace_id}")
+    def trace(trace_id: str):
+        return {"summary": tracer.summary(trace_id), "spans": tracer.spans(trace_id)}
+
+    @app.get("/tables")
+    def tables():
+        return {"tables": excel_sql.list_tables()}
+
+    @app.post("/answer")
+    async def answer(request: AnswerRequest):
+        if request.table_name is not None and request.table_name not in excel_sql.list_tables():
+            raise HTTPException(status_code=404, detail=f"表格 {request.table_name} 不存在")
+        # 未启用跨表提问时必须指定表名：共享实例上的当前表会被其他并发请求改变
+        if request.table_name is None and not excel_sql.schema_graph_cfg.get("enabled", False):
+            raise HTTPException(status_code=422, detail="未启用 schema_graph 时必须指定 table_name")
+        try:
+            result = await service.answer(request.question, request.table_name, request.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="处理超时")
+        except Exception as e:
+            logger.error(f"回答问题失败: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        return _serialize_answer(result, service.max_rows)
+
+    @app.post("/upload")
+    def upload(file: UploadFile = File(...)):
+        # 只接收上传的文件内容并保存到上传目录，不读取服务器上的任意路径
+        name = os.path.basename(file.filename or "")
+        if not name.lower().endswith((".xlsx", ".xls")):
+            raise HTTPException(status_code=400, detail="只支持 .xlsx 和 .xls 格式的文件")
+        data = file.file.read()
+        file_path = os.path.join(upload_dir, name)
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                if f.read() != data:
+                    raise HTTPException(status_code=409, detail=f"已存在内容不同的同名文件 {name}")
+        else:
+            os.makedirs(upload_dir, exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(data)
+        return {"job_id": excel_sql.submit_excel(file_path, source=data)}
+
+    @app.get("/jobs/{job_id}")
+    def job(job_id: str):
+        result = excel_sql.ingest_queue.get(job_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
+        preview = result["preview"]
+        if preview is not None:
+            rows = QueryResult.from_rows(preview.columns, list(preview.itertuples(index=False, name=None)))
+            result["preview"] = rows.to_dicts()
+        return jsonable_encoder(result)
+
+    return app
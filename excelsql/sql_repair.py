@@ -0,0 +1,246 @@
+import re
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect
+from .utils.log import logger
+
+# 单引号字符串、双引号/反引号/方括号标识符，这些片段中的内容不做改写
+_QUOTED_RE = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|`[^`]*`|\[[^\]]*\]")
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+_TABLE_REF_RE = re.compile(r"(\b(?:FROM|JOIN|INTO|UPDATE)\s+)([^\s,;()]+)", re.IGNORECASE)
+_PLAIN_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_ERROR_CLASSES = [
+    ("missing_table", re.compile(r"no such table|doesn't exist|does not exist.*relation|relation .* does not exist|Invalid object name|unknown table", re.IGNORECASE)),
+    ("missing_column", re.compile(r"no such column|unknown column|column .* does not exist|Invalid column name", re.IGNORECASE)),
+    ("missing_function", re.compile(r"no such function|function .* does not exist|FUNCTION .* does not exist|is not a recognized built-in function", re.IGNORECASE)),
+    ("syntax", re.compile(r"syntax error|near \"|You have an error in your SQL syntax|unrecognized token", re.IGNORECASE)),
+]
+
+# 各方言中不支持的常见函数及其替换
+_FUNCTION_REWRITES = {
+    "sqlite": [
+        (r"\bNOW\s*\(\s*\)", "CURRENT_TIMESTAMP"),
+        (r"\bGETDATE\s*\(\s*\)", "CURRENT_TIMESTAMP"),
+        (r"\bCURDATE\s*\(\s*\)", "DATE('now')"),
+        (r"\b(?:LEN|CHAR_LENGTH|CHARACTER_LENGTH)\s*\(", "LENGTH("),
+        (r"\bISNULL\s*\(", "IFNULL("),
+    ],
+    "mysql": [
+        (r"\bGETDATE\s*\(\s*\)", "NOW()"),
+        (r"\bLEN\s*\(", "CHAR_LENGTH("),
+        (r"\bISNULL\s*\(([^,()]+),", r"IFNULL(\1,"),
+    ],
+    "postgresql": [
+        (r"\bGETDATE\s*\(\s*\)", "NOW()"),
+        (r"\b(?:IFNULL|ISNULL)\s*\(", "COALESCE("),
+        (r"\bLEN\s*\(", "LENGTH("),
+        (r"\bCURDATE\s*\(\s*\)", "CURRENT_DATE"),
+    ],
+}
+
+
+def classify_error(error: str) -> str:
+    """
+    根据数据库错误信息判断错误类别
+
+    return:
+        str: missing_table / missing_column / missing_function / syntax / other
+    """
+    for name, pattern in _ERROR_CLASSES:
+        if pattern.search(error or ""):
+            return name
+    return "other"
+
+
+def strip_markdown_fences(sql: str) -> str:
+    """去掉模型输出中的 Markdown 代码块标记"""
+    return _FENCE_RE.sub("", sql).strip()
+
+
+def _normalize_identifier(name: str) -> str:
+    return re.sub(r"[\s_]+", "", name.lower())
+
+
+def _rewrite_code(sql: str, rewrite: Callable[[str], str]) -> str:
+    """只对引号之外的SQL片段应用改写"""
+    parts, last = [], 0
+    for match in _QUOTED_RE.finditer(sql):
+        parts.append(rewrite(sql[last : match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(rewrite(sql[last:]))
+    return "".join(parts)
+
+
+class SQLRepairer:
+    """
+    SQL执行失败后的本地修复
+
+    根据数据库错误类别做确定性的改写：去掉 Markdown 代码块标记、纠正大小写和空格写法不同的表名与列名、
+    为包含中文或空格的列名加引号、替换当前方言不支持的函数。不按名称相似度猜测其他真实的表或列。
+    改写后重新验证，只有修复失败时才需要调用LLM重新生成。
+    """
+
+    def __init__(self, db_engine, catalog=None, max_passes: int = 3):
+        """
+        args:
+            db_engine: SQLAlchemy 引擎
+            catalog (TableCatalog, optional): 表格目录，用于获取真实的表名和列名
+            max_passes (int): 最多连续修复的轮数（每轮修复后可能暴露出下一个错误）
+        """
+        self.db_engine = db_engine
+        self.catalog = catalog
+        self.max_passes = max_passes
+        self.dialect = db_engine.dialect.name
+        self.preparer = db_engine.dialect.identifier_preparer
+
+    def _schema(self) -> dict:
+        """返回 {表名: [列名, ...]}，优先使用表格目录中的结构化列信息"""
+        schema = {}
+        if self.catalog is not None:
+            for table_name in self.catalog.list_tables():
+                profile = self.catalog.get(table_name)["profile"]
+                if profile and "columns" in profile:
+                    schema[table_name] = [column["name"] for column in profile["columns"]]
+        try:
+            inspector = inspect(self.db_engine)
+            for table_name in inspector.get_table_names():
+                if table_name not in schema:
+                    schema[table_name] = [column["name"] for column in inspector.get_columns(table_name)]
+        except Exception as e:
+            logger.warning(f"读取数据库表结构失败: {e}")
+        return schema
+
+    def _fix_tables(self, sql: str, schema: dict) -> str:
+        lookup = {name.lower(): name for name in schema}
+
+        def replace(match):
+            name = match.group(2).strip('"`[]')
+            if name in schema:
+                return match.group(0)
+            # 只按大小写和空格差异还原；名称相近的其他真实表（如 sales_2025 与 sales_2024）不做替换，
+            # 交给LLM重新生成
+            candidate = lookup.get("_".join(name.lower().split()))
+            if candidate is None:
+                return match.group(0)
+            return match.group(1) + self.preparer.quote(candidate)
+
+        def rewrite(code):
+            # 表名由文件名转换而来（小写、空格替换为下划线），先还原“Sales Data”这类写法
+            for name in schema:
+                parts = [re.escape(part) for part in re.split(r"[\s_\-]+", name) if part]
+                if len(parts) > 1:
+                    loose = re.compile(
+                        r"(\b(?:FROM|JOIN|INTO|UPDATE)\s+)(" + r"[\s_\-]+".join(parts) + r")(?![\w])",
+                        re.IGNORECASE,
+                    )
+                    code = loose.sub(lambda m: m.group(0) if m.group(2) == name else m.group(1) + name, code)
+            return _TABLE_REF_RE.sub(replace, code)
+
+        return _rewrite_code(sql, rewrite)
+
+    def _quote_columns(self, sql: str, columns: List[str]) -> str:
+        special = sorted(
+            (c for c in columns if not _PLAIN_IDENTIFIER_RE.match(c)),
+            key=len,
+            reverse=True,
+        )
+        if not special:
+            return sql
+        pattern = re.compile(
+            r"(?<![\w])(" + "|".join(re.escape(c) for c in special) + r")(?![\w])"
+        )
+        return _rewrite_code(sql, lambda code: pattern.sub(lambda m: self.preparer.quote_identifier(m.group(1)), code))
+
+    def _fix_column(self, sql: str, error: str, columns: List[str]) -> str:
+        """
+        将错误信息中不存在的列名替换为只在大小写、空格或下划线上不同的真实列名
+
+        名称相近但不同的列不做替换，交给LLM重新生成
+        """
+        match = re.search(r"(?:no such column|unknown column|column)\s*:?\s*['\"`]?([^'\"`\s]+)['\"`]?", error, re.IGNORECASE)
+        if not match:
+            return sql
+        wrong = match.group(1).split(".")[-1]
+        close = [column for column in columns if _normalize_identifier(column) == _normalize_identifier(wrong)]
+        if len(close) != 1 or close[0] == wrong:
+            return sql
+        pattern = re.compile(r"(?<![\w])" + re.escape(wrong) + r"(?![\w])")
+        replacement = self.preparer.quote_identifier(close[0])
+        sql = _rewrite_code(sql, lambda code: pattern.sub(lambda m: replacement, code))
+        # 列名本身被引号包裹时，替换引号内的列名
+        for quote in ('"', "`"):
+            sql = sql.replace(f"{quote}{wrong}{quote}", replacement)
+        return sql
+
+    def _fix_functions(self, sql: str) -> str:
+        rewrites = _FUNCTION_REWRITES.get(self.dialect, [])
+
+        def rewrite(code):
+            for pattern, replacement in rewrites:
+                code = re.sub(pattern, replacement, code, flags=re.IGNORECASE)
+            return code
+
+        return _rewrite_code(sql, rewrite)
+
+    def rewrite(self, sql: str, error: str, schema: dict) -> Tuple[str, List[str]]:
+        """
+        根据错误类别对SQL做一轮确定性改写
+
+        args:
+            sql (str): 执行失败的SQL
+            error (str): 数据库错误信息
+            schema (dict): {表名: [列名, ...]}
+
+        return:
+            tuple: (改写后的SQL, 应用的修复列表)
+        """
+        fixes = []
+        error_class = classify_error(error)
+        columns = sorted({column for names in schema.values() for column in names})
+
+        # 去掉代码块标记、为特殊列名加引号、替换方言函数总是安全的；纠正表名和列名只针对对应的错误类别
+        steps = [
+            ("strip_fences", strip_markdown_fences),
+            ("quote_identifiers", lambda s: self._quote_columns(s, columns)),
+            ("fix_functions", self._fix_functions),
+        ]
+        # 含空格的表名（如 Sales Data）表现为语法错误
+        if error_class in ("missing_table", "syntax"):
+            steps.append(("fix_table_name", lambda s: self._fix_tables(s, schema)))
+        if error_class == "missing_column":
+            steps.append(("fix_column_name", lambda s: self._fix_column(s, error, columns)))
+
+        for name, step in steps:
+            rewritten = step(sql)
+            if rewritten != sql:
+                fixes.append(name)
+                sql = rewritten
+        return sql, fixes
+
+    def repair(self, sql: str, error: str, check: Callable[[str], tuple]) -> Tuple[str, bool, object, List[str]]:
+        """
+        反复改写并重新验证，直到执行成功、无法继续改写或达到最大轮数
+
+        args:
+            sql (str): 执行失败的SQL
+            error (str): 数据库错误信息
+            check (Callable[[str], tuple]): 验证函数，返回 (是否成功, 结果或错误信息)
+
+        return:
+            tuple: (最后的SQL, 是否成功, 结果或错误信息, 应用的修复列表)
+        """
+        schema = self._schema()
+        applied = []
+        denotation = error
+        for _ in range(self.max_passes):
+            rewritten, fixes = self.rewrite(sql, str(denotation), schema)
+            if not fixes:
+                break
+            applied.extend(fixes)
+            sql = rewritten
+            flag, denotation = check(sql)
+            if flag:
+                logger.info(f"SQL已在本地修复（{', '.join(applied)}）")
+                return sql, True, denotation, applied
+        return sql, False, denotation, applied
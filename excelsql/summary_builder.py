@@ -0,0 +1,211 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect
+from .column_profile import distinct_count
+from .utils.log import logger
+
+_DESCRIPTION_HEADER = "预聚合汇总表（按维度预先计算的统计结果，按下列维度分组的计数、求和、平均值、最值问题应优先查询这些表，无需扫描基础表）："
+
+
+class SummaryBuilder:
+    """
+    上传时构建预聚合汇总表
+
+    根据列信息选出低基数的维度列和数值型的度量列，按每个维度物化
+    行数以及各度量的求和、非空计数、最小值和最大值，使常见的分组统计问题
+    无需扫描整张基础表。
+    """
+
+    def __init__(
+        self,
+        db_engine,
+        enabled: bool = False,
+        max_dimension_cardinality: int = 50,
+        max_measures: int = 5,
+        output_dir: str = "outputs/summary",
+    ):
+        """
+        args:
+            db_engine: SQLAlchemy 引擎
+            enabled (bool): 是否在上传时构建汇总表
+            max_dimension_cardinality (int): 维度列的最大不同值数量
+            max_measures (int): 每张汇总表最多包含的度量列数量
+            output_dir (str): 汇总表清单的保存目录
+        """
+        self.db_engine = db_engine
+        self.enabled = enabled
+        self.max_dimension_cardinality = max_dimension_cardinality
+        self.max_measures = max_measures
+        self.output_dir = output_dir
+
+    def _manifest_path(self, table_name: str) -> str:
+        return os.path.join(self.output_dir, f"{table_name}.json")
+
+    def _load_manifest(self, table_name: str) -> dict:
+        try:
+            with open(self._manifest_path(table_name), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self, table_name: str, manifest: dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self._manifest_path(table_name), "w") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def plan(self, table_name: str, df: pd.DataFrame, column_info: dict) -> list:
+        """
+        根据列信息规划需要构建的汇总表
+
+        args:
+            table_name (str): 基础表名
+            df (pd.DataFrame): 表格数据
+            column_info (dict): 列信息，包含每列的唯一值
+
+        return:
+            list: 汇总表定义，每项包含汇总表名、维度列和度量列
+        """
+        row_count = len(df)
+        dimensions = []
+        measures = []
+        for position, column in enumerate(df.columns):
+            distinct = distinct_count(column_info[column])
+            if 1 < distinct <= self.max_dimension_cardinality and distinct < row_count:
+                dimensions.append((position, column))
+            elif pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column]):
+                measures.append((distinct, column))
+
+        # 优先选择不同值较多的数值列作为度量
+        measures = [column for _, column in sorted(measures, key=lambda m: -m[0])]
+        measures = measures[: self.max_measures]
+
+        return [
+            {
+                # 列名可能包含中文或空格，汇总表名使用维度列的序号
+                "table": f"{table_name}_agg_{position}",
+                "dimension": str(column),
+                "measures": [str(m) for m in measures],
+            }
+            for position, column in dimensions
+        ]
+
+    def _fingerprint(self, df: pd.DataFrame, spec: dict) -> str:
+        columns = [spec["dimension"]] + spec["measures"]
+        digest = hashlib.sha1(json.dumps(spec, ensure_ascii=False).encode())
+        digest.update(pd.util.hash_pandas_object(df[columns], index=False).values.tobytes())
+        return digest.hexdigest()
+
+    def _aggregate(self, df: pd.DataFrame, spec: dict) -> pd.DataFrame:
+        grouped = df.groupby(spec["dimension"], dropna=False)
+        summary = grouped.size().rename("row_count").to_frame()
+        for measure in spec["measures"]:
+            summary[f"{measure}_sum"] = grouped[measure].sum()
+            summary[f"{measure}_count"] = grouped[measure].count()
+            summary[f"{measure}_min"] = grouped[measure].min()
+            summary[f"{measure}_max"] = grouped[measure].max()
+        return summary.reset_index()
+
+    def _drop(self, summary_table: str):
+        Table(summary_table, MetaData()).drop(self.db_engine, checkfirst=True)
+
+    def build(self, table_name: str, df: pd.DataFrame, column_info: dict) -> list:
+        """
+        构建或增量更新汇总表
+
+        只重建维度列或度量列数据发生变化的汇总表，并删除不再需要的旧汇总表。
+
+        args:
+            table_name (str): 基础表名
+            df (pd.DataFrame): 表格数据
+            column_info (dict): 列信息，包含每列的唯一值
+
+        return:
+            list: 当前有效的汇总表定义
+        """
+        if not self.enabled:
+            return []
+
+        specs = self.plan(table_name, df, column_info)
+        manifest = self._load_manifest(table_name)
+        existing_tables = set(inspect(self.db_engine).get_table_names())
+
+        new_manifest = {}
+        for spec in specs:
+            fingerprint = self._fingerprint(df, spec)
+            previous = manifest.get(spec["table"])
+            if (
+                previous is not None
+                and previous["fingerprint"] == fingerprint
+                and spec["table"] in existing_tables
+            ):
+                logger.info(f"汇总表 {spec['table']} 未变化，跳过重建")
+            else:
+                try:
+                    self._aggregate(df, spec).to_sql(
+                        name=spec["table"],
+                        con=self.db_engine,
+                        if_exists="replace",
+                        index=False,
+                    )
+                except Exception as e:
+                    logger.error(f"构建汇总表 {spec['table']} 失败: {e}")
+                    continue
+                logger.info(f"汇总表 {spec['table']} 已构建（维度：{spec['dimension']}）")
+            new_manifest[spec["table"]] = {**spec, "fingerprint": fingerprint}
+
+        for stale_table in set(manifest) - set(new_manifest):
+            self._drop(stale_table)
+            logger.info(f"已删除过期的汇总表 {stale_table}")
+
+        self._save_manifest(table_name, new_manifest)
+        return list(new_manifest.values())
+
+    @staticmethod
+    def describe(specs: list) -> str:
+        """
+        生成汇总表的文档说明，附加在基础表文档之后供SQL生成使用
+
+        args:
+            specs (list): 汇总表定义
+
+        return:
+            str: 文档说明，没有汇总表时返回空字符串
+        """
+        if not specs:
+            return ""
+
+        lines = [
+            "",
+            _DESCRIPTION_HEADER,
+            "注意：每张汇总表只保留其维度字段，其余字段已被聚合掉。只有问题的所有筛选条件（WHERE）和分组字段"
+            "都是该表的维度字段时才能使用它；筛选或分组涉及其他字段（如按日期、地区过滤）时，汇总表的结果是错误的，"
+            "必须查询基础表。",
+        ]
+        for idx, spec in enumerate(specs, 1):
+            lines.append(f"{idx}. {spec['table']}")
+            lines.append(f"    - 维度字段：{spec['dimension']}（与基础表同名同义，包含空值分组）")
+            lines.append("    - row_count：该维度取值下的行数")
+            for measure in spec["measures"]:
+                lines.append(
+                    f"    - {measure}_sum / {measure}_count / {measure}_min / {measure}_max："
+                    f"{measure} 的求和 / 非空计数 / 最小值 / 最大值（平均值 = {measure}_sum / {measure}_count）"
+                )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def strip_description(document: str) -> str:
+        """
+        去掉文档末尾由 `describe` 附加的汇总表说明
+
+        按说明的标题行切分，说明的措辞调整后仍能去掉早先保存的说明。
+
+        args:
+            document (str): 表格文档
+
+        return:
+            str: 基础表文档
+        """
+        index = document.rfind("\n" + _DESCRIPTION_HEADER)
+        return document[:index] if index >= 0 else document
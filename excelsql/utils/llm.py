@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from contextlib import nullcontext
+from .trace import tracer
+from .statistic_data import statistic_data, statistic_lock
+
+# 按 (API_KEY, BASE_URL) 共享的 OpenAI 客户端；同一个客户端的连接池可被多个线程共用
+_clients = {}
+_clients_lock = threading.Lock()
+
+# 全进程共享的模型并发上限，所有组件、所有问题的调用都受其限制；None 表示不限制
+_llm_semaphore = None
+
+
+def configure_llm(max_concurrency: int = None):
+    """
+    设置全局的模型并发上限，对应配置文件中的 llm 部分
+
+    args:
+        max_concurrency (int, optional): 同时进行的模型调用数量上限，None 或 <= 0 表示不限制
+    """
+    global _llm_semaphore
+    _llm_semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency and max_concurrency > 0 else None
+
+
+def get_client():
+    """
+    返回按当前环境变量 API_KEY、BASE_URL 创建的 OpenAI 客户端，首次调用时才导入 openai 并创建
+
+    return:
+        OpenAI: 相同配置的所有组件共用的客户端
+    """
+    key = (os.getenv("API_KEY"), os.getenv("BASE_URL"))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            from openai import OpenAI
+
+            client = _clients[key] = OpenAI(api_key=key[0], base_url=key[1])
+        return client
+
+
+class LazyClient:
+    """
+    组件的 `client` 属性：首次访问时才通过 `get_client` 创建，也可以直接赋值替换（如评测时包装为缓存客户端）
+    """
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        client = instance.__dict__.get("client")
+        if client is None:
+            client = instance.__dict__["client"] = get_client()
+        return client
+
+    def __set__(self, instance, value):
+        instance.__dict__["client"] = value
+
+
+def chat_completion(client, model: str, messages: list, component: str, **kwargs):
+    """
+    调用模型并记录 span、调用次数和 token 数
+
+    args:
+        client: OpenAI 兼容客户端
+        model (str): 模型名称
+        messages (list): 消息列表
+        component (str): 发起调用的组件，如 "sql_agent"
+        **kwargs: 传给 `chat.completions.create` 的其他参数
+
+    return:
+        模型响应
+    """
+    semaphore = _llm_semaphore
+    start = time.perf_counter()
+    with semaphore if semaphore is not None else nullcontext():
+        # 等待并发名额的时间单独统计，不计入模型调用的耗时
+        tracer.observe("excelsql_llm_wait_seconds", time.perf_counter() - start)
+        with tracer.span("llm.call", component=component, model=model) as span:
+            response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+            usage = getattr(response, "usage", None)
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+            completion_tokens = getattr(usage, "completion_tokens", None) or 0
+            span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    tracer.incr("excelsql_llm_calls_total", component=component)
+    tracer.incr("excelsql_llm_tokens_total", prompt_tokens, kind="prompt")
+    tracer.incr("excelsql_llm_tokens_total", completion_tokens, kind="completion")
+    with statistic_lock:
+        statistic_data["llm_call"] += 1
+        statistic_data["prompt_tokens"] += prompt_tokens
+        statistic_data["completion_tokens"] += completion_tokens
+    return response
@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from ..column_profile import estimate_tokens
+
+
+def request_key(model: str, messages: list) -> str:
+    """请求的指纹：模型和全部消息相同的请求视为同一请求"""
+    payload = json.dumps({"model": model, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    可回放的模型响应缓存
+
+    以 JSONL 追加写入，每行 {"key", "index", "content", "prompt_tokens", "completion_tokens"}。
+    同一请求在一次运行中第 k 次出现时返回第 k 条录制的响应，因此多个生成器发送相同提示词时
+    仍能得到各自不同的响应；超出录制数量时才调用真实模型并追加录制。
+    """
+
+    def __init__(self, path: str):
+        """
+        args:
+            path (str): 缓存文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses = defaultdict(dict)
+        self._occurrences = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry["key"]][entry["index"]] = entry
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def reset_occurrences(self):
+        """开始新的一次运行：请求的出现次数从头计数"""
+        with self._lock:
+            self._occurrences.clear()
+
+    def next_index(self, key: str) -> int:
+        with self._lock:
+            index = self._occurrences[key]
+            self._occurrences[key] += 1
+            return index
+
+    def get(self, key: str, index: int):
+        with self._lock:
+            return self._responses[key].get(index)
+
+    def put(self, key: str, index: int, content: str, prompt_tokens: int, completion_tokens: int) -> dict:
+        entry = {
+            "key": key,
+            "index": index,
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        with self._lock:
+            self._responses[key][index] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+
+class CachedChatClient:
+    """
+    包装 OpenAI 客户端：命中缓存时直接返回录制的响应，并统计调用次数和 token 数
+
+    只实现 `client.chat.completions.create`，可直接替换各组件的 `client` 属性；
+    多个组件共用同一个实例时，统计结果即为整条流水线的开销。
+    """
+
+    def __init__(self, client, cache: ResponseCache):
+        """
+        args:
+            client: 原始的 OpenAI 客户端
+            cache (ResponseCache): 响应缓存
+        """
+        self._client = client
+        self._cache = cache
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.reset_stats()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def reset_stats(self):
+        with self._lock:
+            for name in ("calls", "cache_hits", "prompt_tokens", "completion_tokens"):
+                self.stats[name] = 0
+
+    def create(self, model: str, messages: list, **kwargs):
+        key = request_key(model, messages)
+        index = self._cache.next_index(key)
+        entry = self._cache.get(key, index)
+        hit = entry is not None
+        if not hit:
+            response = self._client.chat.completions.create(model=model, messages=messages, **kwargs)
+            content = response.choices[0].message.content
+            usage = getattr(response, "usage", None)
+            prompt_tokens = getattr(usage, "prompt_tokens", None)
+            if prompt_tokens is None:
+                prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+            completion_tokens = getattr(usage, "completion_tokens", None)
+            if completion_tokens is None:
+                completion_tokens = estimate_tokens(content or "")
+            entry = self._cache.put(key, index, content, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["cache_hits"] += int(hit)
+            self.stats["prompt_tokens"] += entry["prompt_tokens"]
+            self.stats["completion_tokens"] += entry["completion_tokens"]
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=entry["content"]))],
+            usage=SimpleNamespace(
+                prompt_tokens=entry["prompt_tokens"],
+                completion_tokens=entry["completion_tokens"],
+                total_tokens=entry["prompt_tokens"] + entry["completion_tokens"],
+            ),
+        )
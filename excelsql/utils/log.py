@@ -1,6 +1,9 @@
+import json
+import queue
+import atexit
 import logging
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from pathlib import Path
 from colorama import Fore, Back, Style, init
 
@@ -8,7 +11,57 @@ from colorama import Fore, Back, Style, init
 init(autoreset=True)
 
 
-class ColoredFormatter(logging.Formatter):
+# 日志格式
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 单条日志消息的默认最大长度，超出部分截断（0 表示不截断）
+DEFAULT_MAX_LENGTH = 2000
+
+# 后台写日志的监听器，按 logger 名称保存
+_listeners = {}
+
+
+def truncate(text: str, max_length: int) -> str:
+    """
+    截断过长的日志内容，如完整的查询结果、表格文档
+
+    args:
+        text (str): 日志内容
+        max_length (int): 最大长度，<= 0 表示不截断
+
+    return:
+        str: 截断后的内容，末尾注明原始长度
+    """
+    if max_length <= 0 or len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}...（已截断，共 {len(text)} 字符）"
+
+
+class TruncatingFormatter(logging.Formatter):
+    """在格式化时才拼接消息参数并截断过长的消息"""
+
+    def __init__(self, fmt=None, datefmt=None, max_length: int = DEFAULT_MAX_LENGTH):
+        super().__init__(fmt=fmt, datefmt=datefmt)
+        self.max_length = max_length
+
+    def get_message(self, record) -> str:
+        return truncate(record.getMessage(), self.max_length)
+
+    def _format(self, record, levelname: str, message: str) -> str:
+        # 临时替换字段而不是复制整条记录；同一条记录会依次交给多个处理器，结束后必须还原
+        saved = record.levelname, record.msg, record.args
+        record.levelname, record.msg, record.args = levelname, message, None
+        try:
+            return super().format(record)
+        finally:
+            record.levelname, record.msg, record.args = saved
+
+    def format(self, record):
+        return self._format(record, record.levelname, self.get_message(record))
+
+
+class ColoredFormatter(TruncatingFormatter):
     """使用colorama实现的彩色日志格式化器"""
 
     COLORS = {
@@ -20,33 +73,88 @@ class ColoredFormatter(logging.Formatter):
     }
 
     def format(self, record):
-        # 创建记录的副本，避免修改原始记录
-        # 这样可以防止颜色代码被保存到日志记录中
-        record_copy = logging.makeLogRecord(record.__dict__)
-
-        # 添加颜色到级别名称
-        if record_copy.levelname in self.COLORS:
-            record_copy.levelname = f"{self.COLORS[record_copy.levelname]}{record_copy.levelname}{Style.RESET_ALL}"
-
-        # 为消息添加颜色
-        if record_copy.levelno >= logging.CRITICAL:
-            record_copy.msg = (
-                f"{Fore.RED}{Style.BRIGHT}{record_copy.msg}{Style.RESET_ALL}"
-            )
-        elif record_copy.levelno >= logging.ERROR:
-            record_copy.msg = f"{Fore.RED}{record_copy.msg}{Style.RESET_ALL}"
-        elif record_copy.levelno >= logging.WARNING:
-            record_copy.msg = f"{Fore.YELLOW}{record_copy.msg}{Style.RESET_ALL}"
-        elif record_copy.levelno >= logging.INFO:
-            record_copy.msg = f"{Fore.GREEN}{record_copy.msg}{Style.RESET_ALL}"
-        elif record_copy.levelno >= logging.DEBUG:
-            record_copy.msg = f"{Fore.BLUE}{record_copy.msg}{Style.RESET_ALL}"
-
-        # 调用父类的format方法处理副本
-        return super().format(record_copy)
-
-
-def setup_logger(name="ExcelSQL", log_level=logging.INFO, log_dir="logs", colored=True):
+        # 颜色代码只加在格式化结果中，不会保存到日志记录里
+        color = self.COLORS.get(record.levelname)
+        if color is None:
+            return super().format(record)
+        return self._format(
+            record,
+            f"{color}{record.levelname}{Style.RESET_ALL}",
+            f"{color}{self.get_message(record)}{Style.RESET_ALL}",
+        )
+
+
+class JsonFormatter(TruncatingFormatter):
+    """每条日志输出为一行 JSON，便于日志系统采集和检索"""
+
+    # LogRecord 的内置字段，其余字段视为通过 extra 传入的结构化字段
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.get_message(record),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """第一条日志写入时才创建日志目录和文件，导入模块时不产生任何文件操作"""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(exist_ok=True, parents=True)
+        return super()._open()
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    只把日志记录放入队列的处理器
+
+    标准的 QueueHandler 会在调用线程中拼接并格式化消息；这里保留 msg 和 args，
+    格式化与截断都推迟到后台监听线程中完成，调用线程只需一次入队。
+    因此日志参数应传入之后不再修改的对象。
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # traceback 引用调用栈，提前转为文本后再跨线程传递
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _stop_listeners():
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+
+
+atexit.register(_stop_listeners)
+
+
+def setup_logger(
+    name="ExcelSQL",
+    log_level=logging.INFO,
+    log_dir="logs",
+    colored=True,
+    async_mode=False,
+    max_length=DEFAULT_MAX_LENGTH,
+    json_format=False,
+    force=False,
+):
     """
     设置logger，同时输出到控制台和文件
 
@@ -55,6 +163,10 @@ def setup_logger(name="ExcelSQL", log_level=logging.INFO, log_dir="logs", colore
         log_level (int): 日志级别
         log_dir (str): 日志文件目录
         colored (bool): 是否在控制台使用彩色输出
+        async_mode (bool): 是否通过队列在后台线程中格式化和写入日志
+        max_length (int): 单条日志消息的最大长度，<= 0 表示不截断
+        json_format (bool): 文件日志是否输出为 JSON 行
+        force (bool): logger已有处理器时是否按新参数重新配置
 
     Returns:
         logging.Logger: 配置好的logger对象
@@ -66,54 +178,88 @@ def setup_logger(name="ExcelSQL", log_level=logging.INFO, log_dir="logs", colore
 
     # 如果logger已经有处理器，则不重复添加
     if logger.handlers:
-        return logger
+        if not force:
+            return logger
+        listener = _listeners.pop(name, None)
+        if listener is not None:
+            # 停止时会写完队列中剩余的日志
+            listener.stop()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
 
-    # 创建日志目录
     log_path = Path(log_dir)
-    log_path.mkdir(exist_ok=True, parents=True)
-
-    # 日志格式
-    log_format = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
 
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     if colored:
         # 使用彩色格式化器
-        colored_formatter = ColoredFormatter(
-            fmt=log_format,
-            datefmt=date_format,
-        )
-        console_handler.setFormatter(colored_formatter)
+        console_handler.setFormatter(ColoredFormatter(LOG_FORMAT, DATE_FORMAT, max_length=max_length))
     else:
         # 使用普通格式化器
-        plain_formatter = logging.Formatter(
-            fmt=log_format,
-            datefmt=date_format,
-        )
-        console_handler.setFormatter(plain_formatter)
-
-    logger.addHandler(console_handler)
+        console_handler.setFormatter(TruncatingFormatter(LOG_FORMAT, DATE_FORMAT, max_length=max_length))
 
     # 文件处理器 (使用RotatingFileHandler自动轮转日志文件)
     # 文件中不使用彩色，避免ANSI转义序列污染日志文件
-    file_formatter = logging.Formatter(
-        fmt=log_format,
-        datefmt=date_format,
-    )
-
-    file_handler = RotatingFileHandler(
+    file_handler = LazyRotatingFileHandler(
         filename=log_path / f"{name}.log",
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5,
         encoding="utf-8",
     )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    if json_format:
+        file_handler.setFormatter(JsonFormatter(datefmt=DATE_FORMAT, max_length=max_length))
+    else:
+        file_handler.setFormatter(TruncatingFormatter(LOG_FORMAT, DATE_FORMAT, max_length=max_length))
+
+    if async_mode:
+        # 调用线程只负责入队，控制台和文件的写入由监听线程完成
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(LazyQueueHandler(log_queue))
+    else:
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
 
     return logger
 
 
+def configure_logging(
+    level="INFO",
+    log_dir="logs",
+    colored=True,
+    async_mode=True,
+    max_length=DEFAULT_MAX_LENGTH,
+    json_format=False,
+):
+    """
+    按配置重新设置默认logger，对应配置文件中的 logging 部分
+
+    Args:
+        level (str): 日志级别名称，如 "INFO"、"DEBUG"
+        log_dir (str): 日志文件目录
+        colored (bool): 是否在控制台使用彩色输出
+        async_mode (bool): 是否在后台线程中写日志
+        max_length (int): 单条日志消息的最大长度，<= 0 表示不截断
+        json_format (bool): 文件日志是否输出为 JSON 行
+
+    Returns:
+        logging.Logger: 默认logger
+    """
+    return setup_logger(
+        logger.name,
+        log_level=logging.getLevelName(level.upper()) if isinstance(level, str) else level,
+        log_dir=log_dir,
+        colored=colored,
+        async_mode=async_mode,
+        max_length=max_length,
+        json_format=json_format,
+        force=True,
+    )
+
+
 # 创建默认logger
 logger = setup_logger()
 
@@ -0,0 +1,171 @@
+import hashlib
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def _to_array(values: Sequence[Any]) -> np.ndarray:
+    """
+    将一列值转换为一维数组
+
+    数值、布尔等类型保留紧凑的NumPy类型；字符串及混合类型使用object数组，
+    直接引用已有的Python对象，避免定长字符串数组的额外拷贝。
+    """
+    try:
+        array = np.asarray(values)
+    except (ValueError, TypeError):
+        array = None
+
+    if array is None or array.ndim != 1 or array.dtype.kind in "USV":
+        array = np.empty(len(values), dtype=object)
+        array[:] = list(values)
+    return array
+
+
+class QueryResult:
+    """
+    列式存储的SQL执行结果
+
+    每列保存为一个NumPy数组，列名只保存一次；需要时再惰性地转换为
+    字典列表或DataFrame。
+    """
+
+    __slots__ = ("columns", "arrays", "affected_rows", "truncated", "_key")
+
+    def __init__(
+        self,
+        columns: List[str],
+        arrays: List[np.ndarray],
+        affected_rows: int = None,
+        truncated: bool = False,
+    ):
+        """
+        args:
+            columns (List[str]): 列名
+            arrays (List[np.ndarray]): 与列名一一对应的列数据
+            affected_rows (int, optional): 不返回行的语句影响的行数
+            truncated (bool): 是否只读取了结果的前若干行
+        """
+        self.columns = columns
+        self.arrays = arrays
+        self.affected_rows = affected_rows
+        self.truncated = truncated
+        self._key = None
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[Sequence[Any]], truncated: bool = False) -> "QueryResult":
+        """
+        由按行返回的数据库结果构造列式结果
+
+        args:
+            columns (Sequence[str]): 列名
+            rows (Sequence[Sequence[Any]]): 行数据，如 `Result.fetchall()` 的返回值
+            truncated (bool): 是否只读取了结果的前若干行
+
+        return:
+            QueryResult: 列式结果
+        """
+        columns = list(columns)
+        if rows:
+            arrays = [_to_array(values) for values in zip(*rows)]
+        else:
+            arrays = [np.empty(0, dtype=object) for _ in columns]
+        return cls(columns, arrays, truncated=truncated)
+
+    @classmethod
+    def from_rowcount(cls, rowcount: int) -> "QueryResult":
+        """由不返回行的语句（如INSERT/UPDATE）的影响行数构造结果"""
+        return cls([], [], affected_rows=rowcount)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def slice(self, start: int, stop: int) -> "QueryResult":
+        """第 start 到 stop 行（不含）的结果，列数据为原数组的视图，不复制"""
+        return QueryResult(self.columns, [array[start:stop] for array in self.arrays])
+
+    def column(self, name: str) -> np.ndarray:
+        return self.arrays[self.columns.index(name)]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """转换为字典列表，每行一个字典"""
+        if self.affected_rows is not None:
+            return [{"affected_rows": self.affected_rows}]
+        lists = [array.tolist() for array in self.arrays]
+        return [dict(zip(self.columns, row)) for row in zip(*lists)]
+
+    def to_dataframe(self):
+        """转换为 pandas.DataFrame"""
+        import pandas as pd
+
+        if self.affected_rows is not None:
+            return pd.DataFrame({"affected_rows": [self.affected_rows]})
+        return pd.DataFrame(
+            {column: array for column, array in zip(self.columns, self.arrays)},
+            columns=self.columns,
+        )
+
+    def key(self) -> str:
+        """
+        结果的指纹，用于投票时比较不同SQL的执行结果是否相同
+
+        数值列直接对底层内存做哈希，不逐行创建Python对象。
+        """
+        if self._key is None:
+            digest = hashlib.sha1()
+            digest.update(repr(self.columns).encode())
+            digest.update(repr((self.affected_rows, self.truncated)).encode())
+            for array in self.arrays:
+                digest.update(array.dtype.str.encode())
+                if array.dtype.kind in "biufcmM":
+                    digest.update(np.ascontiguousarray(array).tobytes())
+                else:
+                    digest.update(repr(array.tolist()).encode())
+            self._key = digest.hexdigest()
+        return self._key
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, QueryResult):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def __repr__(self) -> str:
+        if self.affected_rows is not None:
+            return f"QueryResult(affected_rows={self.affected_rows})"
+        truncated = ", truncated" if self.truncated else ""
+        return f"QueryResult(columns={self.columns}, rows={self.num_rows}{truncated})"
+
+    def __str__(self) -> str:
+        return str(self.to_dicts())
+
+
+def serialize_denotation(denotation, max_rows: int) -> dict:
+    """
+    把执行结果转换为可写出的 JSON 结构，最多包含 max_rows 行
+
+    先截取前 max_rows 行再转换为字典，大结果不会整体转换为Python对象。
+
+    args:
+        denotation: `ExcelSQL.answer` 的执行结果（QueryResult 或错误信息）
+        max_rows (int): 最多包含的行数
+
+    return:
+        dict: {"columns", "rows", "num_rows", "affected_rows", "truncated"}；执行失败时为 {"error"}
+    """
+    if not isinstance(denotation, QueryResult):
+        return {"error": str(denotation)}
+    rows = denotation if denotation.affected_rows is not None else denotation.slice(0, max_rows)
+    return {
+        "columns": denotation.columns,
+        "rows": rows.to_dicts(),
+        "num_rows": denotation.num_rows,
+        "affected_rows": denotation.affected_rows,
+        "truncated": denotation.truncated or denotation.num_rows > max_rows,
+    }
@@ -1 +1,4 @@
-statistic_data = {"llm_call": 0}
+import threading
+
+statistic_data = {"llm_call": 0, "prompt_tokens": 0, "completion_tokens": 0}
+statistic_lock = threading.Lock()
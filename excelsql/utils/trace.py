@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import logging
+import contextvars
+from logging.handlers import RotatingFileHandler
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
+
+# 耗时直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+_current_span = contextvars.ContextVar("excelsql_current_span", default=None)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """一次计时的操作，结束时记录耗时、属性和状态"""
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict, parent: Optional["Span"]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.status = "ok"
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self._token = None
+
+    def set(self, **attributes):
+        """补充属性，如行数、token 数"""
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            self.tracer._finish(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.status = "error"
+            self.attributes.setdefault("error", str(exc)[:200])
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class Tracer:
+    """
+    轻量的链路追踪与指标
+
+    - span：嵌套计时，父子关系通过 contextvars 传递（线程池中的任务需用 `wrap` 包装）
+    - 计数器与直方图：线程安全，可导出为 Prometheus 文本格式
+    - 结束的 span 在内存中保留最近的一部分用于汇总；指定路径时另外追加写入按大小轮转的 JSONL 文件
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        path: str = None,
+        max_spans: int = 10000,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 3,
+    ):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._sink = None
+        self.configure(enabled=enabled, path=path, max_spans=max_spans, max_bytes=max_bytes, backup_count=backup_count)
+
+    def configure(
+        self,
+        enabled: bool = True,
+        path: str = None,
+        max_spans: int = 10000,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 3,
+    ):
+        """
+        args:
+            enabled (bool): 是否记录 span
+            path (str, optional): JSONL 追踪文件路径，None 表示只保留在内存中
+            max_spans (int): 内存中保留的最近 span 数量
+            max_bytes (int): 追踪文件超过该大小时轮转
+            backup_count (int): 保留的轮转文件数量
+        """
+        with self._lock:
+            self.enabled = enabled
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+            if enabled and path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._sink = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            self._spans = deque(maxlen=max_spans)
+
+    def span(self, name: str, **attributes):
+        """
+        创建 span，作为上下文管理器使用时成为当前 span
+
+        args:
+            name (str): span 名称，如 "llm.call"、"sql.execute"
+            **attributes: 属性
+        """
+        if not self.enabled:
+            return _NullSpan()
+        return Span(self, name, attributes, _current_span.get())
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span is not None else None
+
+    def wrap(self, fn: Callable) -> Callable:
+        """包装在线程池中执行的函数，使其中的 span 挂在调用方当前的 span 之下"""
+        context = contextvars.copy_context()
+
+        def wrapper(*args, **kwargs):
+            return context.copy().run(fn, *args, **kwargs)
+
+        return wrapper
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[(name, _labels_key(labels))] += value
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels):
+        with self._lock:
+            key = (name, _labels_key(labels))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def _finish(self, span: Span):
+        self.observe("excelsql_span_duration_seconds", span.duration, span=span.name)
+        if span.status != "ok":
+            self.incr("excelsql_span_errors_total", span=span.name)
+        record = span.to_dict()
+        with self._lock:
+            self._spans.append(record)
+            sink = self._sink
+        if sink is not None:
+            # 文件写入与轮转由 handler 自己的锁保护，不阻塞计数器和其他 span 的记录
+            sink.handle(logging.makeLogRecord({"msg": json.dumps(record, ensure_ascii=False, default=str)}))
+
+    def spans(self, trace_id: str = None) -> List[dict]:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s["trace_id"] == trace_id]
+        return spans
+
+    def summary(self, trace_id: str = None) -> Dict:
+        """
+        一次性的汇总：按 span 名称统计次数与耗时，并附带计数器
+
+        args:
+            trace_id (str, optional): 只汇总某一次调用（如一次提问）的 span
+
+        return:
+            dict: {"spans": {名称: {count, total_ms, max_ms, errors}}, "counters": {...}, "wall_ms": ...}
+        """
+        spans = self.spans(trace_id)
+        by_name = {}
+        for span in spans:
+            entry = by_name.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            duration_ms = span["duration"] * 1000
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["errors"] += span["status"] != "ok"
+
+        roots = [s for s in spans if s["parent_id"] is None]
+        prompt_tokens = sum(s["attributes"].get("prompt_tokens", 0) for s in spans if s["name"] == "llm.call")
+        completion_tokens = sum(s["attributes"].get("completion_tokens", 0) for s in spans if s["name"] == "llm.call")
+        with self._lock:
+            counters = {
+                name + _format_labels(labels): value for (name, labels), value in sorted(self._counters.items())
+            }
+        return {
+            "wall_ms": sum(s["duration"] for s in roots) * 1000,
+            "spans": dict(sorted(by_name.items(), key=lambda item: -item[1]["total_ms"])),
+            "llm_tokens": {"prompt": prompt_tokens, "completion": completion_tokens},
+            "counters": counters,
+        }
+
+    def prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{_format_labels(labels, {'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer(enabled=True)
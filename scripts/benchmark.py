@@ -0,0 +1,216 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+import time
+import threading
+import resource
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+import hydra
+from hydra.utils import to_absolute_path
+from omegaconf import DictConfig, OmegaConf
+
+from excelsql.utils.log import logger
+from excelsql.excelsql import ExcelSQL
+from stub_llm_server import start_stub_server, stub_settings
+
+STAGES = ("upload_excel", "normalize_query", "generate_sqls_and_check", "poll_sqls")
+
+QUESTIONS = [
+    "一共有多少条记录？",
+    "每个部门的平均金额是多少？",
+    "金额最高的前10条记录是哪些？",
+    "2023年北京的订单数量是多少？",
+    "哪个城市的总金额最多？",
+]
+
+
+def _current_rss() -> int:
+    """当前进程的常驻内存（字节）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # 非 Linux 平台退回到进程生命周期内的峰值（Linux 为 KB，macOS 为字节）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSMonitor:
+    """在后台线程中定时采样常驻内存，记录每个阶段的峰值"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peaks = defaultdict(int)
+        self._stage = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._stage is not None:
+                self.peaks[self._stage] = max(self.peaks[self._stage], _current_rss())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def enter(self, stage: str):
+        """切换到新的阶段；stage 为 None 时暂停记录"""
+        self._stage = stage
+        if stage is not None:
+            self.peaks[stage] = max(self.peaks[stage], _current_rss())
+
+
+def generate_workbook(path: str, rows: int, columns: int, seed: int = 0):
+    """生成包含整数、小数、类别、日期和文本列的测试工作簿"""
+    rng = np.random.RandomState(seed)
+    data = {
+        "编号": np.arange(1, rows + 1),
+        "部门": rng.choice(["销售部", "市场部", "研发部", "财务部", "人事部"], rows),
+        "城市": rng.choice(["北京", "上海", "广州", "深圳", "杭州", "成都"], rows),
+        "金额": np.round(rng.gamma(2.0, 500.0, rows), 2),
+        "日期": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.randint(0, 730, rows), unit="D"),
+        "备注": [f"记录{i}" for i in rng.randint(0, max(rows // 10, 1), rows)],
+    }
+    for i in range(len(data), columns):
+        data[f"指标{i}"] = rng.randint(0, 1000, rows)
+    pd.DataFrame(data).iloc[:, :columns].to_excel(path, index=False)
+
+
+def summarize(latencies: list, wall: float, peak_rss: int) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "throughput_per_s": len(latencies) / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss / 1024 / 1024,
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_queries(app, table_name: str, questions: list, concurrency: int, monitor: RSSMonitor) -> dict:
+    """依次测量标准化、生成与验证、投票三个阶段；同一阶段内的问题并发执行"""
+    document = app.read_document(table_name)
+    results = {}
+
+    def measure(stage, fn, inputs):
+        monitor.enter(stage)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outputs = list(executor.map(lambda x: _timed(fn, x), inputs))
+        wall = time.perf_counter() - start
+        results[stage] = (
+            [latency for _, latency in outputs],
+            wall,
+        )
+        return [output for output, _ in outputs]
+
+    normalized = measure("normalize_query", app.normalize_query, questions)
+    candidates = measure(
+        "generate_sqls_and_check",
+        lambda query: app.generate_sqls_and_check(query, concurrent=app.concurrent, document=document),
+        normalized,
+    )
+    measure("poll_sqls", app.poll_sqls, candidates)
+    return results
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="benchmark",
+)
+def benchmark(cfg: DictConfig):
+    """
+    使用本地模拟模型服务离线测量流水线各阶段的延迟、吞吐量和内存峰值
+
+    所有输出（数据库、表格目录、文档等）写入独立的工作目录，不影响正式数据。
+    """
+    bench_cfg = cfg.benchmark
+    work_dir = to_absolute_path(os.path.join(bench_cfg.output_dir, time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(work_dir, exist_ok=True)
+    # 配置中的输入文件在切换工作目录之前解析为绝对路径
+    settings = stub_settings(cfg.stub_llm)
+    os.chdir(work_dir)
+
+    server, llm, base_url = start_stub_server(**settings)
+    os.environ["BASE_URL"] = base_url
+    os.environ["API_KEY"] = "stub"
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+
+    # 所有客户端在构造时读取环境变量，此时已指向模拟服务
+
+    app = ExcelSQL(cfg)
+    monitor = RSSMonitor().start()
+    report = {"config": OmegaConf.to_container(cfg, resolve=True), "workbooks": []}
+
+    for rows in bench_cfg.rows:
+        table_name = f"bench_{rows}"
+        file_path = os.path.join(work_dir, f"{table_name}.xlsx")
+        generate_workbook(file_path, rows, bench_cfg.columns, bench_cfg.seed)
+        logger.info(f"已生成测试工作簿 {file_path}（{rows} 行 × {bench_cfg.columns} 列）")
+
+        monitor.enter("upload_excel")
+        success, upload_latency = _timed(app.upload_excel, file_path)
+        if not success:
+            logger.error(f"工作簿 {file_path} 导入失败，跳过")
+            continue
+
+        questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(bench_cfg.queries)]
+        calls_before = llm.stats["calls"]
+        query_results = run_queries(app, table_name, questions, bench_cfg.concurrency, monitor)
+        monitor.enter(None)
+
+        stages = {"upload_excel": summarize([upload_latency], upload_latency, monitor.peaks["upload_excel"])}
+        for stage, (latencies, wall) in query_results.items():
+            stages[stage] = summarize(latencies, wall, monitor.peaks[stage])
+        monitor.peaks.clear()
+
+        report["workbooks"].append(
+            {
+                "rows": rows,
+                "columns": bench_cfg.columns,
+                "llm_calls": llm.stats["calls"] - calls_before,
+                "stages": stages,
+            }
+        )
+        for stage in STAGES:
+            s = stages[stage]
+            logger.info(
+                f"[{rows} 行] {stage}: p50={s['p50_ms']:.1f}ms p95={s['p95_ms']:.1f}ms "
+                f"p99={s['p99_ms']:.1f}ms 吞吐={s['throughput_per_s']:.2f}/s 内存峰值={s['peak_rss_mb']:.1f}MB"
+            )
+
+    monitor.stop()
+    server.shutdown()
+    report["llm"] = dict(llm.stats)
+
+    report_path = os.path.join(work_dir, "report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"基准测试报告已保存至 {report_path}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    benchmark()
@@ -0,0 +1,265 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import csv
+import json
+import time
+import itertools
+
+from dotenv import load_dotenv
+import hydra
+from hydra.utils import to_absolute_path
+from omegaconf import DictConfig, OmegaConf
+
+from excelsql.utils.log import logger
+from excelsql.utils.result import QueryResult
+from excelsql.utils.llm_cache import ResponseCache, CachedChatClient
+from excelsql.excelsql import ExcelSQL, _extract_table_name
+from benchmark import generate_workbook
+from stub_llm_server import start_stub_server, stub_settings
+
+# 合成用例：问题与标准SQL，{table} 为表名
+SYNTHETIC_CASES = [
+    ("一共有多少条记录？", 'SELECT COUNT(*) FROM "{table}"'),
+    ("销售部有多少条记录？", 'SELECT COUNT(*) FROM "{table}" WHERE "部门" = \'销售部\''),
+    ("每个部门的平均金额是多少？", 'SELECT "部门", AVG("金额") FROM "{table}" GROUP BY "部门"'),
+    ("哪个城市的总金额最多？", 'SELECT "城市" FROM "{table}" GROUP BY "城市" ORDER BY SUM("金额") DESC LIMIT 1'),
+    ("北京的最大金额是多少？", 'SELECT MAX("金额") FROM "{table}" WHERE "城市" = \'北京\''),
+    ("2023年有多少条记录？", 'SELECT COUNT(*) FROM "{table}" WHERE "日期" >= \'2023-01-01\' AND "日期" < \'2024-01-01\''),
+    ("每个城市有多少条记录？", 'SELECT "城市", COUNT(*) FROM "{table}" GROUP BY "城市"'),
+    ("金额大于2000的记录有多少条？", 'SELECT COUNT(*) FROM "{table}" WHERE "金额" > 2000'),
+]
+
+
+def _normalize_value(value):
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def _normalize_rows(rows) -> list:
+    """忽略列名和行顺序比较结果"""
+    return sorted((tuple(_normalize_value(v) for v in row) for row in rows), key=repr)
+
+
+def _result_rows(result: QueryResult) -> list:
+    if result.affected_rows is not None:
+        return [(result.affected_rows,)]
+    return list(zip(*(array.tolist() for array in result.arrays)))
+
+
+def load_cases(eval_cfg: DictConfig, work_dir: str) -> list:
+    """读取评测用例；未指定用例文件时生成合成工作簿和用例"""
+    if eval_cfg.cases:
+        cases = []
+        with open(to_absolute_path(eval_cfg.cases), "r") as f:
+            for line in f:
+                if line.strip():
+                    case = json.loads(line)
+                    case["workbook"] = to_absolute_path(case["workbook"])
+                    case.setdefault("table_name", _extract_table_name(case["workbook"]))
+                    cases.append(case)
+        return cases
+
+    workbook = os.path.join(work_dir, "synthetic.xlsx")
+    generate_workbook(workbook, eval_cfg.synthetic_rows, 8)
+    table_name = _extract_table_name(workbook)
+    return [
+        {
+            "workbook": workbook,
+            "table_name": table_name,
+            "question": question,
+            "gold_sql": gold_sql.format(table=table_name),
+        }
+        for question, gold_sql in SYNTHETIC_CASES
+    ]
+
+
+def sweep_settings(sweep) -> list:
+    """参数网格的所有组合，每项为 {配置键: 取值}"""
+    keys = [item["key"] for item in sweep]
+    values = [list(item["values"]) for item in sweep]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def _wrap_clients(app: ExcelSQL, client: CachedChatClient):
+    components = [app.query_normalizer, app.document_generator, app.ddl_generator, *app.sql_generators]
+    for component in components:
+        component.client = client
+
+
+def evaluate_setting(cfg: DictConfig, overrides: dict, cases: list, cache: ResponseCache, work_dir: str) -> dict:
+    """在独立的工作目录中用一组配置导入工作簿并回答所有用例"""
+    setting_cfg = OmegaConf.create(OmegaConf.to_container(cfg, resolve=True))
+    for key, value in overrides.items():
+        OmegaConf.update(setting_cfg, key, value, merge=False)
+
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(work_dir, 'evaluate.db')}"
+
+    app = ExcelSQL(setting_cfg)
+    client = CachedChatClient(app.query_normalizer.client, cache)
+    _wrap_clients(app, client)
+    cache.reset_occurrences()
+
+    for workbook, table_name in sorted({(c["workbook"], c["table_name"]) for c in cases}):
+        if not app.upload_excel(workbook, table_name=table_name):
+            logger.error(f"工作簿 {workbook} 导入失败")
+    upload_stats = dict(client.stats)
+    client.reset_stats()
+
+    results = []
+    start = time.perf_counter()
+    for case in cases:
+        case_start = time.perf_counter()
+        answer = app.answer(case["question"], table_name=case["table_name"])
+        elapsed = time.perf_counter() - case_start
+
+        if "gold_result" in case:
+            gold_rows = _normalize_rows(case["gold_result"])
+        else:
+            gold_flag, gold = app._check_sql(case["gold_sql"])
+            if not gold_flag:
+                logger.error(f"标准SQL执行失败，跳过用例：{case['gold_sql']}：{gold}")
+                continue
+            gold_rows = _normalize_rows(_result_rows(gold))
+
+        correct = bool(answer["flag"]) and _normalize_rows(_result_rows(answer["denotation"])) == gold_rows
+        results.append({"question": case["question"], "sql": answer["sql"], "correct": correct, "wall_time": elapsed})
+    wall_time = time.perf_counter() - start
+
+    count = len(results) or 1
+    return {
+        "overrides": overrides,
+        "accuracy": sum(r["correct"] for r in results) / count,
+        "llm_calls": client.stats["calls"] / count,
+        "prompt_tokens": client.stats["prompt_tokens"] / count,
+        "completion_tokens": client.stats["completion_tokens"] / count,
+        "cache_hits": client.stats["cache_hits"],
+        "wall_time": wall_time / count,
+        "upload": upload_stats,
+        "cases": results,
+    }
+
+
+def pareto_front(settings: list, cost_metric: str) -> list:
+    """开销更低或相同且准确率更高或相同（至少一项严格更优）的配置支配其他配置"""
+    front = []
+    for a in settings:
+        dominated = any(
+            b[cost_metric] <= a[cost_metric]
+            and b["accuracy"] >= a["accuracy"]
+            and (b[cost_metric] < a[cost_metric] or b["accuracy"] > a["accuracy"])
+            for b in settings
+        )
+        if not dominated:
+            front.append(a)
+    return sorted(front, key=lambda s: s[cost_metric])
+
+
+def _plot(settings: list, front: list, cost_metric: str, path: str) -> bool:
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter([s[cost_metric] for s in settings], [s["accuracy"] for s in settings], color="gray", label="settings")
+    ax.plot([s[cost_metric] for s in front], [s["accuracy"] for s in front], "o-", color="red", label="pareto")
+    ax.set_xlabel(cost_metric)
+    ax.set_ylabel("execution accuracy")
+    ax.legend()
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    return True
+
+
+def _label(overrides: dict) -> str:
+    return ", ".join(f"{key}={value}" for key, value in overrides.items())
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="evaluate",
+)
+def evaluate(cfg: DictConfig):
+    """
+    在参数网格上评测执行准确率与开销，输出帕累托前沿
+
+    模型响应写入缓存，重复评测或扩大网格时已录制的响应直接回放，不重复调用模型。
+    """
+    eval_cfg = cfg.evaluate
+    # 各配置在独立的工作目录中运行，配置中的路径先按启动时的工作目录解析为绝对路径
+    cache_path = to_absolute_path(eval_cfg.cache_path)
+    if eval_cfg.use_stub:
+        # 模拟模型的响应单独缓存，避免混入真实模型的录制
+        cache_path = os.path.splitext(cache_path)[0] + ".stub.jsonl"
+    cache = ResponseCache(cache_path)
+    output_dir = to_absolute_path(os.path.join(eval_cfg.output_dir, time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(output_dir, exist_ok=True)
+
+    server = None
+    if eval_cfg.use_stub:
+        server, _, base_url = start_stub_server(**stub_settings(cfg.stub_llm))
+        os.environ["BASE_URL"] = base_url
+        os.environ["API_KEY"] = "stub"
+
+    cases = load_cases(eval_cfg, output_dir)
+    logger.info(f"评测用例 {len(cases)} 条")
+
+    settings = []
+    for idx, overrides in enumerate(sweep_settings(eval_cfg.sweep)):
+        logger.info(f"评测配置 {idx + 1}：{_label(overrides)}")
+        result = evaluate_setting(cfg, overrides, cases, cache, os.path.join(output_dir, f"setting_{idx}"))
+        logger.info(
+            f"准确率 {result['accuracy']:.2%}，每题 {result['llm_calls']:.1f} 次调用、"
+            f"{result['prompt_tokens']:.0f} 个提示词 token、{result['wall_time']:.2f} 秒（缓存命中 {result['cache_hits']} 次）"
+        )
+        settings.append(result)
+    os.chdir(output_dir)
+
+    cost_metric = eval_cfg.cost_metric
+    front = pareto_front(settings, cost_metric)
+    eligible = [s for s in front if s["accuracy"] >= eval_cfg.target_accuracy]
+    recommended = eligible[0] if eligible else None
+
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump(
+            {"settings": settings, "pareto": [s["overrides"] for s in front],
+             "recommended": recommended["overrides"] if recommended else None},
+            f, ensure_ascii=False, indent=2,
+        )
+    with open(os.path.join(output_dir, "settings.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["setting", "accuracy", "llm_calls", "prompt_tokens", "completion_tokens", "wall_time", "pareto"])
+        for s in settings:
+            writer.writerow([_label(s["overrides"]), s["accuracy"], s["llm_calls"], s["prompt_tokens"],
+                             s["completion_tokens"], s["wall_time"], s in front])
+    if _plot(settings, front, cost_metric, os.path.join(output_dir, "pareto.png")):
+        logger.info("帕累托曲线已保存至 pareto.png")
+
+    logger.info(f"帕累托前沿（按 {cost_metric} 升序）：")
+    for s in front:
+        logger.info(f"  {_label(s['overrides'])}：准确率 {s['accuracy']:.2%}，{cost_metric}={s[cost_metric]:.2f}")
+    if recommended:
+        logger.info(f"满足准确率 {eval_cfg.target_accuracy:.0%} 的最低开销配置：{_label(recommended['overrides'])}")
+    else:
+        logger.warning(f"没有配置达到准确率 {eval_cfg.target_accuracy:.0%}")
+    logger.info(f"评测报告已保存至 {output_dir}")
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    evaluate()
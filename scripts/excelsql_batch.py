@@ -0,0 +1,233 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from dotenv import load_dotenv
+import hydra
+from omegaconf import DictConfig
+
+from excelsql.utils.log import logger
+from excelsql.utils.trace import tracer
+from excelsql.utils.result import serialize_denotation
+from excelsql.excelsql import ExcelSQL
+
+
+def load_questions(path: str) -> list:
+    """
+    读取问题文件
+
+    args:
+        path (str): JSONL 文件（每行 {"id", "question", "table_name"}，id 和 table_name 可省略），
+            或每行一个问题的文本文件
+
+    return:
+        list: [{"id", "question", "table_name"}, ...]，未指定 id 时使用行号
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+            else:
+                item = {"question": line}
+            questions.append(
+                {
+                    "id": str(item.get("id", line_no)),
+                    "question": item["question"],
+                    "table_name": item.get("table_name"),
+                }
+            )
+    return questions
+
+
+def load_checkpoint(path: str, retry_failed: bool = False) -> set:
+    """
+    从已有的输出文件中读取已完成的问题 id
+
+    args:
+        path (str): 输出的 JSONL 文件
+        retry_failed (bool): 为 True 时，未得到可执行SQL的问题不算完成
+
+    return:
+        set: 已完成的问题 id；同一 id 出现多次时以最后一条为准
+    """
+    status = {}
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能留下不完整的最后一行
+                continue
+            status[record["id"]] = record["status"]
+    done = {"ok"} if retry_failed else {"ok", "failed"}
+    return {question_id for question_id, s in status.items() if s in done}
+
+
+def table_error(table_name: str, tables: list, schema_graph: bool) -> str:
+    """
+    检查问题的表名
+
+    args:
+        table_name (str): 问题指定的表名（已应用默认表名）
+        tables (list): 已导入的表
+        schema_graph (bool): 是否启用跨表提问，启用时未指定表名的问题自动选择表
+
+    return:
+        str: 错误信息；表名可用时返回 None
+    """
+    if table_name is None:
+        return None if schema_graph else "未指定表名，且存在多张表、未启用 schema_graph"
+    if table_name not in tables:
+        return f"表格 {table_name} 不存在"
+    return None
+
+
+def answer_question(app: ExcelSQL, item: dict, max_rows: int) -> dict:
+    """回答一个问题并转换为可写出的记录；异常也记录为结果，不中断整个批次"""
+    start = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"], "table_name": item["table_name"]}
+    try:
+        answer = app.answer(item["question"], table_name=item["table_name"])
+    except Exception as e:
+        logger.error(f"问题 {item['id']} 处理失败: {e}")
+        record.update({"status": "error", "error": str(e)})
+    else:
+        record.update(
+            {
+                "status": "ok" if answer["flag"] else "failed",
+                "normalized_query": answer["normalized_query"],
+                "sql": answer["sql"],
+                "result": serialize_denotation(answer["denotation"], max_rows),
+                "attempts": answer["attempts"],
+                "errors": answer["errors"],
+                "trace_id": answer["trace_id"],
+            }
+        )
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def run_batch(app: ExcelSQL, questions: list, output, concurrency: int, max_rows: int) -> dict:
+    """
+    多个问题同时在流水线中处理，完成一个写出一个
+
+    每个问题内部的标准化、生成、执行和投票仍按顺序进行，不同问题的各阶段相互重叠：
+    一个问题等待模型时，其他问题可以执行SQL或投票。模型调用总数受全局并发上限约束，
+    已提交但未完成的问题最多为 2 倍的并发数，避免一次性提交全部问题。
+
+    args:
+        app (ExcelSQL): 共享的 ExcelSQL 实例
+        questions (list): 待处理的问题
+        output: 以追加模式打开的输出文件
+        concurrency (int): 同时处理的问题数量
+        max_rows (int): 每个结果最多写出的行数
+
+    return:
+        dict: 各状态的问题数量
+    """
+    counts = {"ok": 0, "failed": 0, "error": 0}
+    pending = set()
+    remaining = iter(questions)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        try:
+            while True:
+                for item in remaining:
+                    pending.add(executor.submit(tracer.wrap(answer_question), app, item, max_rows))
+                    if len(pending) >= concurrency * 2:
+                        break
+                if not pending:
+                    break
+
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    counts[record["status"]] += 1
+                    # 每条结果立即落盘，中断后可从检查点续跑
+                    output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    output.flush()
+
+                done = sum(counts.values())
+                if done % 10 == 0 or not pending:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"已完成 {done}/{len(questions)} 个问题，{done / elapsed:.2f} 个/秒")
+        except KeyboardInterrupt:
+            logger.warning("批处理被中断，已完成的结果已写入输出文件，可续跑")
+            for future in pending:
+                future.cancel()
+            raise
+
+    return counts
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="batch",
+)
+def batch(cfg: DictConfig):
+    """批量回答问题文件中的问题，结果按完成顺序写入 JSONL"""
+    batch_cfg = cfg.batch
+    app = ExcelSQL(cfg)
+
+    tables = app.list_tables()
+    schema_graph = cfg.get("schema_graph", {}).get("enabled", False)
+    default_table = batch_cfg.table_name
+    if default_table is None and len(tables) == 1:
+        default_table = tables[0]
+
+    questions = load_questions(batch_cfg.input)
+    for item in questions:
+        item["table_name"] = item["table_name"] or default_table
+
+    os.makedirs(os.path.dirname(batch_cfg.output) or ".", exist_ok=True)
+    if batch_cfg.resume:
+        completed = load_checkpoint(batch_cfg.output, batch_cfg.retry_failed)
+        skipped = sum(item["id"] in completed for item in questions)
+        questions = [item for item in questions if item["id"] not in completed]
+        if skipped:
+            logger.info(f"从检查点续跑，跳过已完成的 {skipped} 个问题")
+        mode = "a"
+    else:
+        mode = "w"
+
+    # 表名无效或无法确定的问题直接写出错误记录，不调用模型
+    valid, invalid = [], []
+    for item in questions:
+        error = table_error(item["table_name"], tables, schema_graph)
+        (invalid if error else valid).append((item, error))
+    if invalid:
+        logger.warning(f"{len(invalid)} 个问题的表名无效或未指定，已记录为错误")
+
+    logger.info(f"共 {len(valid)} 个问题，并发数 {batch_cfg.concurrency}")
+    start = time.perf_counter()
+    with open(batch_cfg.output, mode, encoding="utf-8") as output:
+        for item, error in invalid:
+            record = {**item, "status": "error", "error": error, "elapsed": 0.0}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        counts = run_batch(app, [item for item, _ in valid], output, batch_cfg.concurrency, batch_cfg.max_rows)
+    counts["error"] += len(invalid)
+    wall = time.perf_counter() - start
+
+    logger.info(
+        f"批处理完成：成功 {counts['ok']}，未得到可执行SQL {counts['failed']}，异常 {counts['error']}，"
+        f"耗时 {wall:.1f} 秒（{sum(counts.values()) / wall if wall > 0 else 0:.2f} 个/秒）"
+    )
+    logger.info(f"结果已写入 {batch_cfg.output}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    batch()
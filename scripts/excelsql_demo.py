@@ -7,8 +7,7 @@ import hydra
 from omegaconf import DictConfig
 
 from excelsql.utils.log import logger
-from excelsql.excelsql import ExcelSQL
-from excelsql.utils.sort import Sort
+from excelsql.excelsql import ExcelSQL, _extract_table_name
 
 @hydra.main(
     version_base="1.3",
@@ -23,17 +22,12 @@ def demo(cfg: DictConfig):
     query = "一共有多少学历为硕士的用户？"
     logger.info(f"用户输入：{query}")
 
-    normalized_query = app.normalize_query(query)
-    logger.info(f"标准化后的查询：{normalized_query}")
-
-    results = app.generate_sqls_and_check(
-        query=normalized_query,
-        concurrent=cfg.concurrent,
-    )
-    logger.info(f"SQL生成结果：{results}")
-
-    sql = app.poll_sqls(results)
-    logger.info(f"最终的SQL：{sql}")
+    table_name = _extract_table_name(cfg.excel_path)
+    answer = app.answer(query, table_name=table_name)
+    # 候选结果只记录SQL和是否执行成功，完整的结果集只记录最终答案
+    logger.info("SQL生成结果：%s", [(c["sql"], c["flag"]) for c in answer["candidates"]])
+    logger.info("最终的SQL：%s", answer["sql"])
+    logger.info("查询结果：%s", answer["denotation"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,31 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+import hydra
+from omegaconf import DictConfig
+import uvicorn
+
+from excelsql.utils.log import logger
+from excelsql.excelsql import ExcelSQL
+from excelsql.server import create_app
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="main",
+)
+def serve(cfg: DictConfig):
+    server_cfg = dict(cfg.get("server", {}))
+    host = server_cfg.pop("host", "127.0.0.1")
+    port = server_cfg.pop("port", 8000)
+
+    app = create_app(ExcelSQL(cfg), **server_cfg)
+    logger.info(f"ExcelSQL 服务启动于 http://{host}:{port}")
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    serve()
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+import hydra
+from omegaconf import DictConfig
+
+from excelsql.utils.log import logger
+from excelsql.excelsql import ExcelSQL, _extract_table_name
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="main",
+)
+def report(cfg: DictConfig):
+    """回放已记录的工作负载，创建推荐的索引并输出创建前后的延迟对比"""
+    app = ExcelSQL(cfg)
+    table_name = cfg.get("table_name") or _extract_table_name(cfg.excel_path)
+
+    for recommendation in app.index_advisor.recommend(table_name):
+        logger.info(f"推荐索引：{recommendation}")
+
+    result = app.index_advisor.report(table_name)
+    if not result:
+        logger.warning(f"表格 {table_name} 没有统计信息，请先上传表格")
+        return
+
+    logger.info(f"新创建的索引：{result['indexes']}")
+    for query in result["queries"]:
+        logger.info(f"{query['before_ms']} ms -> {query['after_ms']} ms : {query['sql']}")
+    logger.info(
+        f"工作负载总延迟：{result['total_before_ms']:.2f} ms -> {result['total_after_ms']:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    report()
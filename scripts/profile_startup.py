@@ -0,0 +1,155 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import statistics
+import subprocess
+
+from dotenv import load_dotenv
+import hydra
+from omegaconf import DictConfig, OmegaConf
+
+from excelsql.utils.log import logger
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在新进程中导入 ExcelSQL 并创建实例，输出各阶段耗时和已导入的重量级模块
+_INIT_SNIPPET = """
+import sys, json, time
+start = time.perf_counter()
+from omegaconf import OmegaConf
+from excelsql.excelsql import ExcelSQL
+imported = time.perf_counter()
+app = ExcelSQL(OmegaConf.load({config!r}))
+ready = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "init_ms": (ready - imported) * 1000,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def _run_python(args: list, cwd: str, env: dict = None) -> subprocess.CompletedProcess:
+    environ = dict(os.environ, PYTHONPATH=PROJECT_ROOT, **(env or {}))
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=environ, capture_output=True, text=True, check=True
+    )
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    解析 `python -X importtime` 的输出
+
+    args:
+        stderr (str): 子进程的标准错误输出
+
+    return:
+        list: [{"module", "self_ms", "cumulative_ms", "depth"}, ...]，按导入完成的顺序
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append(
+            {
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            }
+        )
+    return entries
+
+
+def profile_import(module: str, work_dir: str, top: int) -> dict:
+    """在新进程中导入模块，返回总耗时和累计耗时最高的依赖"""
+    result = _run_python(["-X", "importtime", "-c", f"import {module}"], cwd=work_dir)
+    entries = parse_importtime(result.stderr)
+    # 导入 a.b 时会先导入包 a，两者都是顶层条目
+    parts = module.split(".")
+    targets = {".".join(parts[: i + 1]) for i in range(len(parts))}
+    total = sum(e["cumulative_ms"] for e in entries if e["depth"] == 0 and e["module"] in targets)
+    dependencies = [e for e in entries if e["module"] not in targets]
+    dependencies.sort(key=lambda e: -e["cumulative_ms"])
+    return {"total_ms": total, "top": dependencies[:top]}
+
+
+def profile_init(cfg: DictConfig, work_dir: str, heavy_modules: list) -> dict:
+    """在新进程中导入 ExcelSQL 并按配置创建实例"""
+    config_path = os.path.join(work_dir, "config.yaml")
+    OmegaConf.save(cfg, config_path)
+    snippet = _INIT_SNIPPET.format(config=config_path, heavy=list(heavy_modules))
+    result = _run_python(
+        ["-c", snippet], cwd=work_dir, env={"DB_URL": f"sqlite:///{os.path.join(work_dir, 'startup.db')}"}
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _median(runs: list, key: str) -> float:
+    return statistics.median(run[key] for run in runs)
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="startup",
+)
+def profile_startup(cfg: DictConfig):
+    """
+    测量冷启动耗时：各模块的导入耗时（python -X importtime）以及创建 ExcelSQL 实例的耗时
+
+    每项测量都在新的 Python 进程中进行，不受本进程已导入模块的影响。
+    """
+    startup_cfg = cfg.startup
+    work_dir = os.path.abspath(os.path.join(startup_cfg.output_dir, time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(work_dir, exist_ok=True)
+    report = {"imports": {}, "init": {}}
+
+    for module in startup_cfg.modules:
+        try:
+            runs = [profile_import(module, work_dir, startup_cfg.top) for _ in range(startup_cfg.repeat)]
+        except subprocess.CalledProcessError as e:
+            logger.error(f"导入 {module} 失败：{e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        report["imports"][module] = {"total_ms": _median(runs, "total_ms"), "top": runs[-1]["top"]}
+        logger.info(f"导入 {module}：{report['imports'][module]['total_ms']:.1f}ms")
+        for entry in runs[-1]["top"]:
+            logger.info(f"    {entry['module']}: 累计 {entry['cumulative_ms']:.1f}ms，自身 {entry['self_ms']:.1f}ms")
+
+    for lazy_init in (True, False):
+        mode = "lazy" if lazy_init else "eager"
+        mode_cfg = OmegaConf.merge(cfg, {"lazy_init": lazy_init})
+        try:
+            runs = [profile_init(mode_cfg, work_dir, startup_cfg.heavy_modules) for _ in range(startup_cfg.repeat)]
+        except subprocess.CalledProcessError as e:
+            logger.error(f"创建 ExcelSQL 实例失败（{mode}）：{e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        report["init"][mode] = {
+            "import_ms": _median(runs, "import_ms"),
+            "init_ms": _median(runs, "init_ms"),
+            "loaded": runs[-1]["loaded"],
+        }
+        logger.info(
+            f"[{mode}] 导入 {report['init'][mode]['import_ms']:.1f}ms，创建实例 {report['init'][mode]['init_ms']:.1f}ms，"
+            f"已导入的重量级模块：{report['init'][mode]['loaded'] or '无'}"
+        )
+
+    with open(os.path.join(work_dir, "report.json"), "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"启动耗时报告已保存至 {work_dir}")
+
+    lazy = report["init"].get("lazy")
+    if startup_cfg.budget_ms is not None and lazy is not None:
+        total = lazy["import_ms"] + lazy["init_ms"]
+        if total > startup_cfg.budget_ms or lazy["loaded"]:
+            logger.error(f"冷启动耗时 {total:.1f}ms 超出预算 {startup_cfg.budget_ms}ms，或导入了重量级模块 {lazy['loaded']}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    profile_startup()
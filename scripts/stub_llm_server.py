@@ -0,0 +1,275 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+import hydra
+from hydra.utils import to_absolute_path
+from omegaconf import DictConfig
+
+from excelsql.utils.log import logger
+from excelsql.column_profile import estimate_tokens
+
+_TABLE_ROW_RE = re.compile(r"^\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.*?)\s*\|$", re.MULTILINE)
+_DOC_FIELD_RE = re.compile(r"^\d+\.\s*(.+?)\s*\n\s*-\s*字段名语言：.*?\n\s*-\s*数据类型：\s*(.+?)\s*$", re.MULTILINE)
+
+
+def messages_key(model: str, messages: list) -> str:
+    """请求的指纹，用于匹配录制的响应"""
+    payload = json.dumps({"model": model, "messages": messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _sql_type(dtype: str) -> str:
+    dtype = dtype.lower()
+    if "int" in dtype or "bool" in dtype:
+        return "INTEGER"
+    if "float" in dtype or "double" in dtype or "decimal" in dtype:
+        return "REAL"
+    if "datetime" in dtype or "timestamp" in dtype:
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _columns_from_table(text: str) -> list:
+    rows = []
+    for name, dtype, values in _TABLE_ROW_RE.findall(text):
+        if name in ("列名", "---"):
+            continue
+        rows.append((name, dtype, values))
+    return rows
+
+
+def _field_docs(rows: list, start: int = 1) -> str:
+    return "\n\n".join(
+        f"{idx}. {name}\n"
+        f"    - 字段名语言：中文\n"
+        f"    - 数据类型：{dtype}\n"
+        f"    - 取值范围/取值示例：{values}\n"
+        f"    - 字段描述：{name}"
+        for idx, (name, dtype, values) in enumerate(rows, start)
+    )
+
+
+def default_response(system_prompt: str, user_prompt: str) -> str:
+    """
+    根据提示词的类型生成可执行的确定性响应，使整条流水线无需真实模型即可跑通
+
+    args:
+        system_prompt (str): 系统提示词
+        user_prompt (str): 用户提示词
+
+    return:
+        str: 模拟的模型输出
+    """
+    table = re.search(r"表名：\s*(\S+)", user_prompt)
+    table_name = table.group(1) if table else "t"
+
+    if user_prompt.startswith("Rewrite the following sentence into a standard statement:"):
+        return user_prompt.split(":", 1)[1].strip()
+    if "为这些列撰写字段说明" in system_prompt:
+        start = re.search(r"起始序号：\s*(\d+)", user_prompt)
+        return _field_docs(_columns_from_table(user_prompt), int(start.group(1)) if start else 1)
+    if "描述该表格的用途" in system_prompt:
+        return f"{table_name} 表的数据。"
+    if "撰写一份详细的数据库表格文档" in system_prompt:
+        return (
+            f"表格文档：{table_name}\n\n表格描述：\n{table_name} 表的数据。\n\n"
+            f"字段详细信息：\n{_field_docs(_columns_from_table(user_prompt))}"
+        )
+    if "DDL" in system_prompt:
+        fields = _DOC_FIELD_RE.findall(user_prompt)
+        columns = ",\n    ".join(f'"{name}" {_sql_type(dtype)}' for name, dtype in fields)
+        return f'CREATE TABLE "{table_name}" (\n    {columns}\n);'
+    if "SQL 生成专家" in system_prompt:
+        document_table = re.search(r"表格文档：\s*(\S+)", user_prompt)
+        return f'SELECT COUNT(*) FROM "{document_table.group(1) if document_table else table_name}"'
+    return "OK"
+
+
+class StubLLM:
+    """
+    OpenAI 兼容接口的本地模拟模型
+
+    响应依次来自：录制的响应（按请求指纹匹配）、脚本规则（按正则匹配最后一条消息）、
+    按提示词类型生成的默认响应。每次调用的延迟 = 对数正态分布的首包延迟 + 输出 token 数 / token 速率。
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 300,
+        latency_sigma: float = 0.3,
+        token_rate: float = 50,
+        responses: str = None,
+        recorded: str = None,
+        seed: int = 0,
+    ):
+        """
+        args:
+            latency_ms (float): 首包延迟的中位数（毫秒），0 表示无延迟
+            latency_sigma (float): 首包延迟对数正态分布的 sigma
+            token_rate (float): 每秒输出的 token 数，<= 0 表示不模拟输出耗时
+            responses (str, optional): 脚本规则 JSON 文件，格式为 [{"match": 正则, "response": 文本}, ...]
+            recorded (str, optional): 录制的响应 JSONL 文件，每行 {"key": 请求指纹, "response": 文本}
+            seed (int): 随机种子
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.token_rate = token_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.rules = []
+        if responses:
+            with open(responses, "r") as f:
+                self.rules = [(re.compile(rule["match"], re.DOTALL), rule["response"]) for rule in json.load(f)]
+        self.recorded = {}
+        if recorded:
+            with open(recorded, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded[entry["key"]] = entry["response"]
+        self.stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def respond(self, model: str, messages: list) -> str:
+        key = messages_key(model, messages)
+        if key in self.recorded:
+            return self.recorded[key]
+
+        last = messages[-1]["content"] if messages else ""
+        for pattern, response in self.rules:
+            if pattern.search(last):
+                return response
+
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        return default_response(system_prompt, last)
+
+    def delay(self, completion_tokens: int) -> float:
+        with self._lock:
+            latency = self._random.lognormvariate(0, self.latency_sigma) if self.latency_ms > 0 else 0
+        seconds = latency * self.latency_ms / 1000
+        if self.token_rate > 0:
+            seconds += completion_tokens / self.token_rate
+        return seconds
+
+    def complete(self, request: dict) -> dict:
+        model = request.get("model", "stub")
+        messages = request.get("messages", [])
+        content = self.respond(model, messages)
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = estimate_tokens(content)
+        time.sleep(self.delay(completion_tokens))
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        return {
+            "id": f"chatcmpl-stub-{self.stats['calls']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def _make_handler(llm: StubLLM):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            self._send(200, llm.complete(request))
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+            else:
+                self._send(200, {"status": "ok", **llm.stats})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def stub_settings(stub_cfg) -> dict:
+    """
+    模拟模型服务的配置，脚本规则和录制文件的相对路径按启动时的工作目录解析为绝对路径，
+    调用方之后切换工作目录也不受影响
+    """
+    settings = dict(stub_cfg)
+    for key in ("responses", "recorded"):
+        if settings.get(key):
+            settings[key] = to_absolute_path(settings[key])
+    return settings
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, **kwargs) -> tuple:
+    """
+    在后台线程中启动模拟模型服务
+
+    args:
+        host (str): 监听地址
+        port (int): 监听端口，0 表示随机端口
+        **kwargs: 传给 `StubLLM` 的参数
+
+    return:
+        tuple: (服务器, StubLLM, base_url)，base_url 可直接作为 BASE_URL 环境变量
+    """
+    llm = StubLLM(**kwargs)
+    server = ThreadingHTTPServer((host, port), _make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    logger.info(f"模拟模型服务已启动：{base_url}")
+    return server, llm, base_url
+
+
+@hydra.main(
+    version_base="1.3",
+    config_path="../config",
+    config_name="benchmark",
+)
+def serve(cfg: DictConfig):
+    """单独运行模拟模型服务，将 BASE_URL 指向输出的地址即可离线运行其他脚本"""
+    server, _, base_url = start_stub_server(**stub_settings(cfg.stub_llm))
+    logger.info(f"请设置 BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    serve()
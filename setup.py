@@ -11,6 +11,7 @@ setup(
         "openai",
         "mcp",
         "pandas",
+        "numpy",
         "python-dotenv",
         "colorama",
         "openpyxl",
@@ -18,6 +19,9 @@ setup(
         "streamlit",
         "sqlalchemy",
     ],
+    extras_require={
+        "server": ["fastapi", "uvicorn", "python-multipart"],
+    },
     python_requires=">=3.12",
     classifiers=[
         "Development Status :: 3 - Alpha",